@@ -91,6 +91,10 @@ if __name__ == "__main__":
                     bot.guild_to_helper.pop(guild_id, None)
 
                 bot._close_and_clean_sink_for_guild(guild_id)
+        elif before.channel is not None and before.channel != after.channel:
+            sink = bot.guild_whisper_sinks.get(before.channel.guild.id)
+            if sink is not None and sink.vc.channel == before.channel:
+                sink.speaker_left(member.id)
 
     @bot.slash_command(name="connect", description="Add The Listener to your voice party.")
     async def connect(ctx: discord.context.ApplicationContext):
@@ -108,7 +112,11 @@ if __name__ == "__main__":
         try:
             guild_id = ctx.guild_id
             await asyncio.sleep(0.5)
-            vc = await author_vc.channel.connect()
+            if CLIArgs.compressed_audio:
+                from src.bot.voice_client import CompressedVoiceClient
+                vc = await author_vc.channel.connect(cls=CompressedVoiceClient)
+            else:
+                vc = await author_vc.channel.connect()
             helper = bot.guild_to_helper.get(guild_id, BotHelper(bot))
             helper.guild_id = guild_id
             helper.set_vc(vc)
@@ -132,6 +140,10 @@ if __name__ == "__main__":
         if bot.guild_is_recording.get(ctx.guild_id, False):
             await ctx.respond("I'm already listening", ephemeral=True)
             return
+        if bot.transcriber_status != "ready":
+            bot.warm_up_transcriber()
+            await ctx.respond("I'm still warming up, try again shortly.", ephemeral=True)
+            return
         bot.start_recording(ctx)
         await ctx.respond("Begun listening", ephemeral=True)
     
@@ -178,6 +190,7 @@ if __name__ == "__main__":
             await ctx.respond("Huh, weird.. where am I? Maybe we should party back up.", ephemeral=True)
             return
         
+        bot.stop_playback(guild_id)
         await bot_vc.disconnect()
         helper.guild_id = None
         helper.set_vc(None)
@@ -222,6 +235,29 @@ if __name__ == "__main__":
             raise e
 
 
+    @bot.slash_command(name="profile", description="Set the transcription decoding profile for this server.")
+    async def profile(
+            ctx: discord.context.ApplicationContext,
+            name: discord.Option(str, choices=["default", "fast", "balanced", "accurate"])):
+        from src.sinks.whisper_sink import decoding_profiles
+        if bot.transcriber_type not in ("local", "hybrid"):
+            await ctx.respond("Decoding profiles only apply to local transcription.", ephemeral=True)
+            return
+        decoding_profiles.set_guild(ctx.guild_id, None if name == "default" else name)
+        await ctx.respond(
+            f"Transcribing with the {decoding_profiles.profile_for(ctx.guild_id).name} profile.", ephemeral=True)
+
+    @bot.slash_command(name="calibrate", description="Pick the decoding profile that keeps up on this machine.")
+    async def calibrate(ctx: discord.context.ApplicationContext):
+        from src.sinks.whisper_sink import batcher
+        if bot.transcriber_type not in ("local", "hybrid") or not batcher.recalibrate():
+            await ctx.respond(
+                "Calibration needs local transcription in this process; restart with `--profile auto`.",
+                ephemeral=True)
+            return
+        await ctx.respond(
+            f"Calibrating for {CLIArgs.latency_target:.1f}s per 5s of speech, this takes a minute.", ephemeral=True)
+
     @bot.slash_command(name="help", description="Show the help message.")
     async def help(ctx: discord.context.ApplicationContext):
         embed_fields = [
@@ -235,6 +271,10 @@ if __name__ == "__main__":
                 name="/stop", value="Stop the transcription.", inline=True),
             discord.EmbedField(
                 name="/generate_pdf", value="Generate a PDF of the transcriptions.", inline=True),
+            discord.EmbedField(
+                name="/profile", value="Set the transcription decoding profile.", inline=True),
+            discord.EmbedField(
+                name="/calibrate", value="Pick the fastest accurate decoding profile.", inline=True),
             discord.EmbedField(
                 name="/help", value="Show the help message.", inline=True),
         ]
@@ -0,0 +1,210 @@
+import asyncio
+import glob
+import io
+import logging
+import os
+import threading
+from collections import Counter, OrderedDict
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+SAMPLING_RATE = 48000
+CHANNELS = 2
+# Discord plays 20 ms Opus frames of 48 kHz stereo audio
+FRAME_SAMPLES = 960
+FRAME_BYTES = FRAME_SAMPLES * CHANNELS * 2
+# Leftovers of an interrupted yt-dlp download
+PARTIAL_SUFFIXES = (".part", ".ytdl", ".temp")
+
+
+def download_youtube_audio(url, output_path, filename) -> str:
+    """Download the best audio stream of ``url`` as is, and return the path of the file."""
+    import yt_dlp
+
+    os.makedirs(output_path, exist_ok=True)
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(output_path, f'{filename}.%(ext)s'),
+        'quiet': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        return ydl.prepare_filename(info)
+
+
+def encode_clip(source) -> list:
+    """
+    Decode an audio file, or a file-like object, and encode it as the 20 ms Opus frames
+    Discord plays. The last frame is padded with silence. Uses PyAV, which faster-whisper
+    already needs, so no ffmpeg process is started.
+    """
+    import av
+
+    encoder = discord.opus.Encoder()
+    resampler = av.AudioResampler(format="s16", layout="stereo", rate=SAMPLING_RATE)
+    frames = []
+    pcm = bytearray()
+
+    def add(decoded):
+        for frame in resampler.resample(decoded):
+            pcm.extend(frame.to_ndarray().tobytes())
+        while len(pcm) >= FRAME_BYTES:
+            frames.append(encoder.encode(bytes(pcm[:FRAME_BYTES]), FRAME_SAMPLES))
+            del pcm[:FRAME_BYTES]
+
+    with av.open(source) as container:
+        for decoded in container.decode(audio=0):
+            add(decoded)
+    add(None)
+    if pcm:
+        pcm.extend(bytes(FRAME_BYTES - len(pcm)))
+        frames.append(encoder.encode(bytes(pcm), FRAME_SAMPLES))
+    return frames
+
+
+class OpusClip:
+    """A sound encoded once as Opus frames, played any number of times."""
+
+    __slots__ = ("name", "frames", "size")
+
+    def __init__(self, name, frames):
+        self.name = name
+        self.frames = frames
+        self.size = sum(len(frame) for frame in frames)
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) * FRAME_SAMPLES / SAMPLING_RATE
+
+
+class AssetManager:
+    """
+    The sounds and files voice commands send, fetched and encoded before they are needed.
+
+    Clips are configured by name with a URL, downloaded with yt-dlp into ``cache_dir`` once,
+    and encoded as Opus frames when the bot starts, see ``start_loading``. Encoded clips are
+    kept in memory, least recently played first out once they take more than ``max_bytes``;
+    an evicted clip is encoded again from its file the next time it plays. Attachments, like
+    the dancing rat, are read into memory once.
+
+    Hits, misses and evictions are counted, see ``snapshot``.
+
+    :param cache_dir: Where downloaded clips are kept between runs.
+    :param max_bytes: Memory the encoded clips may take.
+    """
+
+    def __init__(self, cache_dir="cache", max_bytes=64 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._urls = {}
+        self._attachment_paths = {}
+        self._attachments = {}
+        self._clips = OrderedDict()
+        self._size = 0
+        self._loading = {}
+        self._thread = None
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def add_clip(self, name: str, url: str):
+        self._urls[name] = url
+
+    def add_attachment(self, name: str, path: str):
+        self._attachment_paths[name] = path
+
+    def start_loading(self):
+        """Fetch and encode every clip and read every attachment on a background thread. Safe to call more than once."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._prefetch, daemon=True)
+            self._thread.start()
+
+    def _prefetch(self):
+        for name in self._attachment_paths:
+            try:
+                self.attachment_bytes(name)
+            except Exception as e:
+                logger.warning(f"Could not read attachment {name}: {e}")
+        for name in self._urls:
+            try:
+                self.clip(name)
+            except Exception as e:
+                logger.warning(f"Could not prepare clip {name}: {e}")
+
+    def _path(self, name: str):
+        for path in glob.glob(os.path.join(self.cache_dir, f"{glob.escape(name)}.*")):
+            if not path.endswith(PARTIAL_SUFFIXES):
+                return path
+        return None
+
+    def clip(self, name: str) -> OpusClip:
+        """The encoded clip ``name``, downloading and encoding it first on a miss. Blocks."""
+        with self._lock:
+            clip = self._clips.get(name)
+            if clip is not None:
+                self._clips.move_to_end(name)
+                self._counts["clip_hits"] += 1
+                return clip
+            self._counts["clip_misses"] += 1
+            # One thread loads a clip; others asking for it at the same time wait for it
+            loading = self._loading.setdefault(name, threading.Lock())
+        try:
+            with loading:
+                with self._lock:
+                    clip = self._clips.get(name)
+                if clip is None:
+                    clip = self._load(name)
+                    self._store(clip)
+        finally:
+            with self._lock:
+                self._loading.pop(name, None)
+        return clip
+
+    def _load(self, name: str) -> OpusClip:
+        path = self._path(name)
+        if path is None:
+            if name not in self._urls:
+                raise KeyError(f"No clip named {name}")
+            logger.info(f"Downloading clip {name}.")
+            path = download_youtube_audio(self._urls[name], self.cache_dir, name)
+        clip = OpusClip(name, encode_clip(path))
+        logger.info(f"Encoded clip {name}: {clip.duration:.1f}s, {clip.size / 1024:.0f} KB.")
+        return clip
+
+    def _store(self, clip: OpusClip):
+        with self._lock:
+            self._clips[clip.name] = clip
+            self._size += clip.size
+            while self._size > self.max_bytes and len(self._clips) > 1:
+                _, evicted = self._clips.popitem(last=False)
+                self._size -= evicted.size
+                self._counts["clip_evictions"] += 1
+                logger.debug(f"Evicted clip {evicted.name}.")
+
+    async def get(self, name: str) -> OpusClip:
+        """Clip ``name``, loading a miss on a worker thread."""
+        with self._lock:
+            cached = name in self._clips
+        return self.clip(name) if cached else await asyncio.to_thread(self.clip, name)
+
+    def attachment_bytes(self, name: str) -> bytes:
+        with self._lock:
+            data = self._attachments.get(name)
+        if data is None:
+            with open(self._attachment_paths[name], "rb") as file:
+                data = file.read()
+            with self._lock:
+                self._attachments[name] = data
+        return data
+
+    def attachment(self, name: str) -> discord.File:
+        """Attachment ``name`` as a new ``discord.File``; a file object can only be sent once."""
+        path = self._attachment_paths[name]
+        return discord.File(io.BytesIO(self.attachment_bytes(name)), filename=os.path.basename(path))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts, clips=len(self._clips), clip_bytes=self._size)
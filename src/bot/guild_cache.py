@@ -0,0 +1,103 @@
+import logging
+import threading
+from collections import Counter
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+
+class GuildCache:
+    """
+    Guild, member, role and channel lookups served from the gateway, with REST as the fallback.
+
+    With the ``members`` and ``guilds`` intents py-cord receives every guild with its
+    roles and channels when it connects, chunks the member lists, and keeps all of it
+    current from gateway events: joins, leaves, role and nickname updates. Lookups read
+    that state first and only fall back to a REST fetch on a miss, e.g. a guild that has
+    not been chunked yet. Fetched members are kept here until a gateway event about them
+    arrives, so a miss is not fetched twice.
+
+    Hits and misses are counted per kind, see ``snapshot``. Objects interested in member
+    changes, like a name index, can subscribe with ``add_listener``.
+
+    :param bot: The ``discord.Bot`` whose connection state is read.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._fetched = {}
+        self._listeners = []
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, kind, hit):
+        event = f"{kind}_{'hits' if hit else 'misses'}"
+        with self._lock:
+            self._counts[event] += 1
+            total = self._counts[event]
+        # Log the first miss and then every hundredth
+        if not hit and (total == 1 or total % 100 == 0):
+            logger.info(f"Guild cache: {kind} miss x{total}.")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    async def guild(self, guild_id: int) -> discord.Guild:
+        guild = self.bot.get_guild(guild_id)
+        self._count("guild", guild is not None)
+        if guild is None:
+            guild = await self.bot.fetch_guild(guild_id)
+        return guild
+
+    async def member(self, guild: discord.Guild, user_id: int) -> discord.Member:
+        member = guild.get_member(user_id) or self._fetched.get((guild.id, user_id))
+        self._count("member", member is not None)
+        if member is None:
+            member = await guild.fetch_member(user_id)
+            self._fetched[(guild.id, user_id)] = member
+        return member
+
+    async def members(self, guild: discord.Guild) -> list:
+        """Every member of ``guild``, chunking it over the gateway first if needed."""
+        self._count("member_list", guild.chunked)
+        if not guild.chunked:
+            await guild.chunk()
+        return guild.members
+
+    async def channel(self, guild: discord.Guild, channel_id: int):
+        channel = guild.get_channel(channel_id)
+        self._count("channel", channel is not None)
+        if channel is None:
+            channel = await guild.fetch_channel(channel_id)
+        return channel
+
+    async def role(self, guild: discord.Guild, role_id: int):
+        role = guild.get_role(role_id)
+        self._count("role", role is not None)
+        if role is None:
+            role = discord.utils.get(await guild.fetch_roles(), id=role_id)
+        return role
+
+    def add_listener(self, listener):
+        """
+        Subscribe ``listener`` to member changes. It is called as ``listener(event, member)``
+        with ``event`` one of ``join``, ``remove`` or ``update``, on the event loop.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def member_changed(self, event: str, member: discord.Member):
+        """Called by the bot's member events; py-cord has already updated its own cache."""
+        self._fetched.pop((member.guild.id, member.id), None)
+        with self._lock:
+            self._counts[f"member_{event}_events"] += 1
+        for listener in list(self._listeners):
+            try:
+                listener(event, member)
+            except Exception as e:
+                logger.warning(f"Error in guild cache listener: {e}")
@@ -0,0 +1,163 @@
+import heapq
+import itertools
+import logging
+import threading
+from collections import Counter
+
+import discord
+import numpy as np
+
+from src.bot.assets import FRAME_BYTES, FRAME_SAMPLES, SAMPLING_RATE, OpusClip
+
+logger = logging.getLogger(__name__)
+
+# Priorities: a spoken reply ducks the clips playing under it
+SPEECH = 2
+CLIP = 1
+FRAME_DURATION = FRAME_SAMPLES / SAMPLING_RATE
+# Largest gain change per frame, so ducking fades over 200 ms instead of clicking
+DUCK_STEP = 0.1
+
+
+class Voice:
+    """One clip being mixed, decoded a frame at a time as it plays."""
+
+    __slots__ = ("clip", "priority", "position", "gain", "decoder")
+
+    def __init__(self, clip: OpusClip, priority: int):
+        self.clip = clip
+        self.priority = priority
+        self.position = 0
+        self.gain = 1.0
+        self.decoder = None
+
+    def read(self):
+        """The next 20 ms as 16-bit stereo samples, or ``None`` once the clip has ended."""
+        if self.position >= len(self.clip.frames):
+            return None
+        if self.decoder is None:
+            self.decoder = discord.opus.Decoder()
+        pcm = self.decoder.decode(self.clip.frames[self.position])
+        self.position += 1
+        return np.frombuffer(pcm, dtype=np.int16)
+
+
+class PlaybackEngine(discord.AudioSource):
+    """
+    Plays one guild's clips and spoken replies through a single voice client, mixed together.
+
+    ``play`` queues a clip and returns at once, whatever is already playing. Up to
+    ``max_voices`` clips are mixed at a time, highest priority first; the rest wait in a
+    priority queue, and past ``max_waiting`` new clips are dropped. While a higher priority
+    clip plays, like a spoken reply, the others are turned down to ``duck_gain``.
+
+    The engine is itself the audio source the voice client plays. It ends when nothing is
+    left to mix, so nothing is sent between sounds, and starts again on the next ``play``.
+    The bot joins muted; it is unmuted once, before its first sound.
+
+    Every outcome is counted, see ``snapshot``.
+
+    :param vc: The guild's ``discord.VoiceClient``.
+    :param max_voices: Clips mixed at once.
+    :param duck_gain: Volume of lower priority clips while a higher priority one plays.
+    :param max_waiting: Clips waiting for a free voice before further ones are dropped.
+    """
+
+    def __init__(self, vc, max_voices=4, duck_gain=0.3, max_waiting=8):
+        self.vc = vc
+        self.max_voices = max(1, max_voices)
+        self.duck_gain = duck_gain
+        self.max_waiting = max_waiting
+        self._queue = []
+        self._active = []
+        self._order = itertools.count()
+        self._playing = False
+        self._unmuted = False
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    async def play(self, clip: OpusClip, priority=CLIP) -> bool:
+        """Queue ``clip``. Returns ``False`` if too many clips are waiting. Call on the event loop."""
+        with self._lock:
+            if len(self._queue) >= self.max_waiting:
+                self._counts["dropped"] += 1
+                logger.warning(f"Dropped clip {clip.name}, {len(self._queue)} clips waiting.")
+                return False
+            heapq.heappush(self._queue, (-priority, next(self._order), Voice(clip, priority)))
+            self._counts["queued"] += 1
+            start = not self._playing
+            self._playing = True
+        await self._unmute()
+        if start:
+            self._start()
+        return True
+
+    async def _unmute(self):
+        if self._unmuted:
+            return
+        self._unmuted = True
+        voice = self.vc.guild.me.voice
+        if voice is None or voice.self_mute:
+            try:
+                await self.vc.guild.change_voice_state(channel=self.vc.channel, self_mute=False)
+            except Exception:
+                self._unmuted = False
+                raise
+
+    def _start(self):
+        if not self.vc.is_connected():
+            self.stop()
+            return
+        if self.vc.is_playing():
+            # The previous run has sent its last frame but its player thread has not ended yet
+            self.vc.loop.call_later(FRAME_DURATION, self._start)
+            return
+        self.vc.play(self, after=self._finished)
+
+    def _finished(self, error):
+        if error:
+            logger.error(f"Playback failed: {error}")
+            self.stop()
+
+    def read(self) -> bytes:
+        with self._lock:
+            while self._queue and len(self._active) < self.max_voices:
+                self._active.append(heapq.heappop(self._queue)[2])
+            if not self._active:
+                self._playing = False
+                return b""
+            voices = list(self._active)
+
+        top = max(voice.priority for voice in voices)
+        mix = np.zeros(FRAME_BYTES // 2, dtype=np.float32)
+        finished = []
+        for voice in voices:
+            samples = voice.read()
+            if samples is None:
+                finished.append(voice)
+                continue
+            target = 1.0 if voice.priority >= top else self.duck_gain
+            voice.gain += max(-DUCK_STEP, min(DUCK_STEP, target - voice.gain))
+            mix[:len(samples)] += samples * voice.gain
+
+        if finished:
+            with self._lock:
+                for voice in finished:
+                    self._active.remove(voice)
+                self._counts["played"] += len(finished)
+        return np.clip(mix, -32768, 32767).astype(np.int16).tobytes()
+
+    def is_opus(self) -> bool:
+        return False
+
+    def stop(self):
+        """Drop everything playing and queued, e.g. when the bot leaves the channel."""
+        with self._lock:
+            self._counts["stopped"] += len(self._queue) + len(self._active)
+            self._queue.clear()
+            self._active.clear()
+            self._playing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts, playing=len(self._active), waiting=len(self._queue))
@@ -0,0 +1,38 @@
+import logging
+
+import discord
+from discord.sinks import RawData
+
+from src.sinks.opus_buffer import OPUS_SILENCE
+
+logger = logging.getLogger(__name__)
+
+
+class CompressedVoiceClient(discord.VoiceClient):
+    """
+    A voice client that can hand received Opus packets to the sink before they are decoded.
+
+    If the recording sink has ``compressed`` set, each decrypted packet goes to its
+    ``write_opus`` method as ``(rtp_timestamp, opus_frame)`` together with the speaker's user
+    id, and py-cord's decoder thread never sees it. Otherwise it behaves like the stock client.
+    """
+
+    def unpack_audio(self, data):
+        if not getattr(self.sink, "compressed", False):
+            return super().unpack_audio(data)
+        if 200 <= data[1] <= 204:
+            # RTCP, not audio
+            return
+        if self.paused:
+            return
+
+        packet = RawData(data, self)
+        if packet.decrypted_data == OPUS_SILENCE:
+            return
+        ssrc = self.ws.ssrc_map.get(packet.ssrc)
+        if ssrc is None:
+            # The speaking event that maps this stream to a user has not arrived yet.
+            # Blocking here would stall every other speaker, so the packet is dropped.
+            logger.debug(f"Dropped a packet from unmapped ssrc {packet.ssrc}.")
+            return
+        self.sink.write_opus((packet.timestamp, packet.decrypted_data), ssrc["user_id"])
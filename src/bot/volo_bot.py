@@ -3,7 +3,15 @@ import json
 import logging
 import os
 from collections import defaultdict
-from src.sinks.whisper_sink import WhisperSink
+from src.bot.assets import AssetManager
+from src.bot.guild_cache import GuildCache
+from src.bot.playback import PlaybackEngine
+from src.config.cliargs import CLIArgs
+from src.sinks.whisper_sink import WhisperSink, batcher, keyword_spotter
+from src.transcription.amqp import DEFAULT_AMQP_URL, AMQPTranscriptionClient
+from src.transcription.remote import DEFAULT_BASE_URL, RemoteWhisperClient
+from src.transcription.service import WHISPER_LANGUAGE
+from src.triggers.commands import register_assets
 import discord
 import yaml
 
@@ -11,6 +19,9 @@ import yaml
 DISCORD_CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID"))
 TRANSCRIPTION_METHOD = os.getenv("TRANSCRIPTION_METHOD")
 PLAYER_MAP_FILE_PATH = os.getenv("PLAYER_MAP_FILE_PATH")
+AMQP_URL = os.getenv("AMQP_URL", DEFAULT_AMQP_URL)
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)
 
 
 logger = logging.getLogger(__name__)
@@ -30,10 +41,39 @@ class VoloBot(discord.Bot):
         self.guild_whisper_message_tasks = {}
         self.player_map = {}
         self._is_ready = False
+        # Members, roles and channels from the gateway, so triggers rarely need REST
+        self.cache = GuildCache(self)
+        # Clips and files the voice commands send, prepared before the first trigger
+        self.assets = AssetManager(max_bytes=CLIArgs.asset_cache_mb * 1024 * 1024)
+        register_assets(self.assets)
+        self.guild_playback = {}
         if TRANSCRIPTION_METHOD == "openai":
             self.transcriber_type = "openai"
+        elif TRANSCRIPTION_METHOD == "amqp":
+            self.transcriber_type = "amqp"
+        elif TRANSCRIPTION_METHOD == "hybrid":
+            self.transcriber_type = "hybrid"
         else:
             self.transcriber_type = "local"
+        # Publishes utterances to the AMQP transcription workers and consumes their replies
+        self.consumer_manager = None
+        if self.transcriber_type == "amqp":
+            self.consumer_manager = AMQPTranscriptionClient(
+                AMQP_URL,
+                loop,
+                max_in_flight=CLIArgs.amqp_in_flight,
+                timeout=CLIArgs.amqp_timeout,
+            )
+        # Transcribes everything for "openai", and the local model's overflow for "hybrid"
+        self.remote_transcriber = None
+        if self.transcriber_type in ("openai", "hybrid"):
+            self.remote_transcriber = RemoteWhisperClient(
+                OPENAI_BASE_URL,
+                OPENAI_API_KEY,
+                loop,
+                language=WHISPER_LANGUAGE,
+                max_in_flight=CLIArgs.remote_in_flight,
+            )
         if PLAYER_MAP_FILE_PATH:
             with open(PLAYER_MAP_FILE_PATH, "r", encoding="utf-8") as file:
                 self.player_map = yaml.safe_load(file)
@@ -43,10 +83,60 @@ class VoloBot(discord.Bot):
     async def on_ready(self):
         logger.info(f"Logged in as {self.user} to Discord.")
         self._is_ready = True
+        # Load and warm up the model now that the gateway is connected
+        self.warm_up_transcriber()
+        self.assets.start_loading()
 
+    async def on_member_join(self, member):
+        self.cache.member_changed("join", member)
+
+    async def on_member_remove(self, member):
+        self.cache.member_changed("remove", member)
+
+    async def on_member_update(self, before, after):
+        # Nickname and role changes
+        self.cache.member_changed("update", after)
+
+    def warm_up_transcriber(self):
+        """Start loading the local model, or connecting to the broker, in the background. Also retries a failed start."""
+        if self.transcriber_type in ("local", "hybrid"):
+            batcher.start_loading()
+            if keyword_spotter:
+                keyword_spotter.start_loading()
+        elif self.consumer_manager:
+            self.consumer_manager.start_loading()
+
+    @property
+    def transcriber_status(self) -> str:
+        if self.consumer_manager:
+            return self.consumer_manager.status
+        if self.transcriber_type not in ("local", "hybrid"):
+            return "ready"
+        return batcher.status
+
+
+    def playback(self, vc) -> PlaybackEngine:
+        """The engine mixing everything the bot plays in ``vc``'s guild, new after each reconnect."""
+        engine = self.guild_playback.get(vc.guild.id)
+        if engine is None or engine.vc is not vc:
+            engine = PlaybackEngine(vc, max_voices=CLIArgs.playback_voices, duck_gain=CLIArgs.duck_volume)
+            self.guild_playback[vc.guild.id] = engine
+        return engine
+
+    def stop_playback(self, guild_id: int):
+        engine = self.guild_playback.pop(guild_id, None)
+        if engine is not None:
+            engine.stop()
+            logger.debug(f"Playback for guild {guild_id}: {engine.snapshot()}")
 
     async def close_consumers(self):
-        await self.consumer_manager.close()
+        if self.consumer_manager:
+            await self.consumer_manager.close()
+        if self.remote_transcriber:
+            await self.remote_transcriber.close()
+        if self.transcriber_type in ("local", "hybrid"):
+            # Worker processes and their shared memory do not go away with the bot
+            await asyncio.to_thread(batcher.close)
     def _close_and_clean_sink_for_guild(self, guild_id: int):
         whisper_sink: WhisperSink | None = self.guild_whisper_sinks.get(
             guild_id, None)
@@ -56,6 +146,7 @@ class VoloBot(discord.Bot):
             whisper_sink.stop_voice_thread()
             del self.guild_whisper_sinks[guild_id]
             whisper_sink.close()
+            logger.info(f"Voice commands in guild {guild_id}: {whisper_sink.actions.snapshot()}")
 
     
     def start_recording(self, ctx: discord.context.ApplicationContext):
@@ -134,8 +225,16 @@ class VoloBot(discord.Bot):
             return
     
         transcriptions_queue = whisper_sink.transcription_output_queue
+        # An upgraded transcript replaces the earlier entry for the same utterance in place
+        entries = {}
         while not transcriptions_queue.empty():
-            transcriptions.append(await transcriptions_queue.get())
+            log_message = await transcriptions_queue.get()
+            try:
+                key = json.loads(log_message).get("utterance_id") or id(log_message)
+            except ValueError:
+                key = id(log_message)
+            entries[key] = log_message
+        transcriptions.extend(entries.values())
         return transcriptions
 
     async def update_player_map(self, ctx: discord.context.ApplicationContext):
@@ -158,9 +257,12 @@ class VoloBot(discord.Bot):
                 sink.stop_voice_thread()
                 logger.debug(
                     f"Stopped whisper sink for guild {sink.vc.channel.guild.id} in cleanup.")
+                logger.info(f"Voice commands in guild {sink.vc.channel.guild.id}: {sink.actions.snapshot()}")
             self.guild_whisper_sinks.clear()
         except Exception as e:
             logger.error(f"Error stopping whisper sinks: {e}")
         finally:
+            logger.info(f"Guild cache lookups: {self.cache.snapshot()}")
+            logger.info(f"Assets: {self.assets.snapshot()}")
             logger.info("Cleanup completed.")
     
\ No newline at end of file
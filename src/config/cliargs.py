@@ -3,4 +3,41 @@ from src.utils.commandline import CommandLine
 
 class CLIArgs(CommandLine):
     verbose = False
-    transcriber_type = "local"
\ No newline at end of file
+    transcriber_type = "local"
+    max_batch_size = 8
+    max_batch_wait = 0.05
+    vad = True
+    stream_window = 10.0
+    stream_step = 2.0
+    keyword_model = ""
+    keyword_window = 2.0
+    keyword_step = 0.5
+    trigger_concurrency = 4
+    trigger_timeout = 30.0
+    trigger_cooldown = 0.0
+    asset_cache_mb = 64
+    playback_voices = 4
+    duck_volume = 0.3
+    min_hangover = 0.4
+    max_hangover = 2.0
+    num_workers = None
+    cpu_threads = None
+    guild_concurrency = 2
+    worker_processes = 0
+    voice_queue_size = 3000
+    overload_policy = "degrade"
+    max_pending = 8
+    max_speaker_backlog = 3
+    compressed_audio = False
+    amqp_in_flight = 32
+    amqp_timeout = 120.0
+    amqp_prefetch = None
+    fallback_model = None
+    tier_high_depth = 6
+    tier_low_depth = 1
+    tier_max_latency = 4.0
+    upgrade_transcripts = False
+    remote_in_flight = 4
+    profile = "accurate"
+    latency_target = 2.0
+    calibration_audio = "assets/calibration.wav"
@@ -0,0 +1,78 @@
+import math
+
+# Gaps shorter than this are just packet jitter, not a pause between words
+PAUSE_THRESHOLD = 0.1
+
+
+class _SpeakerStats:
+    __slots__ = ("pause_mean", "pause_var", "last_packet", "utterance_start")
+
+    def __init__(self, pause_mean, pause_var):
+        self.pause_mean = pause_mean
+        self.pause_var = pause_var
+        self.last_packet = None
+        self.utterance_start = None
+
+
+class AdaptiveEndpointer:
+    """
+    Decides how long to wait after a speaker's last packet before their utterance is over.
+
+    Every speaker keeps an exponentially weighted mean and variance of the pauses inside
+    their utterances. The hangover is long enough to cover a typical pause for that speaker
+    (mean plus ``deviations`` standard deviations), so slow speakers are not split
+    mid-sentence while quick speakers are finalized sooner. The value is then scaled by the
+    VAD's speech probability for the last packet (trailing off ends sooner than being cut
+    off mid-word) and shortened for very short turns like "yes", and is always clamped to
+    ``[min_hangover, max_hangover]``.
+
+    :param min_hangover: Shortest wait in seconds.
+    :param max_hangover: Longest wait in seconds.
+    :param deviations: Standard deviations of pause length to cover.
+    :param alpha: Weight of the newest pause in the running statistics.
+    """
+
+    def __init__(self, min_hangover=0.4, max_hangover=2.0, deviations=2.5, alpha=0.1):
+        self.min_hangover = min_hangover
+        self.max_hangover = max(min_hangover, max_hangover)
+        self.deviations = deviations
+        self.alpha = alpha
+        self._stats = {}
+
+    def _get_stats(self, user):
+        stats = self._stats.get(user)
+        if stats is None:
+            stats = _SpeakerStats(pause_mean=0.3, pause_var=0.04)
+            self._stats[user] = stats
+        return stats
+
+    def observe(self, user: int, write_time: float, speech_prob: float = 1.0) -> float:
+        """Record a packet and return the hangover to wait after it."""
+        stats = self._get_stats(user)
+        if stats.last_packet is None:
+            stats.utterance_start = write_time
+        else:
+            gap = write_time - stats.last_packet
+            if PAUSE_THRESHOLD < gap < self.max_hangover:
+                delta = gap - stats.pause_mean
+                stats.pause_mean += self.alpha * delta
+                stats.pause_var = (1 - self.alpha) * (stats.pause_var + self.alpha * delta * delta)
+        stats.last_packet = write_time
+
+        hangover = stats.pause_mean + self.deviations * math.sqrt(stats.pause_var)
+        hangover *= 0.75 + 0.5 * min(max(speech_prob, 0.0), 1.0)
+        if write_time - stats.utterance_start < 1.0:
+            # Short turns are usually complete answers or commands
+            hangover *= 0.75
+        return min(max(hangover, self.min_hangover), self.max_hangover)
+
+    def finish(self, user: int):
+        """The speaker's utterance ended; the next packet starts a new one."""
+        stats = self._stats.get(user)
+        if stats:
+            stats.last_packet = None
+            stats.utterance_start = None
+
+    def forget(self, user: int):
+        """The speaker left; their statistics start over if they come back."""
+        self._stats.pop(user, None)
@@ -0,0 +1,134 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from src.sinks.pcm_buffer import BYTES_PER_SECOND
+
+# Discord sends one packet per 20 ms of speech; positions are counted in packets
+PACKET_DURATION = 0.02
+
+logger = logging.getLogger(__name__)
+
+
+class SpotResult:
+    """A finished keyword window, handed back to the voice thread."""
+
+    __slots__ = ("speaker", "future", "mark")
+
+    def __init__(self, speaker, future, mark):
+        self.speaker = speaker
+        self.future = future
+        self.mark = mark
+
+
+class KeywordHit:
+    """A spotted trigger, handed to the result thread to run ahead of the full transcription."""
+
+    __slots__ = ("speaker", "match")
+
+    def __init__(self, speaker, match):
+        self.speaker = speaker
+        self.match = match
+
+
+class KeywordSpotter:
+    """
+    Listens for trigger phrases in the last few seconds of a speaker's audio while they talk.
+
+    Every ``step`` seconds of new speech, the most recent ``window`` seconds are decoded
+    greedily by a small model prompted with the trigger phrases, on a thread of its own so
+    it never waits behind the main model. A trigger found in the window fires straight
+    away, typically a few hundred milliseconds after it was said, instead of after the
+    end-of-utterance silence and the full transcription. Triggers taking an argument fire
+    once two consecutive windows agree on it, so a name cut off at the end of a window is
+    not acted on.
+
+    Only commands registered with ``early`` are fired. Fired triggers are recorded on the
+    speaker; ``unfired`` leaves them out of the final transcription's matches so they do
+    not fire twice.
+
+    :param engine: A ``LocalWhisperEngine`` for the small model.
+    :param registry: The ``TriggerRegistry`` of voice commands.
+    :param window: Seconds of the most recent audio decoded each time.
+    :param step: Seconds of new speech between two decodes for the same speaker.
+    :param max_pending: Most windows waiting for the model; further windows are skipped.
+    """
+
+    def __init__(self, engine, registry, window=2.0, step=0.5, max_pending=4):
+        self.engine = engine
+        self.registry = registry
+        self.window_bytes = int(window * BYTES_PER_SECOND)
+        self.window_packets = int(window / PACKET_DURATION)
+        self.step_packets = max(1, int(step / PACKET_DURATION))
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="keywords")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def start_loading(self):
+        self.engine.start_loading()
+
+    def maybe_submit(self, speaker, audio):
+        """
+        Start decoding ``speaker``'s latest window if one is due.
+
+        :param audio: Callable taking a byte count and returning that much of the speaker's
+            most recent audio as 16 kHz float32.
+        :return: A ``SpotResult`` whose future resolves to the window's text, or ``None`` if
+            nothing was started.
+        """
+        if speaker.spot_pending or speaker.new_bytes - speaker.spot_mark < self.step_packets:
+            return None
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+        speaker.spot_pending = True
+        speaker.spot_mark = speaker.new_bytes
+        future = self._executor.submit(self.engine.transcribe_one, audio(self.window_bytes))
+        future.add_done_callback(self._finished)
+        return SpotResult(speaker, future, speaker.spot_mark)
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def spot(self, speaker, text: str, mark: int) -> list:
+        """
+        Find the triggers in a decoded window ending at packet ``mark``.
+
+        Returns the ``KeywordHit`` triggers to fire now and records them on the speaker.
+        """
+        speaker.spot_pending = False
+        hits = []
+        candidates = {}
+        for match in self.registry.match(text):
+            command = match.command
+            if not command.early or command.name in candidates:
+                continue
+            candidates[command.name] = match.argument
+            last = speaker.spotted.get(command.name)
+            if last is not None and mark - last < self.window_packets + self.step_packets:
+                # The same occurrence, seen again through an overlapping window
+                continue
+            if command.argument and speaker.spot_candidates.get(command.name) != match.argument:
+                continue
+            speaker.spotted[command.name] = mark
+            hit = KeywordHit(speaker, match)
+            speaker.fired.append(hit)
+            hits.append(hit)
+        speaker.spot_candidates = candidates
+        return hits
+
+    @staticmethod
+    def unfired(matches, fired) -> list:
+        """Drop one match of each fired trigger from a transcription's matches."""
+        remaining = Counter(hit.match.command.name for hit in fired)
+        unfired = []
+        for match in matches:
+            if remaining[match.command.name] > 0:
+                remaining[match.command.name] -= 1
+                continue
+            unfired.append(match)
+        return unfired
@@ -0,0 +1,152 @@
+from collections import deque
+
+from src.sinks.pcm_buffer import CHANNELS, DEFAULT_MAX_BYTES, FRAME_BYTES, SAMPLING_RATE
+from src.transcription.audio import pcm_to_whisper
+
+# The comfort-noise frame Discord sends between talk spurts; py-cord never decodes it
+OPUS_SILENCE = b"\xf8\xff\xfe"
+# Frames smaller than this are DTX or comfort noise. Voiced 20 ms frames at Discord's
+# bitrates are several times larger, so frame size is a free speech detector.
+SPEECH_FRAME_BYTES = 20
+# Utterances with less voiced audio than this are dropped without being decoded
+MIN_VOICED_DURATION = 0.2
+
+# Frame duration in 48 kHz samples for each Opus TOC configuration (RFC 6716, section 3.1)
+_SILK_SAMPLES = (480, 960, 1920, 2880)
+_HYBRID_SAMPLES = (480, 960)
+_CELT_SAMPLES = (120, 240, 480, 960)
+
+
+def packet_samples(packet: bytes) -> int:
+    """Samples per channel at 48 kHz in an Opus packet, read from its TOC byte."""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        per_frame = _SILK_SAMPLES[config % 4]
+    elif config < 16:
+        per_frame = _HYBRID_SAMPLES[config % 2]
+    else:
+        per_frame = _CELT_SAMPLES[config % 4]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return per_frame * frames
+
+
+class OpusBuffer:
+    """
+    Keeps one speaker's audio as the Opus packets Discord sent, decoding only on demand.
+
+    A 20 ms Opus packet is around a hundred bytes where the decoded 48 kHz stereo PCM is
+    3840, so buffering compressed audio cuts a speaker's resident memory by an order of
+    magnitude. Gaps between packets, taken from their RTP timestamps, are replayed as
+    silence when decoding, capped at ``max_gap`` samples like the silence the PCM sink trims.
+
+    Lengths and ``consume`` use PCM byte offsets, as ``PCMBuffer`` does, so either buffer can
+    back a ``Speaker``.
+
+    :param max_gap: Most silent samples inserted for a gap between two packets.
+    :param max_bytes: Cap on the audio kept, in decoded PCM bytes (60 seconds by default).
+    """
+
+    __slots__ = ("_frames", "_samples", "_voiced", "_next_timestamp", "max_gap", "max_samples", "dropped_bytes")
+
+    def __init__(self, max_gap=SAMPLING_RATE // 4, max_bytes=DEFAULT_MAX_BYTES):
+        self._frames = deque()
+        self._samples = 0
+        self._voiced = 0
+        self._next_timestamp = None
+        self.max_gap = max_gap
+        self.max_samples = max_bytes // FRAME_BYTES
+        self.dropped_bytes = 0
+
+    def append(self, packet):
+        """Buffer an ``(rtp_timestamp, opus_frame)`` packet."""
+        timestamp, frame = packet
+        samples = packet_samples(frame)
+        gap = 0
+        if self._next_timestamp is not None:
+            gap = (timestamp - self._next_timestamp) & 0xFFFFFFFF
+            if gap >= 0x80000000:
+                # Late or reordered packet, play it straight after the previous one
+                gap = 0
+            gap = min(gap, self.max_gap)
+        self._next_timestamp = (timestamp + samples) & 0xFFFFFFFF
+
+        self._frames.append((gap, samples, frame))
+        self._samples += gap + samples
+        if len(frame) >= SPEECH_FRAME_BYTES:
+            self._voiced += samples
+        while self._samples > self.max_samples and len(self._frames) > 1:
+            self.dropped_bytes += self._drop() * FRAME_BYTES
+
+    def _drop(self) -> int:
+        gap, samples, frame = self._frames.popleft()
+        self._samples -= gap + samples
+        if len(frame) >= SPEECH_FRAME_BYTES:
+            self._voiced -= samples
+        return gap + samples
+
+    def consume(self, size: int):
+        """Discard whole packets covering at most the oldest ``size`` bytes of decoded audio."""
+        target = size // FRAME_BYTES
+        dropped = 0
+        while self._frames and dropped + self._frames[0][0] + self._frames[0][1] <= target:
+            dropped += self._drop()
+
+    def clear(self):
+        self._frames.clear()
+        self._samples = 0
+        self._voiced = 0
+
+    def decode(self, last_bytes=None):
+        """
+        Decode the buffered packets straight to 16 kHz mono float32 for Whisper.
+
+        :param last_bytes: Only decode the packets covering about this much of the most
+            recent audio, in PCM bytes.
+        """
+        from discord.opus import Decoder
+
+        frames = self._frames
+        if last_bytes is not None:
+            frames = []
+            covered = 0
+            for gap, samples, frame in reversed(self._frames):
+                if covered >= last_bytes // FRAME_BYTES:
+                    break
+                frames.append((gap, samples, frame))
+                covered += gap + samples
+            frames.reverse()
+            if frames:
+                # The leading gap is silence before the window
+                frames[0] = (0,) + frames[0][1:]
+
+        decoder = Decoder()
+        pcm = bytearray()
+        for gap, samples, frame in frames:
+            if gap:
+                pcm += bytes(gap * FRAME_BYTES)
+            pcm += decoder.decode(frame)
+        return pcm_to_whisper(pcm, SAMPLING_RATE, CHANNELS)
+
+    @property
+    def duration(self) -> float:
+        return self._samples / SAMPLING_RATE
+
+    @property
+    def voiced_duration(self) -> float:
+        return self._voiced / SAMPLING_RATE
+
+    @property
+    def compressed_bytes(self) -> int:
+        return sum(len(frame) for _, _, frame in self._frames)
+
+    def __len__(self):
+        return self._samples * FRAME_BYTES
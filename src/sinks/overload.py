@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from queue import Queue
+
+import numpy as np
+
+from src.transcription.audio import to_int16
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_POLICIES = ("degrade", "spill", "shed")
+
+
+class OverloadStats:
+    """Thread-safe counters for every packet or utterance an overload policy touched."""
+
+    def __init__(self, name):
+        self.name = name
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def count(self, event: str, amount=1):
+        with self._lock:
+            before = self._counts[event]
+            self._counts[event] += amount
+            after = self._counts[event]
+        # Log the first occurrence and then every hundredth, not every packet
+        if before == 0 or before // 100 != after // 100:
+            logger.warning(f"Overload in {self.name}: {event} x{after}")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+class VoiceQueue(Queue):
+    """
+    A bounded voice queue that sheds audio instead of blocking the voice receive thread.
+
+    When the queue is full the oldest packet with a low speech probability (VAD hangover,
+    trailing breath) is dropped first; only if there is none is the oldest packet dropped.
+    Control items (``None`` wake-ups, partial results) bypass the bound.
+    """
+
+    def __init__(self, maxsize, stats: OverloadStats):
+        super().__init__(maxsize)
+        self.stats = stats
+
+    def offer(self, packet):
+        """Queue a ``[user, data, write_time, speech_prob]`` packet, shedding one if full."""
+        with self.mutex:
+            if 0 < self.maxsize <= self._qsize():
+                self._shed()
+            self._put(packet)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _shed(self):
+        for index, item in enumerate(self.queue):
+            if isinstance(item, list) and item[3] < 0.5:
+                del self.queue[index]
+                self.stats.count("shed_silence_packets")
+                return
+        for index, item in enumerate(self.queue):
+            if isinstance(item, list):
+                del self.queue[index]
+                self.stats.count("shed_packets")
+                return
+
+    def put_control(self, item):
+        with self.mutex:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+
+class SpillQueue:
+    """
+    Keeps finished utterances on disk while inference is overloaded and replays them later.
+
+    Each utterance is stored as 16 kHz int16 samples (``.npy``) plus its metadata
+    (``.json``). A background thread checks every ``poll_interval`` seconds and, whenever
+    ``is_idle()`` says the load has dropped, hands the oldest utterance to ``resubmit``.
+
+    :param directory: Where spilled utterances are written.
+    :param is_idle: Callable returning ``True`` when there is room for more work.
+    :param resubmit: Callable taking ``(metadata, audio)`` for each replayed utterance.
+    """
+
+    def __init__(self, directory, is_idle, resubmit, poll_interval=1.0):
+        self.directory = directory
+        self.is_idle = is_idle
+        self.resubmit = resubmit
+        self.poll_interval = poll_interval
+        self._sequence = 0
+        self._running = True
+        self._thread = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, metadata: dict, audio: np.ndarray):
+        with self._lock:
+            self._sequence += 1
+            name = f"{int(time.time() * 1000)}-{self._sequence:06d}"
+        path = os.path.join(self.directory, name)
+        np.save(path + ".npy", to_int16(audio))
+        # The metadata file is written last and marks the utterance as complete
+        with open(path + ".json", "w", encoding="utf-8") as file:
+            json.dump(metadata, file)
+        self._ensure_thread()
+
+    def __len__(self):
+        return len(self._pending())
+
+    def resume(self):
+        """Start replaying utterances already on disk, e.g. from before a restart."""
+        if len(self):
+            self._ensure_thread()
+
+    def _pending(self):
+        return sorted(
+            name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")
+        )
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while self._running:
+            time.sleep(self.poll_interval)
+            pending = self._pending()
+            if not pending:
+                return
+            for name in pending:
+                if not self._running or not self.is_idle():
+                    break
+                path = os.path.join(self.directory, name)
+                try:
+                    with open(path + ".json", "r", encoding="utf-8") as file:
+                        metadata = json.load(file)
+                    audio = np.load(path + ".npy").astype(np.float32) / 32768.0
+                    os.remove(path + ".json")
+                    os.remove(path + ".npy")
+                except Exception as e:
+                    logger.error(f"Error loading spilled utterance {name}: {e}")
+                    continue
+                self.resubmit(metadata, audio)
+
+    def close(self):
+        self._running = False
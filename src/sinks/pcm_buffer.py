@@ -0,0 +1,90 @@
+SAMPLING_RATE = 48000
+CHANNELS = 2
+SAMPLE_SIZE = 2
+FRAME_BYTES = CHANNELS * SAMPLE_SIZE
+BYTES_PER_SECOND = SAMPLING_RATE * FRAME_BYTES
+
+DEFAULT_INITIAL_BYTES = 2 * BYTES_PER_SECOND
+DEFAULT_MAX_BYTES = 60 * BYTES_PER_SECOND
+DEFAULT_DROP_BYTES = 10 * BYTES_PER_SECOND
+
+
+class PCMBuffer:
+    """
+    A preallocated, growable buffer for one speaker's 48 kHz stereo 16-bit PCM.
+
+    Packets are copied into a single bytearray that doubles in size when full, so a long
+    monologue is one allocation instead of thousands of small ``bytes`` objects. The buffer
+    never grows past ``max_bytes``; once the cap is reached the oldest audio is dropped to
+    make room and counted in ``dropped_bytes``. At least ``drop_bytes`` go at once, so a
+    speaker at the cap costs one shift of the buffer every few seconds instead of one per
+    packet.
+
+    :param initial_bytes: Capacity preallocated up front (2 seconds by default).
+    :param max_bytes: Hard cap on the audio kept for one speaker (60 seconds by default).
+    :param drop_bytes: Oldest audio dropped at once when the cap is reached (10 seconds by default).
+    """
+
+    __slots__ = ("_buffer", "_length", "max_bytes", "drop_bytes", "dropped_bytes")
+
+    def __init__(self, initial_bytes=DEFAULT_INITIAL_BYTES, max_bytes=DEFAULT_MAX_BYTES, drop_bytes=DEFAULT_DROP_BYTES):
+        self.max_bytes = max_bytes - max_bytes % FRAME_BYTES
+        self.drop_bytes = min(drop_bytes - drop_bytes % FRAME_BYTES, self.max_bytes)
+        self._buffer = bytearray(min(initial_bytes, self.max_bytes))
+        self._length = 0
+        self.dropped_bytes = 0
+
+    def append(self, data):
+        size = len(data)
+        if size >= self.max_bytes:
+            # A single chunk larger than the cap replaces everything we have
+            self.dropped_bytes += self._length + size - self.max_bytes
+            data = memoryview(data)[size - self.max_bytes:]
+            size = self.max_bytes
+            self._length = 0
+
+        needed = self._length + size
+        if needed > self.max_bytes:
+            overflow = max(needed - self.max_bytes, self.drop_bytes)
+            overflow += -overflow % FRAME_BYTES
+            kept = self._length
+            self.consume(overflow)
+            self.dropped_bytes += kept - self._length
+            needed = self._length + size
+
+        if needed > len(self._buffer):
+            capacity = min(max(len(self._buffer) * 2, needed), self.max_bytes)
+            grown = bytearray(capacity)
+            grown[:self._length] = memoryview(self._buffer)[:self._length]
+            self._buffer = grown
+
+        self._buffer[self._length:needed] = data
+        self._length = needed
+
+    def view(self) -> memoryview:
+        """A zero-copy view of the buffered audio. Do not append while the view is in use."""
+        return memoryview(self._buffer)[:self._length]
+
+    def tail(self, size: int) -> memoryview:
+        """A zero-copy view of the most recent ``size`` bytes, rounded down to a whole frame."""
+        size = min(size, self._length)
+        size -= size % FRAME_BYTES
+        return memoryview(self._buffer)[self._length - size:self._length]
+
+    def consume(self, size: int):
+        """Discard the oldest ``size`` bytes, rounded down to a whole frame."""
+        size = min(size, self._length)
+        size -= size % FRAME_BYTES
+        keep = self._length - size
+        self._buffer[:keep] = self._buffer[size:self._length]
+        self._length = keep
+
+    def clear(self):
+        self._length = 0
+
+    @property
+    def duration(self) -> float:
+        return self._length / BYTES_PER_SECOND
+
+    def __len__(self):
+        return self._length
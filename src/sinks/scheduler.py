@@ -0,0 +1,77 @@
+import heapq
+import time
+
+
+class UtteranceScheduler:
+    """
+    Keeps an end-of-speech deadline for every active speaker in a timer heap.
+
+    When a packet arrives only the deadline in ``_deadlines`` is moved forward; the heap
+    entry is corrected lazily the next time it reaches the top, so a busy speaker costs a
+    dict write per packet instead of a heap push. A deadline moved earlier, by a shorter
+    adaptive timeout, gets a fresh entry and the later one is dropped when it surfaces.
+
+    :param silence_timeout: Seconds of silence after which a speaker's utterance is over.
+    """
+
+    def __init__(self, silence_timeout: float = 1.5):
+        self.silence_timeout = silence_timeout
+        self._heap = []
+        self._deadlines = {}
+
+    def touch(self, user: int, last_word: float, timeout: float = None):
+        """
+        Push the speaker's deadline forward after receiving audio at ``last_word``.
+
+        :param timeout: Silence to wait for this speaker, defaults to ``silence_timeout``.
+        """
+        deadline = last_word + (self.silence_timeout if timeout is None else timeout)
+        current = self._deadlines.get(user)
+        if current is None or deadline < current:
+            heapq.heappush(self._heap, (deadline, user))
+        self._deadlines[user] = deadline
+
+    def discard(self, user: int):
+        """Forget the speaker's deadline. Its heap entry is dropped lazily."""
+        self._deadlines.pop(user, None)
+
+    def _settle(self):
+        # Fix up stale entries until the top of the heap holds a live deadline.
+        while self._heap:
+            deadline, user = self._heap[0]
+            current = self._deadlines.get(user)
+            if current is None or current < deadline:
+                # Discarded, or superseded by an earlier entry
+                heapq.heappop(self._heap)
+            elif current > deadline:
+                heapq.heapreplace(self._heap, (current, user))
+            else:
+                return
+
+    def next_timeout(self, now: float = None):
+        """
+        Seconds until the earliest deadline expires, or ``None`` when nobody is speaking
+        and the caller can block until the next packet arrives.
+        """
+        self._settle()
+        if not self._heap:
+            return None
+        if now is None:
+            now = time.time()
+        return max(0.0, self._heap[0][0] - now)
+
+    def pop_expired(self, now: float = None):
+        """Remove and return every speaker whose deadline is at or before ``now``."""
+        if now is None:
+            now = time.time()
+        expired = []
+        self._settle()
+        while self._heap and self._heap[0][0] <= now:
+            _, user = heapq.heappop(self._heap)
+            del self._deadlines[user]
+            expired.append(user)
+            self._settle()
+        return expired
+
+    def __len__(self):
+        return len(self._deadlines)
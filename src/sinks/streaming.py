@@ -0,0 +1,109 @@
+import logging
+
+from src.sinks.pcm_buffer import BYTES_PER_SECOND, FRAME_BYTES
+from src.transcription.audio import WHISPER_SAMPLING_RATE
+
+logger = logging.getLogger(__name__)
+
+
+class PartialResult:
+    """A finished sliding-window transcription, handed back to the voice thread."""
+
+    __slots__ = ("speaker", "future")
+
+    def __init__(self, speaker, future):
+        self.speaker = speaker
+        self.future = future
+
+
+def _normalize(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:\"'")
+
+
+class StreamingTranscriber:
+    """
+    Transcribes a sliding window of a speaker's audio while they are still talking.
+
+    Once a speaker has ``window`` seconds of uncommitted audio, the window is transcribed
+    with word timestamps every ``step`` seconds. Words that two consecutive windows agree
+    on are committed: their text is kept on the speaker and their audio is dropped from the
+    speaker's buffer, so it is never decoded again. The final pass at the end of the
+    utterance then only has to cover the uncommitted tail.
+
+    At most the latest ``window + margin`` seconds are transcribed, so every step costs the
+    same however long the windows keep disagreeing. Words the window has slid past are
+    committed as the last window heard them.
+
+    :param submit_words: Callable taking ``(audio, initial_prompt)`` and returning a future for
+        a list of ``(start, end, word)`` tuples with times relative to the start of ``audio``.
+    :param window: Seconds of uncommitted audio before partial transcription starts.
+    :param step: Seconds of new audio between two partial transcriptions.
+    :param margin: Seconds of uncommitted audio transcribed beyond ``window``.
+    """
+
+    def __init__(self, submit_words, window=10.0, step=2.0, margin=5.0):
+        self.submit_words = submit_words
+        self.window_bytes = int(window * BYTES_PER_SECOND)
+        self.step_bytes = int(step * BYTES_PER_SECOND)
+        self.max_bytes = int((window + margin) * BYTES_PER_SECOND)
+
+    def maybe_submit(self, speaker, audio, prompt=None):
+        """
+        Start a window transcription for ``speaker`` if one is due.
+
+        :param audio: Callable taking a size in bytes and returning about that much of the
+            speaker's most recent audio as 16 kHz float32.
+        :return: A future resolving to the window's words, or ``None`` if nothing was started.
+        """
+        buffered = len(speaker.data)
+        if speaker.partial_pending or buffered < self.window_bytes:
+            return None
+        if buffered - speaker.partial_mark < self.step_bytes:
+            return None
+        speaker.partial_pending = True
+        speaker.partial_mark = buffered
+        samples = audio(min(buffered, self.max_bytes))
+        # Where the window starts in the buffer, from the audio actually decoded
+        offset = buffered - len(samples) * BYTES_PER_SECOND // WHISPER_SAMPLING_RATE
+        speaker.partial_offset = max(0, offset - offset % FRAME_BYTES)
+        if speaker.committed:
+            prompt = f"{prompt or ''} {''.join(speaker.committed[-30:])}".strip()
+        return self.submit_words(samples, prompt)
+
+    def commit(self, speaker, words) -> str:
+        """
+        Commit the words the new hypothesis shares with the previous one.
+
+        Committed audio is consumed from ``speaker.data``. Returns the current partial text:
+        everything committed so far followed by the still-unstable tail.
+        """
+        speaker.partial_pending = False
+        # Word times relative to the start of the speaker's buffer, like the hypothesis
+        window_start = speaker.partial_offset / BYTES_PER_SECOND
+        words = [(start + window_start, end + window_start, word) for start, end, word in words]
+        previous = speaker.hypothesis
+        skipped = 0
+        while skipped < len(previous) and previous[skipped][1] <= window_start:
+            skipped += 1
+        agreed = 0
+        while (
+            skipped + agreed < len(previous)
+            and agreed < len(words)
+            and _normalize(previous[skipped + agreed][2]) == _normalize(words[agreed][2])
+        ):
+            agreed += 1
+
+        committed = previous[:skipped] + words[:agreed]
+        remaining = words[agreed:]
+        if committed:
+            cut = committed[-1][1]
+            consumed = int(cut * BYTES_PER_SECOND)
+            consumed -= consumed % FRAME_BYTES
+            speaker.committed.extend(word for _, _, word in committed)
+            speaker.data.consume(consumed)
+            speaker.partial_mark = max(0, speaker.partial_mark - consumed)
+            remaining = [(start - cut, end - cut, word) for start, end, word in remaining]
+            logger.debug(f"Committed {len(committed)} words for {speaker.user}, dropped {consumed} bytes.")
+        speaker.hypothesis = remaining
+
+        return "".join(speaker.committed) + "".join(word for _, _, word in remaining)
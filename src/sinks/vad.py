@@ -0,0 +1,135 @@
+import numpy as np
+
+from src.sinks.opus_buffer import SPEECH_FRAME_BYTES
+
+# Discord delivers 20 ms packets of 48 kHz stereo int16
+FRAME_SAMPLES = 960 * 2
+
+
+class EnergyVAD:
+    """
+    A cheap energy / zero-crossing voice activity detector that runs on every packet.
+
+    Each 20 ms frame counts as speech when its RMS is above ``energy_threshold`` and it
+    either has a speech-like zero-crossing rate or is loud enough that the rate does not
+    matter. Low-energy, high zero-crossing frames (breath, fans, keyboard hiss) and silent
+    frames are dropped. After speech, ``hangover_frames`` frames are still let through so
+    word endings are not clipped.
+
+    :param energy_threshold: Minimum frame RMS, in int16 units, to be considered speech.
+    :param zcr_threshold: Highest zero-crossing rate accepted for quiet frames.
+    :param hangover_frames: Frames kept after the last speech frame.
+    """
+
+    def __init__(self, energy_threshold=300.0, zcr_threshold=0.25, hangover_frames=10):
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.hangover_frames = hangover_frames
+        self._hangover = {}
+        # Share of voiced frames in each user's last accepted packet
+        self.speech_prob = {}
+
+    def speech_frames(self, samples: np.ndarray) -> np.ndarray:
+        """Boolean speech decision for each whole 20 ms frame in ``samples``."""
+        usable = len(samples) - len(samples) % FRAME_SAMPLES
+        if usable == 0:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:usable].reshape(-1, FRAME_SAMPLES).astype(np.float32)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        # Zero crossings on the left channel only
+        left = np.signbit(frames[:, ::2])
+        zcr = np.mean(left[:, 1:] != left[:, :-1], axis=1)
+        return (rms >= self.energy_threshold) & (
+            (zcr <= self.zcr_threshold) | (rms >= 3 * self.energy_threshold)
+        )
+
+    def gate(self, user: int, data):
+        """
+        Return the part of ``data`` worth buffering for ``user``, or ``None`` to drop it.
+
+        Leading silence inside a packet is trimmed, which also removes the silence Discord
+        prepends to the first packet after a user starts talking again.
+        """
+        samples = np.frombuffer(data, dtype=np.int16)
+        speech = self.speech_frames(samples)
+        if len(speech) == 0:
+            self.speech_prob[user] = 0.0
+            return data if self._hangover.get(user, 0) > 0 else None
+
+        hangover = self._hangover.get(user, 0)
+        voiced = np.flatnonzero(speech)
+        self.speech_prob[user] = len(voiced) / len(speech)
+        if len(voiced) == 0:
+            remaining = hangover - len(speech)
+            self._hangover[user] = max(0, remaining)
+            if hangover <= 0:
+                return None
+            # Keep the frames still covered by the hangover
+            end = min(len(speech), hangover) * FRAME_SAMPLES * 2
+            return data[:end]
+
+        self._hangover[user] = self.hangover_frames - (len(speech) - 1 - voiced[-1])
+        start = 0 if hangover > 0 else voiced[0] * FRAME_SAMPLES * 2
+        return data[start:]
+
+    def reset(self, user: int):
+        self._hangover.pop(user, None)
+        self.speech_prob.pop(user, None)
+
+
+class OpusFrameGate:
+    """
+    The compressed-audio counterpart of ``EnergyVAD``: gates Opus packets by size alone.
+
+    Opus spends almost no bits on silence, so a frame smaller than ``speech_bytes`` is
+    treated as non-speech and dropped once ``hangover_frames`` have passed since the last
+    voiced frame. Nothing is decoded. Packets are ``(rtp_timestamp, opus_frame)`` tuples.
+
+    :param speech_bytes: Smallest frame, in bytes, considered speech.
+    :param hangover_frames: Frames kept after the last speech frame.
+    :param energy_threshold: Used by the sink to trim silence once an utterance is decoded.
+    """
+
+    def __init__(self, speech_bytes=SPEECH_FRAME_BYTES, hangover_frames=10, energy_threshold=300.0):
+        self.speech_bytes = speech_bytes
+        self.hangover_frames = hangover_frames
+        self.energy_threshold = energy_threshold
+        self._hangover = {}
+        self.speech_prob = {}
+
+    def gate(self, user: int, packet):
+        """Return ``packet`` if it is worth buffering for ``user``, or ``None`` to drop it."""
+        if len(packet[1]) >= self.speech_bytes:
+            self.speech_prob[user] = 1.0
+            self._hangover[user] = self.hangover_frames
+            return packet
+        self.speech_prob[user] = 0.0
+        hangover = self._hangover.get(user, 0)
+        if hangover <= 0:
+            return None
+        self._hangover[user] = hangover - 1
+        return packet
+
+    def reset(self, user: int):
+        self._hangover.pop(user, None)
+        self.speech_prob.pop(user, None)
+
+
+def trim_silence(audio: np.ndarray, energy_threshold=300.0, frame=160) -> np.ndarray:
+    """
+    Trim leading and trailing silence from 16 kHz mono float32 audio in 10 ms steps.
+
+    Returns a view of ``audio``; nothing is copied.
+    """
+    usable = len(audio) - len(audio) % frame
+    if usable == 0:
+        return audio
+    frames = audio[:usable].reshape(-1, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    voiced = np.flatnonzero(rms >= energy_threshold / 32768.0)
+    if len(voiced) == 0:
+        return audio[:0]
+    # Leave one frame of context either side
+    start = max(0, voiced[0] - 1) * frame
+    end = min(len(frames), voiced[-1] + 2) * frame
+    return audio[start:end]
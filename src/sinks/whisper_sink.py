@@ -1,31 +1,15 @@
 import asyncio
-import io
 import json
 import logging
 import threading
 import time
-import wave
-from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from concurrent.futures import Future
 from datetime import datetime
-from queue import Queue
+from queue import Empty, Queue
 from typing import List
-import discord
 from dotenv import load_dotenv
 import os
-import src.chatgpt as chatgpt
-import json
-
-try:
-    from superSecretHiddenCode import *
-except:
-    pass
-
-#tts
-try:
-    from gtts import gTTS
-except ImportError:
-    os.system("pip install gTTs")
-    from gtts import gTTS
 
 #audio
 try:
@@ -33,8 +17,6 @@ try:
 except ImportError:
     os.system("pip install pyaudio")
     import pyaudio
-from yt_dlp import YoutubeDL
-import yt_dlp
 try:
     from pydub import AudioSegment
     from pydub.utils import which
@@ -45,74 +27,108 @@ except ImportError:
     from pydub.utils import which
 
 #AI
-import speech_recognition as sr
-import torch
 from discord.sinks.core import Filters, Sink, default_filters
-from faster_whisper import WhisperModel
-from openai import OpenAI
 
-WHISPER_MODEL = "large-v3"
-WHISPER_LANGUAGE = "en"
-WHISPER__PRECISION = "float32"
+from src.config.cliargs import CLIArgs
+from src.sinks.endpointing import AdaptiveEndpointer
+from src.sinks.keyword_spotter import KeywordHit, KeywordSpotter, SpotResult
+from src.sinks.opus_buffer import MIN_VOICED_DURATION, OpusBuffer
+from src.sinks.overload import OverloadStats, SpillQueue, VoiceQueue
+from src.sinks.pcm_buffer import FRAME_BYTES, PCMBuffer
+from src.sinks.scheduler import UtteranceScheduler
+from src.sinks.streaming import PartialResult, StreamingTranscriber
+from src.sinks.vad import EnergyVAD, OpusFrameGate, trim_silence
+from src.transcription.audio import pcm_to_whisper
+from src.transcription.governor import ResourceGovernor
+from src.transcription.service import (
+    TRANSCRIBE_OPTIONS,
+    create_batcher,
+    create_engine,
+    create_keyword_engine,
+    create_profiles,
+)
+from src.triggers.commands import create_registry, nameDictionary
+from src.triggers.dispatcher import TriggerDispatcher
+from src.triggers.names import NameIndex
+from src.triggers.registry import TriggerContext
 
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-print(DEVICE)
-# Set the model to evaluation mode (important for inference)
 logger = logging.getLogger(__name__)
 
-if DEVICE == "cuda":
-    gpu_ram = torch.cuda.get_device_properties(0).total_memory/1024**3
-    if gpu_ram < 5.0:
-        logger.warning("GPU has less than 5GB of RAM. Switching to CPU.")
-        DEVICE = "cpu"
+# Sizes the model's threads from the CPU topology
+governor = ResourceGovernor.from_cli(CLIArgs)
+
+# Decoding profile per guild, possibly chosen by calibration when the model loads
+decoding_profiles = create_profiles(CLIArgs)
+
+# Loaded in the background once the bot has connected, see VoloBot.on_ready
+transcription_engine = create_engine(governor, CLIArgs, decoding_profiles)
 
-audio_model = WhisperModel(WHISPER_MODEL, device=DEVICE, compute_type=WHISPER__PRECISION)
+# Shared by every guild's sink: it owns the model, shares it fairly between guilds and
+# decodes utterances that finish together in one batch
+batcher = create_batcher(transcription_engine, governor, CLIArgs, decoding_profiles)
+
+# The voice commands, built in and from plugins
+triggers = create_registry()
+
+# Fires voice triggers from a small model while people are still talking
+keyword_spotter = None
+if CLIArgs.keyword_model:
+    keyword_spotter = KeywordSpotter(
+        create_keyword_engine(CLIArgs, triggers.phrases(early=True)),
+        triggers,
+        window=CLIArgs.keyword_window,
+        step=CLIArgs.keyword_step,
+    )
 
 load_dotenv()
 GENERAL_CHAT_ID = int(os.getenv("GENERAL_CHAT_ID"))
 DISCORD_CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID"))
 GUILD_ID=int(os.getenv("GUILD_ID"))
-SHUTUP_ROLE_ID=int(os.getenv("SHUTUP_ROLE_ID"))
-ADMIN_ROLE_ID=int(os.getenv("ADMIN_ROLE_ID"))
-TIMEOUT_VC_ID=int(os.getenv("TIMEOUT_VC_ID"))
-ANT_COLONY_ROLE_ID=int(os.getenv("ANT_COLONY_ROLE_ID"))
 
 os.environ["PATH"] += os.pathsep + os.path.join("ffmpeg", "ffmpeg.exe")
-with open("nameDictionary.json","r") as f:
-    nameDictionary=json.loads(f.read())
-
-def download_youtube_audio(url, output_path, filename):
-    os.makedirs(output_path, exist_ok=True)
-
-    # Set the full output file path using your custom filename
-    full_output = os.path.join(output_path, filename + '.%(ext)s')
-
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': full_output,
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-    }
-
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
 
 class Speaker:
     """
     A class to store the audio data and transcription for each user.
     """
 
-    def __init__(self, user: int, player: str, character: str, data, time=time.time()):
+    __slots__ = (
+        "user", "player", "character", "data", "first_word", "last_word", "new_bytes",
+        "committed", "hypothesis", "partial_pending", "partial_mark", "partial_offset",
+        "spot_pending", "spot_mark", "spotted", "spot_candidates", "fired",
+    )
+
+    def __init__(self, user: int, player: str, character: str, data, time=time.time(), buffer=None):
         self.user = user
         self.player = player
         self.character = character
-        self.data = [data]
+        # A PCMBuffer, or an OpusBuffer when the sink keeps audio compressed
+        self.data = PCMBuffer() if buffer is None else buffer
+        self.data.append(data)
         self.first_word =time
         self.last_word = time
         self.new_bytes = 1
+        # Streaming state: words already committed from partial transcriptions
+        self.committed = []
+        self.hypothesis = []
+        self.partial_pending = False
+        self.partial_mark = 0
+        self.partial_offset = 0
+        # Keyword spotting state: the KeywordHits already fired for this utterance
+        self.spot_pending = False
+        self.spot_mark = 0
+        self.spotted = {}
+        self.spot_candidates = {}
+        self.fired = []
+
+
+class SpeakerLeft:
+    """A member left the voice channel, handed to the voice thread to drop their state."""
+
+    __slots__ = ("user",)
+
+    def __init__(self, user: int):
+        self.user = user
 
 
 class WhisperSink(Sink):
@@ -150,30 +166,64 @@ class WhisperSink(Sink):
         self.data_length = data_length
         self.max_speakers = max_speakers
         self.transcriber_type = transcriber_type
-        if transcriber_type == "openai":
-            self.client = OpenAI()
+        # The pooled OpenAI client for "openai", and for overflow in "hybrid"
+        self.remote = bot.remote_transcriber
         self.vc = None
         self.audio_data = {}
         self.running = True
         self.speakers: List[Speaker] = []
-        self.voice_queue = Queue()
-        self.executor = ThreadPoolExecutor(max_workers=8)  # TODO: Adjust this
+        self.overload = OverloadStats("voice sink")
+        # Bounded so a stalled model sheds silence instead of growing memory without limit
+        self.voice_queue = VoiceQueue(CLIArgs.voice_queue_size, self.overload)
+        self.result_queue = Queue()
+        # Utterances per user that are still being transcribed
+        self.backlog = Counter()
+        self.backlog_lock = threading.Lock()
+        self.spill = None
+        self.scheduler = UtteranceScheduler(silence_timeout=1.5)
+        self.endpointer = AdaptiveEndpointer(
+            min_hangover=CLIArgs.min_hangover,
+            max_hangover=CLIArgs.max_hangover,
+        )
+        # Keep speakers as Opus packets; needs the CompressedVoiceClient to deliver them
+        self.compressed = CLIArgs.compressed_audio
+        self.vad = None
+        if CLIArgs.vad:
+            self.vad = OpusFrameGate() if self.compressed else EnergyVAD()
+        self.streaming = None
+        if transcriber_type in ("local", "hybrid") and CLIArgs.stream_window > 0:
+            self.streaming = StreamingTranscriber(
+                lambda audio, prompt: batcher.submit_words(audio, prompt, self.guild_id),
+                window=CLIArgs.stream_window,
+                step=CLIArgs.stream_step,
+            )
+        self.spotter = keyword_spotter if transcriber_type in ("local", "hybrid") else None
         self.player_map = player_map
         self.bot=bot
         self.members=""
+        # Display names, usernames, player_map names and nameDictionary aliases
+        self.names = None
         self.memory=[]
         self.guild=""
         self.generalChat=""
         self.listenerChannel=""
+        # Trigger side effects run as tasks on the bot's loop, never on the sink's threads
+        self.actions = TriggerDispatcher(
+            loop,
+            prepare=self.resolve_guild,
+            concurrency=CLIArgs.trigger_concurrency,
+            timeout=CLIArgs.trigger_timeout,
+            cooldown=CLIArgs.trigger_cooldown,
+        )
 
-    def convertName(self,arg,nameDictionary): #returns int user id
-                                for member in self.members:
-                                    if arg.lower() in member.display_name.lower():
-                                        return member.id
-                                if arg in nameDictionary.keys():
-                                    return int(nameDictionary[arg])
-                                print("no user with name "+arg)
-                                return None
+    def convertName(self,arg,nameDictionary=None): #returns int user id
+        """The id of the member ``arg`` names, from the name index built in ``resolve_guild``."""
+        candidate = self.names.best(arg) if self.names is not None else None
+        if candidate is None:
+            logger.info(f"No member named {arg!r}.")
+            return None
+        logger.debug(f"Resolved {arg!r} to {candidate}.")
+        return candidate.user_id
     
     def start_voice_thread(self, on_exception=None):
         def thread_exception_hook(args):
@@ -187,6 +237,19 @@ class WhisperSink(Sink):
         self.voice_thread = threading.Thread(
             target=self.insert_voice, args=(), daemon=True
         )
+        self.result_thread = threading.Thread(
+            target=self.process_results, args=(), daemon=True
+        )
+
+        self.overload.name = f"guild {self.guild_id}"
+        if CLIArgs.overload_policy == "spill" and self.transcriber_type != "openai":
+            self.spill = SpillQueue(
+                os.path.join(".logs", "spill", str(self.guild_id)),
+                is_idle=lambda: self.pending() < max(1, CLIArgs.max_pending // 2),
+                resubmit=self.resubmit_spilled,
+            )
+            # Replay anything left over from an earlier session
+            self.spill.resume()
 
         if on_exception:
             threading.excepthook = on_exception
@@ -194,94 +257,43 @@ class WhisperSink(Sink):
             threading.excepthook = thread_exception_hook
 
         self.voice_thread.start()
+        self.result_thread.start()
 
     def stop_voice_thread(self):
         self.running = False
+        # Wake both stages if they are blocked waiting for work
+        self.voice_queue.put_control(None)
+        self.result_queue.put_nowait(None)
         try:
             self.voice_thread.join()
+            self.result_thread.join()
         except Exception as e:
             logger.error(f"Unexpected error during thread join: {e}")
         finally:
             logger.debug(
                 f"A sink thread was stopped for guild {self.vc.channel.guild.id}."
             )
-    def check_audio_length(self, temp_file):
-        # Ensure the BytesIO is at the start
-        temp_file.seek(0)
-
-        # Open the BytesIO object as a WAV file
-        with wave.open(temp_file, 'rb') as wave_file:
-            frames = wave_file.getnframes()
-            frame_rate = wave_file.getframerate()
-            duration = frames / float(frame_rate)
-        return duration
-    def transcribe_audio(self, temp_file):
-        try:
-            # Ensure that the audio is long enough to transcribe. If not, return an empty string
-            if self.check_audio_length(temp_file) <= 0.1:
-                return ""
-            
-            if self.transcriber_type == "openai":
-                temp_file.seek(0)
-                openai_transcription = self.client.audio.transcriptions.create(
-                    file=("foobar.wav", temp_file),
-                    model="whisper-1",
-                    language=WHISPER_LANGUAGE,
-                )
-                logger.info(f"OpenAI Transcription: {openai_transcription.text}")
-                return openai_transcription.text
-            else:               
-                # The whisper model
-                temp_file.seek(0)
-                segments, info = audio_model.transcribe(
-                    temp_file,
-                    language=WHISPER_LANGUAGE,
-                    beam_size=10,
-                    best_of=3,
-                    vad_filter=True,
-                    vad_parameters=dict(
-                        min_silence_duration_ms=150,
-                        threshold=0.8
-                    ),
-                    no_speech_threshold=0.6,
-                    initial_prompt="You are writing the transcriptions for a D&D game.",
-                )
-
-                segments = list(segments)
-                result = ""
-                for segment in segments:
-                    result += segment.text
-
-                #logger.info(f"Transcription: {result}")
-                return result
-        except Exception as e:
-            logger.error(f"Error transcribing audio: {e}")
-            return ""
-
-    def transcribe(self, speaker: Speaker):
-        audio_data = sr.AudioData(
-            bytes().join(speaker.data),
+    def new_buffer(self):
+        if self.compressed:
+            return OpusBuffer(max_gap=self.data_length // FRAME_BYTES)
+        return PCMBuffer()
+
+    def buffer_audio(self, buffer):
+        """Decode a speaker buffer to 16 kHz mono float32."""
+        if self.compressed:
+            return buffer.decode()
+        return pcm_to_whisper(
+            buffer.view(),
             self.vc.decoder.SAMPLING_RATE,
-            self.vc.decoder.SAMPLE_SIZE // self.vc.decoder.CHANNELS,
+            self.vc.decoder.CHANNELS,
         )
 
-        wav_data = io.BytesIO(audio_data.get_wav_data())
-
-        wav_io = io.BytesIO()
-        with wave.open(wav_io, "wb") as wave_writer:
-            wave_writer.setnchannels(self.vc.decoder.CHANNELS)
-            wave_writer.setsampwidth(
-                self.vc.decoder.SAMPLE_SIZE // self.vc.decoder.CHANNELS)
-            wave_writer.setframerate(self.vc.decoder.SAMPLING_RATE)
-            wave_writer.writeframes(wav_data.getvalue())
+    def speaker_audio(self, speaker: Speaker):
+        audio = self.buffer_audio(speaker.data)
+        if self.vad:
+            audio = trim_silence(audio, self.vad.energy_threshold)
+        return audio
 
-        wav_io.seek(0)
-        # Check if the audio is long enough to transcribe, else return empty string
-        
-        transcription = self.transcribe_audio(wav_io)
-
-        return transcription
-    
     def get_transcriptions(self):
         """Retrieve all transcriptions from the queue, format them to only include data, begin, and user_id."""
         transcriptions = []
@@ -310,264 +322,310 @@ class WhisperSink(Sink):
 
         return transcriptions
 
+    def add_packet(self, item):
+        """Assign a packet from the voice queue to its speaker and push back their silence deadline."""
+        user_id, data, write_time, speech_prob = item
+        speaker = next(
+            (s for s in self.speakers if s.user == user_id), None
+        )
+        if speaker:
+            speaker.data.append(data)
+            speaker.new_bytes += 1
+            speaker.last_word = write_time
+            if self.streaming:
+                self.submit_partial(speaker)
+            if self.spotter:
+                self.submit_spot(speaker)
+        elif (
+            self.max_speakers < 0 or len(self.speakers) <= self.max_speakers
+        ):
+            user_map = self.player_map.get(user_id, {})
+            player = user_map.get("player")
+            character = user_map.get("character")
+            self.speakers.append(
+                Speaker(user_id, player, character, data, write_time, buffer=self.new_buffer())
+            )
+        else:
+            return
+        timeout = self.endpointer.observe(user_id, write_time, speech_prob)
+        self.scheduler.touch(user_id, write_time, timeout)
+
+    def submit_partial(self, speaker: Speaker):
+        """Transcribe the speaker's current window if they have been talking long enough."""
+        future = self.streaming.maybe_submit(
+            speaker,
+            lambda size: self.tail_audio(speaker, size),
+            TRANSCRIBE_OPTIONS["initial_prompt"],
+        )
+        if future:
+            # Partial results are applied on the voice thread, which owns the speaker's buffer
+            future.add_done_callback(
+                lambda f: self.voice_queue.put_control(PartialResult(speaker, f))
+            )
+
+    def tail_audio(self, speaker: Speaker, size: int):
+        """The speaker's most recent ``size`` bytes of audio as 16 kHz mono float32."""
+        if self.compressed:
+            return speaker.data.decode(last_bytes=size)
+        return pcm_to_whisper(
+            speaker.data.tail(size),
+            self.vc.decoder.SAMPLING_RATE,
+            self.vc.decoder.CHANNELS,
+        )
+
+    def submit_spot(self, speaker: Speaker):
+        """Search the speaker's latest audio for voice triggers if a search is due."""
+        result = self.spotter.maybe_submit(speaker, lambda size: self.tail_audio(speaker, size))
+        if result:
+            # Like partial results, spotted windows are applied on the voice thread
+            result.future.add_done_callback(lambda f: self.voice_queue.put_control(result))
+
+    def apply_spot(self, result: SpotResult):
+        speaker = result.speaker
+        if speaker not in self.speakers:
+            # Already finalized, the full transcription runs the triggers
+            return
+        try:
+            text = result.future.result()
+        except Exception as e:
+            speaker.spot_pending = False
+            logger.debug(f"Error spotting keywords: {e}")
+            return
+        for hit in self.spotter.spot(speaker, text, result.mark):
+            logger.debug(f"Spotted {hit.match.command.name!r} from {speaker.user}: {hit.match.text}")
+            self.result_queue.put_nowait(hit)
+
+    def apply_partial(self, result: PartialResult):
+        speaker = result.speaker
+        if speaker not in self.speakers:
+            # Already finalized, the final pass covers this audio
+            return
+        try:
+            words = result.future.result()
+        except Exception as e:
+            speaker.partial_pending = False
+            logger.warning(f"Error in partial transcription: {e}")
+            return
+        text = self.streaming.commit(speaker, words)
+        logger.debug(f"Partial {speaker.player}: {text}")
+
     def insert_voice(self):
         while self.running:
             try:
-                # Process the voice_queue
-                while not self.voice_queue.empty():
-                    item = self.voice_queue.get()
-                    # Find or create a speaker
+                # Sleep until a packet arrives or the earliest silence deadline expires
+                try:
+                    item = self.voice_queue.get(timeout=self.scheduler.next_timeout())
+                except Empty:
+                    item = None
+                # Drain whatever else arrived while we were waiting. None only wakes the thread.
+                while True:
+                    if isinstance(item, PartialResult):
+                        self.apply_partial(item)
+                    elif isinstance(item, SpotResult):
+                        self.apply_spot(item)
+                    elif isinstance(item, SpeakerLeft):
+                        self.endpointer.forget(item.user)
+                    elif item is not None:
+                        self.add_packet(item)
+                    try:
+                        item = self.voice_queue.get_nowait()
+                    except Empty:
+                        break
+
+                # Hand every speaker whose silence deadline expired to the inference stage.
+                # The speaker is detached right away so packets arriving during inference
+                # start a new utterance instead of waiting for this one to finish.
+                for user_id in self.scheduler.pop_expired():
+                    self.endpointer.finish(user_id)
                     speaker = next(
-                        (s for s in self.speakers if s.user == item[0]), None
+                        (s for s in self.speakers if s.user == user_id), None
                     )
-                    if speaker:
-                        speaker.data.append(item[1])
-                        speaker.new_bytes += 1
-                        speaker.last_word = item[2]
-                    elif (
-                        self.max_speakers < 0 or len(self.speakers) <= self.max_speakers
-                    ):
-                        user_id = item[0]
-                        user_map = self.player_map.get(user_id, {})
-                        player = user_map.get("player")
-                        character = user_map.get("character")
-                        self.speakers.append(Speaker(user_id, player, character, item[1], item[2]))
-                    
-
-                # Transcribe audio for each speaker
-                # so this is interesting, as we arent checking the size of the audio stream, we are just transcribing it
-                future_to_speaker = {}
-                for speaker in self.speakers:
-                    if (time.time() - speaker.last_word) < 1.5:
-                        # Lets make sure the user stopped talking.
+                    if speaker is None or speaker.new_bytes <= 1:
                         continue
-                    if speaker.new_bytes > 1:
-                        speaker.new_bytes = 0
-                        future = self.executor.submit(self.transcribe, speaker)
-                        future_to_speaker[future] = speaker
-                    else:
+                    speaker.new_bytes = 0
+                    self.speakers.remove(speaker)
+                    future = self.dispatch(speaker)
+                    if future is None:
                         continue
-                
-                for future in future_to_speaker:
-                    speaker = future_to_speaker[future]
-                    try:
-                        transcription = future.result()
-                        try:
-                            if self.guild=="":
-                                self.guild=asyncio.run_coroutine_threadsafe(self.bot.fetch_guild(GUILD_ID),self.loop).result()
-                            if self.members=="":
-                                async def fetch_all_members(guild):
-                                    return [member async for member in guild.fetch_members(limit=None)]
-                                self.members=asyncio.run_coroutine_threadsafe(fetch_all_members(self.guild),self.loop ).result()
-                            if self.generalChat=="":
-                                self.generalChat=asyncio.run_coroutine_threadsafe(self.guild.fetch_channel(GENERAL_CHAT_ID),self.loop).result()
-                            if self.listenerChannel=="":
-                                self.listenerChannel=asyncio.run_coroutine_threadsafe(self.guild.fetch_channel(DISCORD_CHANNEL_ID),self.loop).result()
-
-                            text=str(transcription.lower().strip())
-                            if text:
-                                print(str(speaker.player)+": "+text)
-                                
-                            async def delayRemoveRole(role_id, delay):
-                                await asyncio.sleep(delay)
-                                await member.remove_roles(role_id)
-                                print(f"Removed {role.name} from {member.display_name}")
-
-                            
-                            
-                            YDL_OPTIONS = {'format': 'bestaudio', 'noplaylist': 'True'}
-                            FFMPEG_OPTIONS = {
-                                'options': '-vn',
-                                'executable': os.path.join("ffmpeg", "ffmpeg.exe")
-                                }
-                            
-                            
-                            try:
-                                if "test" in text:
-                                    idx = text.index("test") + len("test")
-                                    temp="<@"+str(speaker.user)+">: "+transcription
-                                    future=asyncio.run_coroutine_threadsafe(self.listenerChannel.send(temp), self.loop)
-                                    future=future.result()     
-                            except Exception as e:
-                                print(f"Error in test: {e}" )
-
-                                try:
-                                    if "i'm omni-ing it" in text:
-                                        print("i'm omni-ing it")
-                                        idx = text.index("i'm omni-ing it") + len("i'm omni-ing it")
-                                        user_id=str(speaker.user)
-                                        print(str(user_id)+" is omni-ing it")
-                                        future=asyncio.run_coroutine_threadsafe(self.listenerChannel.send("<@"+user_id+"> is Omni-ing it."), self.loop)
-                                        future=future.result()
-                                except Exception as e:
-                                    print(f"Error in omni-ing it: {e}")
-
-                            try:
-                                if "skippity toilet time" in text or "skibbity toilet time" in text or "skibbity-toilet time" in text:
-                                    print("activating skibidi toilet")
-                                    # Tells pydub where to find ffmpeg and ffprobe                       
-                                    YOUTUBE_URL="https://www.youtube.com/watch?v=jnPKQV_ifYM"
-                                    if not os.path.exists("cache/toilet.mp3"):
-                                        download_youtube_audio(YOUTUBE_URL,"cache","toilet")
-                                    future=asyncio.run_coroutine_threadsafe(self.guild.change_voice_state(channel=self.vc.channel, self_mute=False),self.loop)
-                                    future=future.result()
-                                    self.vc.play(discord.FFmpegPCMAudio("cache/toilet.mp3", **FFMPEG_OPTIONS), after=lambda e: print("Playback finished", e))
-                            except Exception as e:
-                                print(f"Error in skibidi toilet: {e}")
-
-                            try:
-                                if "shut up" in text:
-                                    idx = text.index("shut up") + len("shut up")
-                                    arg = str(text[idx:]).split(" ")[1].rstrip(".").rstrip(",").rstrip("!").rstrip("?")
-                                    user_id=self.convertName(arg,nameDictionary)
-                                    if user_id:
-                                        future = asyncio.run_coroutine_threadsafe(self.guild.fetch_member(user_id), self.loop)
-                                        member = future.result()
-                                        #role = discord.utils.get(member.guild.roles, name="Shut up")
-                                        role= member.guild.get_role(SHUTUP_ROLE_ID)
-                                        if role is None:
-                                            print("Role not found.")
-                                        else:
-                                            future=asyncio.run_coroutine_threadsafe(member.add_roles(role), self.loop)
-                                            future=future.result()
-                                            asyncio.run_coroutine_threadsafe(delayRemoveRole(role,100), self.loop)# dont await
-                                            print(f"Added {role.name} to {member.display_name}")
-                            except Exception as e:
-                                print(f"Error in shut up: {e}")
-
-                            try:    
-                                if "why don't you go study an ant colony" in text or "why don't you go study in ant colony" in text:
-                                    print("Triggering Ant Colony")
-                                    idx = text.index("why don't you go study an ant colony") + len("why don't you go study an ant colony")
-                                    arg = str(text[idx:]).split(" ")[1].rstrip(".").rstrip(",").rstrip("!").rstrip("?")
-                                    user_id=self.convertName(arg,nameDictionary)
-                                    if user_id:
-                                        future = asyncio.run_coroutine_threadsafe(self.guild.fetch_member(user_id), self.loop)
-                                        member = future.result()
-                                        #role = discord.utils.get(member.guild.roles, name="Ant Colony")
-                                        role= member.guild.get_role(ANT_COLONY_ROLE_ID)
-                                        if role is None:
-                                            print("Role not found.")
-                                        else:
-                                            future=asyncio.run_coroutine_threadsafe(member.add_roles(role), self.loop)
-                                            future=future.result()
-                                            asyncio.run_coroutine_threadsafe(delayRemoveRole(role,20), self.loop)# dont await
-                                            print(f"Added {role.name} to {member.display_name}")
-                            except Exception as e:
-                                print(f"Error in Ant colony: {e}")
-                                
-                            try:
-                                if "what do you do with a soccer ball" in text:
-                                    idx = text.index("what do you do with a soccer ball") + len("what do you do with a soccer ball")
-                                    arg = str(text[idx:]).split(" ")[1].rstrip(".").rstrip(",").rstrip("!").rstrip("?")
-                                    user_id=self.convertName(arg,nameDictionary)
-                                    if user_id:
-                                        if user_id!=self.bot.user.id:
-                                            future = asyncio.run_coroutine_threadsafe(self.guild.fetch_member(user_id), self.loop)
-                                            member = future.result()
-                                            if not any(r.id == ADMIN_ROLE_ID for r in member.roles):
-                                                future=asyncio.run_coroutine_threadsafe(member.move_to(None), self.loop)
-                                                future=future.result()
-                                            else:
-                                                print("Cannot kick an admin")
-                                        else:
-                                            print("Bot cannot kick itself")
-                            except Exception as e:
-                                print(f"Error in soccer ball: {e}")
-
-                            if "go sit in the corner" in text:
-                                idx = text.index("go sit in the corner") + len("go sit in the corner")
-                                arg = str(text[idx:]).split(" ")[1].rstrip(".").rstrip(",").rstrip("!").rstrip("?")
-                                user_id=self.convertName(arg,nameDictionary)
-                                
-                                if user_id:
-                                    if user_id!=self.bot.user.id:
-                                        member = asyncio.run_coroutine_threadsafe(self.guild.fetch_member(speaker.user), self.loop).result()
-                                        target=asyncio.run_coroutine_threadsafe(self.guild.fetch_member(user_id), self.loop).result()
-                                        
-                                        if any(r.id == ADMIN_ROLE_ID for r in member.roles) or not any(r.id == ADMIN_ROLE_ID for r in target.roles):
-                                            channel=asyncio.run_coroutine_threadsafe(self.guild.fetch_channel(TIMEOUT_VC_ID),self.loop).result()
-                                            future=asyncio.run_coroutine_threadsafe(target.move_to(channel), self.loop)
-                                            future.result()
-                                        else:
-                                            print("Cannot timeout an admin")
-                                    else:
-                                        print("Bot cannot timeout itself")
-
-                            if "cheese" in text:
-                                    i=text.count("cheese")
-                                    for i in range(i):
-                                        with open('assets/dancing-rat.gif', 'rb') as file:
-                                            gif = discord.File(file)
-                                            asyncio.run_coroutine_threadsafe(self.listenerChannel.send("<@"+str(speaker.user)+">:",file=gif),self.loop).result()
-                                            
-
-                            if "hey, bot" in text or "hey bot" in text:
-                                try:
-                                    #tts=gTTS(text="Hey, whats up "+str(speaker.player),lang="en")
-                                    prompt="history: "+";".join(self.memory)+"New message: "+ speaker.player+": "+ text
-                                    print("Prompt: "+prompt)
-                                    msg=asyncio.run_coroutine_threadsafe(chatgpt.get_chatgpt_response(prompt),self.loop).result()
-                                    print(msg)
-                                    tts=gTTS(text=msg,lang="en")
-                                    tts.save("cache/tts.mp3")
-                                    future=asyncio.run_coroutine_threadsafe(self.guild.change_voice_state(channel=self.vc.channel, self_mute=False),self.loop)
-                                    temp=future.result()
-                                    self.vc.play(discord.FFmpegPCMAudio(source="cache/tts.mp3", **FFMPEG_OPTIONS), after=lambda e: print("Done playing"))
-                                except Exception as e:
-                                    print(f"Error in chatgpt: {e}")
-                            try:
-                                super_secret_code(self,text,speaker,self.generalChat)
-                            except Exception as e:
-                                print(f"Error in secret code: {e}")
-
-                            try:
-                                if "butt" in text:
-                                    print("activating diggin in yo butt")
-                                    # Tells pydub where to find ffmpeg and ffprobe                       
-                                    YOUTUBE_URL="https://www.youtube.com/watch?v=QwtSnk84yZU"
-                                    if not os.path.exists("cache/diggin.mp3"):
-                                        download_youtube_audio(YOUTUBE_URL,"cache","diggin")
-                                    future=asyncio.run_coroutine_threadsafe(self.guild.change_voice_state(channel=self.vc.channel, self_mute=False),self.loop)
-                                    future=future.result()
-                                    self.vc.play(discord.FFmpegPCMAudio("cache/diggin.mp3", **FFMPEG_OPTIONS), after=lambda e: print("Playback finished", e))
-                            except Exception as e:
-                                print(f"Error in butt: {e}" )
-                            
-                            # try:
-                            #     if "taco" in text:
-                            #         print("activating nom nom nom")
-                            #         # Tells pydub where to find ffmpeg and ffprobe                       
-                            #         YOUTUBE_URL="https://www.youtube.com/watch?v=UaMKUVxidpM"
-                            #         if not os.path.exists("cache/taco.mp3"):
-                            #             download_youtube_audio(YOUTUBE_URL,"cache","taco")
-                            #         future=asyncio.run_coroutine_threadsafe(self.guild.change_voice_state(channel=self.vc.channel, self_mute=False),self.loop)
-                            #         future=future.result()
-                            #         self.vc.play(discord.FFmpegPCMAudio("cache/taco.mp3", **FFMPEG_OPTIONS), after=lambda e: print("Playback finished", e))
-                            # except Exception as e:
-                            #     print(f"Error in nom nom nom: {e}" )
-
-                            if text:
-                                self.memory.append(str(speaker.player)+": "+text)
-                                self.memory=self.memory[-20:]
-                        except Exception as e:
-                            logger.error(f"Custom code error: {e}", exc_info=True)
-
-
-                        current_time = time.time()
-                        speaker_new_bytes = speaker.new_bytes
-                        # Remove speaker once returned. 
-                        for s in self.speakers[:]:
-                            if speaker.user == s.user:
-                                self.write_transcription_log(s, transcription)
-                                self.speakers.remove(s)
-
-                    except Exception as e:
-                        logger.warn(f"Error in insert_voice future: {e}")
+                    future.add_done_callback(
+                        lambda f, speaker=speaker: self.result_queue.put_nowait((speaker, f, True))
+                    )
 
             except Exception as e:
                 logger.error(f"Error in insert_voice: {e}")
-            
+
+    def dispatch(self, speaker: Speaker):
+        """
+        Start inference for a finished utterance and return a future for its transcript.
+
+        If transcription is falling behind, the ``hybrid`` transcriber sends the utterance to
+        the remote API while that has capacity. Otherwise ``--overload_policy`` decides what
+        happens instead: ``degrade`` decodes greedily, ``spill`` writes the utterance to disk to be
+        transcribed once the load drops, and ``shed`` drops it. Returns ``None`` when the
+        utterance was spilled or shed, or was kept compressed and never had any speech.
+        """
+        if self.compressed and speaker.data.voiced_duration < MIN_VOICED_DURATION:
+            # Nothing but comfort noise and breaths, not worth decoding
+            logger.debug(f"Skipped an undecoded utterance from {speaker.user}.")
+            return None
+        audio = self.speaker_audio(speaker)
+        if self.transcriber_type == "openai":
+            future = self.remote.submit(audio)
+        elif (
+            self.transcriber_type == "hybrid"
+            and self.is_overloaded(speaker.user)
+            and not self.remote.saturated
+        ):
+            # The local model is backed up, borrow the remote API's capacity
+            self.overload.count("overflowed_utterances")
+            future = self.remote.submit(audio)
+        else:
+            fast = False
+            if self.is_overloaded(speaker.user):
+                policy = CLIArgs.overload_policy
+                if policy == "shed":
+                    self.overload.count("shed_utterances")
+                    return None
+                if policy == "spill" and self.spill is not None:
+                    self.spill.put(self.utterance_metadata(speaker), audio)
+                    self.overload.count("spilled_utterances")
+                    return None
+                self.overload.count("degraded_utterances")
+                fast = True
+            future = self.submit_audio(audio, speaker, fast=fast)
+        with self.backlog_lock:
+            self.backlog[speaker.user] += 1
+        return future
+
+    def submit_audio(self, audio, speaker: Speaker, fast=False):
+        """Queue an utterance with the shared batcher, or publish it to the AMQP workers."""
+        if self.transcriber_type == "amqp":
+            return self.bot.consumer_manager.submit(
+                audio, self.utterance_metadata(speaker), kind="fast" if fast else "text")
+        return batcher.submit(
+            audio, self.guild_id, fast=fast,
+            upgrade=lambda text: self.store_upgrade(speaker, text),
+        )
+
+    def store_upgrade(self, speaker: Speaker, text: str):
+        """Replace a fallback model transcript with the large model's. Triggers are not run again."""
+        future = Future()
+        future.set_result(text)
+        self.result_queue.put_nowait((speaker, future, False))
+
+    def pending(self) -> int:
+        """Utterances of this guild waiting for transcription."""
+        if self.transcriber_type == "amqp":
+            return self.bot.consumer_manager.pending(self.guild_id)
+        return batcher.pending(self.guild_id)
+
+    def is_overloaded(self, user_id) -> bool:
+        if self.pending() >= CLIArgs.max_pending:
+            return True
+        with self.backlog_lock:
+            return self.backlog[user_id] >= CLIArgs.max_speaker_backlog
+
+    def speaker_left(self, user_id):
+        """Forget the pause statistics of a member who left the channel. Safe from any thread."""
+        self.voice_queue.put_control(SpeakerLeft(user_id))
+
+    def finished(self, user_id):
+        with self.backlog_lock:
+            self.backlog[user_id] -= 1
+            if self.backlog[user_id] <= 0:
+                del self.backlog[user_id]
+
+    def utterance_metadata(self, speaker: Speaker) -> dict:
+        return {
+            "guild_id": self.guild_id,
+            "user": speaker.user,
+            "player": speaker.player,
+            "character": speaker.character,
+            "first_word": speaker.first_word,
+            "last_word": speaker.last_word,
+            "committed": "".join(speaker.committed),
+        }
+
+    def resubmit_spilled(self, metadata: dict, audio):
+        """Transcribe an utterance replayed from the spill queue. Its triggers are stale and not run."""
+        speaker = Speaker(metadata["user"], metadata["player"], metadata["character"], b"", metadata["first_word"])
+        speaker.last_word = metadata["last_word"]
+        if metadata["committed"]:
+            speaker.committed.append(metadata["committed"])
+        self.overload.count("unspilled_utterances")
+        future = self.submit_audio(audio, speaker)
+        future.add_done_callback(
+            lambda f: self.result_queue.put_nowait((speaker, f, False))
+        )
+
+    @property
+    def guild_id(self):
+        return self.vc.guild.id if self.vc else None
+
+    def process_results(self):
+        """Post-processing stage: handles transcriptions in the order they complete."""
+        while self.running:
+            item = self.result_queue.get()
+            if item is None:
+                continue
+            if isinstance(item, KeywordHit):
+                # Only the spotted command, ahead of the full transcription
+                self.handle_transcription(item.speaker, item.match.text, matches=[item.match])
+                continue
+            speaker, future, live = item
+            try:
+                # Streamed speakers only had their uncommitted tail transcribed
+                transcription = "".join(speaker.committed) + future.result()
+                if live:
+                    self.handle_transcription(speaker, transcription)
+                self.write_transcription_log(speaker, transcription)
+            except Exception as e:
+                logger.warning(f"Error in process_results: {e}")
+            finally:
+                if live:
+                    self.finished(speaker.user)
+
+    async def resolve_guild(self):
+        """Look up the guild, its members and the channels the triggers use in the gateway cache."""
+        cache = self.bot.cache
+        self.guild = await cache.guild(GUILD_ID)
+        if self.names is None:
+            members = await cache.members(self.guild)
+            if self.names is None:
+                # Built once, then kept current from member events
+                self.members = members
+                self.names = NameIndex.build(members, self.player_map, nameDictionary, guild_id=self.guild.id)
+                cache.add_listener(self.names.member_changed)
+        self.generalChat = await cache.channel(self.guild, GENERAL_CHAT_ID)
+        self.listenerChannel = await cache.channel(self.guild, DISCORD_CHANNEL_ID)
+
+    def handle_transcription(self, speaker: Speaker, transcription: str, matches=None):
+        """
+        Start the voice triggers for a finished transcription. Returns without waiting for them.
+
+        ``matches`` are commands the keyword spotter fired early; only they run, and the
+        full transcription later leaves them out.
+        """
+        try:
+            text=str(transcription.lower().strip())
+            context = TriggerContext(self, speaker, transcription, text, tuple(self.memory))
+            if matches is not None:
+                logger.debug(f"Spotted {speaker.player}: {text}")
+                self.actions.run(context, matches)
+                return
+
+            if text:
+                print(str(speaker.player)+": "+text)
+            matches = triggers.match(text)
+            if speaker.fired:
+                matches = self.spotter.unfired(matches, speaker.fired)
+            self.actions.run(context, matches, triggers.catch_all)
+
+            if text:
+                self.memory.append(str(speaker.player)+": "+text)
+                self.memory=self.memory[-20:]
+        except Exception as e:
+            logger.error(f"Custom code error: {e}", exc_info=True)
 
     def check_speaker_timeouts(self, current_speaker, transcription):
 
@@ -590,6 +648,7 @@ class WhisperSink(Sink):
             "player": speaker.player,
             "character": speaker.character,
             "event_source": "Discord",                     # Event source
+            "utterance_id": f"{speaker.user}-{speaker.first_word:.3f}",  # Later revisions reuse it
             "data": transcription                          # Transcription text
         }
 
@@ -613,14 +672,42 @@ class WhisperSink(Sink):
         data_len = len(data)
         if data_len > self.data_length:
             data = data[-self.data_length :]
+        # Drop silence and breath noise before it is queued and buffered
+        speech_prob = 1.0
+        if self.vad:
+            data = self.vad.gate(user, data)
+            if data is None:
+                return
+            speech_prob = self.vad.speech_prob.get(user, 1.0)
         write_time = time.time()
-        # Send bytes to be transcribed
-        self.voice_queue.put_nowait([user, data, write_time])
+        # Send bytes to be transcribed, shedding old silence if the voice thread is behind
+        self.voice_queue.offer([user, data, write_time, speech_prob])
+
+    @Filters.container
+    def write_opus(self, packet, user):
+        """
+        Gets undecoded ``(rtp_timestamp, opus_frame)`` packets from ``CompressedVoiceClient``.
+
+        Runs on the voice receive thread, so nothing is decoded here.
+        """
+        speech_prob = 1.0
+        if self.vad:
+            packet = self.vad.gate(user, packet)
+            if packet is None:
+                return
+            speech_prob = self.vad.speech_prob.get(user, 1.0)
+        self.voice_queue.offer([user, packet, time.time(), speech_prob])
 
     def close(self):
         logger.debug("Closing whisper sink.")
         self.running = False
+        self.voice_queue.put_control(None)
+        self.result_queue.put_nowait(None)
         self.queue.put_nowait(None)
+        if self.spill is not None:
+            self.spill.close()
+        if self.names is not None:
+            self.bot.cache.remove_listener(self.names.member_changed)
         super().cleanup()
 
     
\ No newline at end of file
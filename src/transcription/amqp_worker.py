@@ -0,0 +1,101 @@
+"""
+A transcription worker for ``TRANSCRIPTION_METHOD=amqp``.
+
+Run as many as needed, on any host that can reach the broker in ``AMQP_URL``:
+
+    python -m src.transcription.amqp_worker --num_workers 2
+
+The worker accepts the bot's inference options (``--worker_processes``, ``--max_batch_size``,
+...) and batches the requests it has prefetched like the bot does locally.
+"""
+import asyncio
+import json
+import logging
+import os
+
+import aio_pika
+from dotenv import load_dotenv
+
+from src.config.cliargs import CLIArgs
+from src.transcription.amqp import DEFAULT_AMQP_URL, REQUEST_QUEUE
+from src.transcription.audio import decode_audio
+from src.transcription.governor import ResourceGovernor
+from src.transcription.service import create_batcher, create_engine, create_profiles
+from src.utils.commandline import CommandLine
+
+logger = logging.getLogger(__name__)
+
+
+def _header(headers, name):
+    value = headers.get(name)
+    # Older aio-pika versions hand string headers back as bytes
+    return value.decode() if isinstance(value, bytes) else value
+
+
+async def handle(channel, batcher, message):
+    """Transcribe one request and publish the reply to the queue named in ``reply_to``."""
+    headers = message.headers or {}
+    try:
+        audio = await asyncio.get_running_loop().run_in_executor(None, decode_audio, message.body)
+        future = batcher.submit(
+            audio,
+            _header(headers, "guild_id"),
+            fast=_header(headers, "kind") == "fast",
+        )
+        reply = {"text": await asyncio.wrap_future(future)}
+    except Exception as e:
+        logger.error(f"Error transcribing request {message.correlation_id}: {e}")
+        reply = {"error": f"{type(e).__name__}: {e}"}
+
+    if message.reply_to:
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                json.dumps(reply).encode(),
+                content_type="application/json",
+                correlation_id=message.correlation_id,
+            ),
+            routing_key=message.reply_to,
+        )
+    # Acknowledged only once answered, so a request held by a crashed worker is redelivered
+    await message.ack()
+
+
+async def serve(url, batcher, prefetch, queue=REQUEST_QUEUE):
+    connection = await aio_pika.connect_robust(url)
+    async with connection:
+        channel = await connection.channel()
+        # The broker hands each worker at most this many unacknowledged requests
+        await channel.set_qos(prefetch_count=prefetch)
+        requests = await channel.declare_queue(queue, durable=True)
+        logger.info(f"Consuming {queue} with a prefetch of {prefetch}.")
+        tasks = set()
+        async with requests.iterator() as messages:
+            async for message in messages:
+                task = asyncio.create_task(handle(channel, batcher, message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+
+def main():
+    args = CommandLine.read_command_line()
+    CLIArgs.update_from_args(args)
+    logging.basicConfig(
+        level=logging.DEBUG if CLIArgs.verbose else logging.INFO,
+        format="%(asctime)s %(name)s: %(message)s",
+    )
+    load_dotenv()
+
+    governor = ResourceGovernor.from_cli(CLIArgs)
+    profiles = create_profiles(CLIArgs)
+    batcher = create_batcher(create_engine(governor, CLIArgs, profiles), governor, CLIArgs, profiles)
+    batcher.start_loading()
+    # Enough requests on hand to fill a batch for every parallel inference slot
+    prefetch = CLIArgs.amqp_prefetch or batcher.max_batch_size * batcher.workers
+    try:
+        asyncio.run(serve(os.getenv("AMQP_URL", DEFAULT_AMQP_URL), batcher, prefetch))
+    finally:
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import io
+import wave
+
+import numpy as np
+
+WHISPER_SAMPLING_RATE = 16000
+
+
+def pcm_to_whisper(pcm, sampling_rate: int = 48000, channels: int = 2) -> np.ndarray:
+    """
+    Convert interleaved 16-bit PCM to the 16 kHz mono float32 array Whisper expects.
+
+    For Discord's 48 kHz stereo each output sample is the mean of three consecutive
+    stereo frames, which downmixes, low-passes and decimates in a single vectorized pass.
+
+    :param pcm: Any bytes-like object holding int16 samples, e.g. a memoryview.
+    :param sampling_rate: Sampling rate of ``pcm``.
+    :param channels: Number of interleaved channels in ``pcm``.
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    if sampling_rate % WHISPER_SAMPLING_RATE == 0:
+        block = (sampling_rate // WHISPER_SAMPLING_RATE) * channels
+        usable = len(samples) - len(samples) % block
+        audio = samples[:usable].reshape(-1, block).mean(axis=1, dtype=np.float32)
+    else:
+        usable = len(samples) - len(samples) % channels
+        mono = samples[:usable].reshape(-1, channels).mean(axis=1, dtype=np.float32)
+        target = int(len(mono) * WHISPER_SAMPLING_RATE / sampling_rate)
+        audio = np.interp(
+            np.linspace(0, len(mono) - 1, target, dtype=np.float32),
+            np.arange(len(mono), dtype=np.float32),
+            mono,
+        ).astype(np.float32)
+    audio /= 32768.0
+    return audio
+
+
+def audio_duration(audio: np.ndarray) -> float:
+    """Duration in seconds of a 16 kHz array returned by ``pcm_to_whisper``."""
+    return len(audio) / WHISPER_SAMPLING_RATE
+
+
+def encode_wav(audio: np.ndarray) -> io.BytesIO:
+    """Encode a 16 kHz float32 array as a 16-bit mono WAV file in memory."""
+    wav_io = io.BytesIO()
+    with wave.open(wav_io, "wb") as wave_writer:
+        wave_writer.setnchannels(1)
+        wave_writer.setsampwidth(2)
+        wave_writer.setframerate(WHISPER_SAMPLING_RATE)
+        wave_writer.writeframes(to_int16(audio).tobytes())
+    wav_io.seek(0)
+    return wav_io
+
+
+def encode_opus(audio: np.ndarray, bitrate=24000) -> bytes:
+    """
+    Encode a 16 kHz float32 array as a mono Ogg/Opus file in memory.
+
+    24 kbit/s is about 3 KB per second of speech against 32 KB for 16-bit WAV, with no
+    measurable effect on Whisper's accuracy. Uses PyAV, which faster-whisper already needs.
+    """
+    import av
+
+    buffer = io.BytesIO()
+    with av.open(buffer, mode="w", format="ogg") as container:
+        stream = container.add_stream("libopus", rate=WHISPER_SAMPLING_RATE)
+        stream.codec_context.layout = "mono"
+        stream.codec_context.bit_rate = bitrate
+        frame = av.AudioFrame.from_ndarray(to_int16(audio)[np.newaxis, :], format="s16", layout="mono")
+        frame.sample_rate = WHISPER_SAMPLING_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return buffer.getvalue()
+
+
+def decode_audio(data: bytes) -> np.ndarray:
+    """Decode an encoded audio file in memory to 16 kHz mono float32."""
+    from faster_whisper import decode_audio as faster_whisper_decode
+
+    return faster_whisper_decode(io.BytesIO(data), sampling_rate=WHISPER_SAMPLING_RATE)
+
+
+def to_int16(audio: np.ndarray) -> np.ndarray:
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
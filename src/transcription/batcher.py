@@ -0,0 +1,238 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+import numpy as np
+
+from src.transcription.audio import audio_duration
+from src.transcription.scheduler import FairShareScheduler
+from src.transcription.tiering import BackgroundUpgrader
+
+# Whisper's encoder always sees 30 second windows, so anything longer cannot share a batch
+MAX_BATCHED_DURATION = 30.0
+MIN_DURATION = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionJob:
+    """
+    One unit of work for the model.
+
+    ``kind`` is ``"text"`` for a finished utterance, ``"fast"`` for a finished utterance
+    decoded greedily because the service is overloaded, ``"words"`` for a streaming
+    window that needs word timestamps, and ``"upgrade"`` for a fallback transcript re-run
+    on the primary model in the background.
+
+    ``upgrade`` is called with the primary model's transcript if the job ran on the fallback
+    model and was re-run in the background. ``options`` are the guild's decoding profile.
+    """
+
+    __slots__ = ("audio", "future", "guild_id", "submitted", "cost", "kind", "prompt", "upgrade", "options")
+
+    def __init__(self, audio: np.ndarray, guild_id=None, kind="text", prompt=None, upgrade=None, options=None):
+        self.audio = audio
+        self.future = Future()
+        self.guild_id = guild_id
+        self.submitted = time.monotonic()
+        self.cost = audio_duration(audio)
+        self.kind = kind
+        self.prompt = prompt
+        self.upgrade = upgrade
+        self.options = options
+
+
+class TranscriptionBatcher:
+    """
+    Owns the transcription engine and groups ready utterances from every sink into batches.
+
+    One batcher is shared by all guilds. Jobs wait in a ``FairShareScheduler``, which decides
+    which guild goes next and which of its jobs is shortest. Each dispatch thread (one per
+    parallel call the engine accepts) takes the next job, then keeps collecting for up to
+    ``max_wait`` seconds or until ``max_batch_size`` utterances are ready, and runs the whole
+    group through a single batched call. Lone utterances, and utterances longer than
+    Whisper's 30 second window, are transcribed one at a time with the full options.
+
+    :param engine: A ``LocalWhisperEngine`` or another object with the same methods.
+    :param max_batch_size: Most utterances decoded together.
+    :param max_wait: Seconds to wait for more utterances once the first one is ready.
+    :param governor: Optional ``ResourceGovernor`` that accounts inference time.
+    :param scheduler: The queue jobs wait in, a ``FairShareScheduler`` by default.
+    :param fallback: Optional faster engine, e.g. a small model, used while ``tiering`` says so.
+    :param tiering: A ``TierPolicy`` deciding between ``engine`` and ``fallback``.
+    :param upgrade: Re-run fallback transcripts on ``engine`` once it is idle.
+    :param profiles: Optional ``DecodingProfiles`` giving each guild's decoding options.
+    """
+
+    def __init__(
+        self,
+        engine,
+        max_batch_size=8,
+        max_wait=0.05,
+        governor=None,
+        scheduler=None,
+        fallback=None,
+        tiering=None,
+        upgrade=False,
+        profiles=None,
+    ):
+        self.engine = engine
+        self.profiles = profiles
+        self.fallback = fallback
+        self.tiering = tiering if fallback else None
+        self.upgrader = None
+        if self.tiering and upgrade:
+            self.upgrader = BackgroundUpgrader(self._upgrade, self._idle)
+        self.governor = governor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.scheduler = scheduler or FairShareScheduler()
+        self.workers = getattr(engine, "concurrency", 1)
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, audio: np.ndarray, guild_id=None, fast=False, upgrade=None) -> Future:
+        """
+        Queue 16 kHz mono float32 audio. The returned future resolves to the transcript.
+
+        :param fast: Decode greedily on its own instead of with the full options.
+        :param upgrade: Called with a better transcript if the fallback model was used and
+            the utterance was later re-run on the primary model.
+        """
+        job = TranscriptionJob(
+            audio, guild_id, kind="fast" if fast else "text", upgrade=upgrade,
+            options=self._options_for(guild_id),
+        )
+        if job.cost <= MIN_DURATION:
+            job.future.set_result("")
+            return job.future
+        return self._enqueue(job)
+
+    def submit_words(self, audio: np.ndarray, initial_prompt=None, guild_id=None) -> Future:
+        """Queue audio for ``transcribe_words``. The future resolves to ``(start, end, word)`` tuples."""
+        return self._enqueue(TranscriptionJob(
+            audio, guild_id, kind="words", prompt=initial_prompt, options=self._options_for(guild_id)))
+
+    def _options_for(self, guild_id):
+        return self.profiles.options_for(guild_id) if self.profiles is not None else None
+
+    @property
+    def status(self) -> str:
+        return self.engine.status
+
+    def start_loading(self):
+        self.engine.start_loading()
+        if self.fallback:
+            self.fallback.start_loading()
+
+    def recalibrate(self) -> bool:
+        return self.engine.recalibrate()
+
+    def close(self):
+        """Stop the engines that own processes, like ``ProcessPoolEngine``. Blocks."""
+        for engine in (self.engine, self.fallback):
+            close = getattr(engine, "close", None)
+            if close is not None:
+                close()
+
+    def _enqueue(self, job, background=False):
+        self._ensure_threads()
+        job.future.add_done_callback(lambda f: self._finished(job))
+        self.scheduler.put(job, background=background)
+        return job.future
+
+    def _finished(self, job):
+        self.scheduler.release(job)
+        if self.tiering and job.kind in ("text", "fast"):
+            self.tiering.observe(time.monotonic() - job.submitted)
+
+    def _idle(self) -> bool:
+        return self.scheduler.pending() == 0 and not self.tiering.using_fallback
+
+    def _upgrade(self, job):
+        """Re-run a fallback transcript as a background job of its guild, with its profile. Blocks."""
+        upgrade = TranscriptionJob(job.audio, job.guild_id, kind="upgrade", options=job.options)
+        return self._enqueue(upgrade, background=True).result()
+
+    def _measure(self):
+        return self.governor.measure() if self.governor else nullcontext()
+
+    def pending(self, guild_id=None) -> int:
+        return self.scheduler.pending(guild_id)
+
+    def _ensure_threads(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    @staticmethod
+    def _batchable(job):
+        return job.kind == "text" and job.cost <= MAX_BATCHED_DURATION
+
+    def _run(self):
+        while True:
+            batch = self.scheduler.take(self.max_batch_size, self.max_wait, accept=self._batchable)
+            try:
+                with self._measure():
+                    self.run_batch(batch)
+            except Exception as e:
+                logger.error(f"Error in transcription batch: {e}", exc_info=True)
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def run_batch(self, batch):
+        if batch[0].kind == "upgrade":
+            # Always the primary model, with the guild's profile
+            job = batch[0]
+            job.future.set_result(self.engine.transcribe_one(job.audio, options=job.options))
+            return
+        engine = self.engine
+        if self.tiering and self.tiering.use_fallback(self.scheduler.pending()):
+            engine = self.fallback
+        use_profiles = engine is not self.fallback
+
+        def options(job):
+            # The fallback model keeps its own greedy options rather than the guild's profile
+            return job.options if use_profiles else None
+
+        if batch[0].kind == "words":
+            job = batch[0]
+            job.future.set_result(engine.transcribe_words(job.audio, job.prompt, options(job)))
+            return
+        if batch[0].kind == "fast":
+            job = batch[0]
+            job.future.set_result(engine.transcribe_one(job.audio, fast=True, options=options(job)))
+            self._maybe_upgrade(engine, job)
+            return
+
+        # Guilds on different decoding profiles cannot share a generate call
+        groups = {}
+        for job in batch:
+            if job.cost <= MAX_BATCHED_DURATION:
+                key = tuple(sorted((options(job) or {}).items()))
+                groups.setdefault(key, []).append(job)
+        long = [job for job in batch if job.cost > MAX_BATCHED_DURATION]
+
+        for short in groups.values():
+            if len(short) == 1:
+                long.extend(short)
+                continue
+            logger.debug(f"Transcribing a batch of {len(short)} utterances.")
+            texts = engine.transcribe_batch([job.audio for job in short], options(short[0]))
+            for job, text in zip(short, texts):
+                job.future.set_result(text)
+                self._maybe_upgrade(engine, job)
+
+        for job in long:
+            job.future.set_result(engine.transcribe_one(job.audio, options=options(job)))
+            self._maybe_upgrade(engine, job)
+
+    def _maybe_upgrade(self, engine, job):
+        if engine is self.fallback and self.upgrader is not None and job.upgrade:
+            self.upgrader.add(job, job.upgrade)
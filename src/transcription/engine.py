@@ -0,0 +1,116 @@
+import numpy as np
+
+# Greedy decoding used when the service is overloaded: far cheaper than beam search
+FAST_OPTIONS = dict(beam_size=1, best_of=1, temperature=0.0)
+
+
+class LocalWhisperEngine:
+    """
+    Runs faster-whisper in this process.
+
+    :param models: The ``ModelManager`` holding the model. Calls block until it is loaded.
+    :param transcribe_options: Keyword arguments for ``WhisperModel.transcribe``. The batched
+        path honours ``language``, ``beam_size``, ``initial_prompt`` and ``no_speech_threshold``.
+    :param concurrency: Parallel calls the model accepts, its ``num_workers``.
+
+    Each method also takes ``options`` overriding ``transcribe_options`` for that call,
+    e.g. a guild's decoding profile.
+    """
+
+    def __init__(self, models, transcribe_options: dict, concurrency=1):
+        self.models = models
+        self.transcribe_options = transcribe_options
+        self.concurrency = concurrency
+        self._tokenizer = None
+
+    @property
+    def model(self):
+        # Blocks until the model has finished loading
+        return self.models.get()
+
+    @property
+    def status(self) -> str:
+        return self.models.status
+
+    def start_loading(self):
+        self.models.start_loading()
+
+    def recalibrate(self) -> bool:
+        """Re-run decoding profile calibration in the background, if the model has a calibrator."""
+        if not self.models.on_loaded:
+            return False
+        self.models.recalibrate()
+        return True
+
+    def _options(self, options=None, fast=False) -> dict:
+        merged = dict(self.transcribe_options, **(options or {}))
+        if fast:
+            merged.update(FAST_OPTIONS)
+        return merged
+
+    def transcribe_one(self, audio: np.ndarray, fast=False, options=None) -> str:
+        segments, info = self.model.transcribe(audio, **self._options(options, fast))
+        return "".join(segment.text for segment in segments)
+
+    def transcribe_words(self, audio: np.ndarray, initial_prompt=None, options=None) -> list:
+        """Transcribe with word timestamps, returning ``(start, end, word)`` tuples."""
+        options = dict(self._options(options), word_timestamps=True, condition_on_previous_text=False)
+        if initial_prompt:
+            options["initial_prompt"] = initial_prompt
+        segments, info = self.model.transcribe(audio, **options)
+        return [
+            (word.start, word.end, word.word)
+            for segment in segments
+            for word in (segment.words or [])
+        ]
+
+    def transcribe_batch(self, audios, options=None) -> list:
+        """Decode several utterances of at most 30 seconds with one encode and one generate call."""
+        from faster_whisper.audio import pad_or_trim
+
+        options = self._options(options)
+        model = self.model
+        tokenizer = self._get_tokenizer()
+
+        features = np.stack([
+            pad_or_trim(model.feature_extractor(audio))
+            for audio in audios
+        ])
+        initial_prompt = options.get("initial_prompt")
+        previous_tokens = tokenizer.encode(" " + initial_prompt.strip()) if initial_prompt else []
+        prompt = model.get_prompt(tokenizer, previous_tokens, without_timestamps=True)
+
+        encoder_output = model.encode(features)
+        results = model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=options.get("beam_size", 5),
+            max_length=model.max_length,
+            return_scores=True,
+            return_no_speech_prob=True,
+            suppress_blank=True,
+            suppress_tokens=[-1],
+        )
+
+        no_speech_threshold = options.get("no_speech_threshold", 0.6)
+        texts = []
+        for result in results:
+            if no_speech_threshold is not None and result.no_speech_prob > no_speech_threshold:
+                texts.append("")
+                continue
+            tokens = [token for token in result.sequences_ids[0] if token < tokenizer.eot]
+            texts.append(tokenizer.decode(tokens))
+        return texts
+
+    def _get_tokenizer(self):
+        if self._tokenizer is None:
+            from faster_whisper.tokenizer import Tokenizer
+
+            model = self.model
+            self._tokenizer = Tokenizer(
+                model.hf_tokenizer,
+                model.model.is_multilingual,
+                task="transcribe",
+                language=self.transcribe_options.get("language"),
+            )
+        return self._tokenizer
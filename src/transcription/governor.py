@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Intra-op threads of the keyword spotting model, taken out of the main model's budget
+KEYWORD_THREADS = 2
+# Intra-op threads of the fallback model, which runs alongside upgrades on the main model
+FALLBACK_THREADS = 2
+
+
+def physical_cores() -> int:
+    """Number of physical CPU cores this process may run on."""
+    try:
+        import psutil
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return _limit_to_affinity(cores)
+    except ImportError:
+        pass
+
+    cores = set()
+    try:
+        with open("/proc/cpuinfo", "r") as cpuinfo:
+            physical_id = core_id = None
+            for line in cpuinfo:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key == "physical id":
+                    physical_id = value.strip()
+                elif key == "core id":
+                    core_id = value.strip()
+                elif not key and core_id is not None:
+                    cores.add((physical_id, core_id))
+                    physical_id = core_id = None
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+    except OSError:
+        pass
+    if cores:
+        return _limit_to_affinity(len(cores))
+    # No topology information, assume two hardware threads per core
+    return _limit_to_affinity(max(1, (os.cpu_count() or 2) // 2))
+
+
+def _limit_to_affinity(cores: int) -> int:
+    try:
+        return max(1, min(cores, len(os.sched_getaffinity(0))))
+    except AttributeError:
+        return max(1, cores)
+
+
+class ResourceGovernor:
+    """
+    Sizes inference threading for the whole process from the CPU topology.
+
+    Every guild shares one batcher sized by the governor, so adding guilds adds queued work
+    rather than threads. The model gets ``num_workers`` parallel inference slots with
+    ``cpu_threads`` intra-op threads each, chosen so that together they use each physical
+    core once. Each value can be overridden. Cores used by other models, like the keyword
+    spotter's and the fallback model's, are left out with ``reserved_threads``.
+
+    Inference calls are wrapped in ``measure`` so the governor can report how busy the
+    inference slots and the CPU actually are.
+
+    :param num_workers: Parallel inference calls the model accepts (``WhisperModel`` ``num_workers``).
+    :param cpu_threads: Intra-op threads per inference call (``WhisperModel`` ``cpu_threads``).
+    :param reserved_threads: Threads other models in the process run inference on.
+    :param report_interval: Seconds between utilization log lines.
+    """
+
+    def __init__(self, num_workers=None, cpu_threads=None, reserved_threads=0, report_interval=60.0):
+        self.physical_cores = physical_cores()
+        self.reserved_threads = reserved_threads
+        self.num_workers = num_workers or (2 if self.available_cores >= 8 else 1)
+        self.cpu_threads = cpu_threads or max(1, self.available_cores // self.num_workers)
+        self.report_interval = report_interval
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._busy = 0.0
+        self._calls = 0
+        self._window_start = time.monotonic()
+        self._cpu_start = time.process_time()
+        logger.info(
+            f"Resource governor: {self.physical_cores} physical cores, {self.num_workers} inference "
+            f"workers x {self.cpu_threads} threads, {self.reserved_threads} threads reserved.")
+
+    @classmethod
+    def from_cli(cls, args):
+        return cls(
+            num_workers=args.num_workers,
+            cpu_threads=args.cpu_threads,
+            reserved_threads=(KEYWORD_THREADS if args.keyword_model else 0)
+            + (FALLBACK_THREADS if args.fallback_model else 0),
+        )
+
+    @property
+    def available_cores(self) -> int:
+        """Physical cores left for the main model."""
+        return max(1, self.physical_cores - self.reserved_threads)
+
+    @property
+    def model_options(self) -> dict:
+        """Threading keyword arguments for ``WhisperModel``."""
+        return dict(num_workers=self.num_workers, cpu_threads=self.cpu_threads)
+
+    @contextmanager
+    def measure(self):
+        """Account the wrapped block as time an inference slot was busy."""
+        started = time.monotonic()
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._busy += time.monotonic() - started
+                self._calls += 1
+            self.maybe_report()
+
+    def utilization(self, reset=False) -> dict:
+        """Share of inference slot time and CPU time used since the last reset."""
+        with self._lock:
+            now = time.monotonic()
+            cpu_now = time.process_time()
+            wall = max(now - self._window_start, 1e-9)
+            stats = {
+                "inference": self._busy / (wall * self.num_workers),
+                "cpu": (cpu_now - self._cpu_start) / (wall * self.physical_cores),
+                "calls": self._calls,
+                "active": self._active,
+            }
+            if reset:
+                self._window_start = now
+                self._cpu_start = cpu_now
+                self._busy = 0.0
+                self._calls = 0
+        return stats
+
+    def maybe_report(self):
+        if time.monotonic() - self._window_start < self.report_interval:
+            return
+        stats = self.utilization(reset=True)
+        logger.info(
+            f"Inference utilization {stats['inference']:.0%}, CPU {stats['cpu']:.0%} "
+            f"over {stats['calls']} calls.")
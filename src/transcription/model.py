@@ -0,0 +1,165 @@
+import logging
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from src.transcription.audio import WHISPER_SAMPLING_RATE
+
+# GPUs with less memory than this cannot hold large-v3 comfortably
+MIN_GPU_RAM_GB = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def _gpu_ram_gb():
+    """Total memory of the first GPU in GB, or ``None`` when nvidia-smi is unavailable."""
+    nvidia_smi = shutil.which("nvidia-smi")
+    if not nvidia_smi:
+        return None
+    try:
+        output = subprocess.run(
+            [nvidia_smi, "--query-gpu=memory.total", "--format=csv,noheader,nounits", "--id=0"],
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout
+        return float(output.strip().splitlines()[0]) / 1024
+    except Exception as e:
+        logger.debug(f"Could not read GPU memory: {e}")
+        return None
+
+
+def detect_device():
+    """Pick ``cuda`` or ``cpu`` using CTranslate2's own CUDA check, without importing torch."""
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() == 0:
+            return "cpu"
+    except Exception as e:
+        logger.debug(f"CUDA check failed: {e}")
+        return "cpu"
+
+    gpu_ram = _gpu_ram_gb()
+    if gpu_ram is not None and gpu_ram < MIN_GPU_RAM_GB:
+        logger.warning(f"GPU has less than {MIN_GPU_RAM_GB}GB of RAM. Switching to CPU.")
+        return "cpu"
+    return "cuda"
+
+
+class ModelManager:
+    """
+    Loads a faster-whisper model in the background and hands it out once it is warm.
+
+    Nothing is loaded at import time. ``start_loading`` spawns a thread that loads the
+    model and runs a short warm-up inference so the first real utterance does not pay for
+    kernel initialization. ``get`` starts loading if needed and blocks until the model is
+    ready, so callers on worker threads can use it without checking ``ready`` first.
+
+    :param model_name: faster-whisper model size or path, e.g. ``large-v3``.
+    :param compute_type: CTranslate2 compute type, or a callable returning one for the device.
+    :param on_loaded: Optional hook called as ``on_loaded(manager, model)`` after warm-up,
+        returning the model to use, e.g. a ``Calibrator``.
+    :param model_options: Extra keyword arguments for ``WhisperModel``.
+    """
+
+    def __init__(self, model_name: str, compute_type: str, on_loaded=None, **model_options):
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.on_loaded = on_loaded
+        self.model_options = model_options
+        self.device = None
+        self.error = None
+        self._model = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def status(self) -> str:
+        if self.ready:
+            return "ready"
+        if self.error:
+            return "failed"
+        if self._thread is None:
+            return "not loaded"
+        return "warming up"
+
+    def start_loading(self):
+        """Start loading the model on a background thread. Safe to call more than once."""
+        with self._lock:
+            if self.ready or (self._thread and self._thread.is_alive()):
+                return
+            self.error = None
+            self._thread = threading.Thread(target=self._load, daemon=True)
+            self._thread.start()
+
+    def load_model(self, compute_type):
+        """Load and warm up a new ``WhisperModel`` with ``compute_type``."""
+        from faster_whisper import WhisperModel
+
+        logger.info(f"Loading whisper model {self.model_name} ({compute_type}) on {self.device}.")
+        model = WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=compute_type,
+            **self.model_options,
+        )
+        self.warm_up(model)
+        return model
+
+    def _load(self):
+        try:
+            started = time.monotonic()
+            self.device = detect_device()
+            if callable(self.compute_type):
+                # e.g. DecodingProfile.compute_type, which depends on the device
+                self.compute_type = self.compute_type(self.device)
+            model = self.load_model(self.compute_type)
+            if self.on_loaded:
+                model = self.on_loaded(self, model)
+            self._model = model
+            self._ready.set()
+            logger.info(
+                f"Whisper model {self.model_name} ready in {time.monotonic() - started:.1f}s.")
+        except Exception as e:
+            self.error = e
+            logger.error(f"Error loading whisper model {self.model_name}: {e}", exc_info=True)
+
+    def recalibrate(self):
+        """Run the ``on_loaded`` hook again in the background and swap in its model."""
+        if not self.on_loaded:
+            return
+
+        def run():
+            with self._lock:
+                try:
+                    # Calls already holding the old model finish on it
+                    self._model = self.on_loaded(self, self.get())
+                except Exception as e:
+                    logger.error(f"Error recalibrating whisper model {self.model_name}: {e}", exc_info=True)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def warm_up(model):
+        """Run one short inference to initialize the encoder and decoder kernels."""
+        audio = np.random.default_rng(0).normal(0, 0.01, WHISPER_SAMPLING_RATE).astype(np.float32)
+        segments, info = model.transcribe(audio, beam_size=1, language="en")
+        list(segments)
+
+    def get(self, timeout=None):
+        """Return the loaded model, loading it first if needed."""
+        if not self.ready:
+            self.start_loading()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._ready.wait(0.5):
+                if self.error:
+                    raise RuntimeError(f"Whisper model {self.model_name} failed to load.") from self.error
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Whisper model {self.model_name} is still loading.")
+        return self._model
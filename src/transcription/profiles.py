@@ -0,0 +1,183 @@
+import logging
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+from src.transcription.audio import WHISPER_SAMPLING_RATE, audio_duration, pcm_to_whisper
+
+# Latency targets are for an utterance of this many seconds
+REFERENCE_DURATION = 5.0
+DEFAULT_CALIBRATION_AUDIO = os.path.join("assets", "calibration.wav")
+
+logger = logging.getLogger(__name__)
+
+
+class DecodingProfile:
+    """
+    A named set of decoding options and the compute type the model is loaded with.
+
+    :param compute_types: Compute type per device, ``{"cpu": ..., "cuda": ...}``.
+    :param temperature: Temperatures tried in order when a decode fails faster-whisper's
+        compression ratio or log probability checks. A single value disables the fallback.
+    """
+
+    __slots__ = ("name", "beam_size", "best_of", "temperature", "compute_types")
+
+    def __init__(self, name, beam_size, best_of, temperature, compute_types):
+        self.name = name
+        self.beam_size = beam_size
+        self.best_of = best_of
+        self.temperature = temperature
+        self.compute_types = compute_types
+
+    @property
+    def options(self) -> dict:
+        """Keyword arguments for ``WhisperModel.transcribe``."""
+        return dict(beam_size=self.beam_size, best_of=self.best_of, temperature=self.temperature)
+
+    def compute_type(self, device: str) -> str:
+        return self.compute_types.get(device, self.compute_types["cpu"])
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (
+        DecodingProfile("fast", 1, 1, (0.0,), {"cpu": "int8", "cuda": "int8_float16"}),
+        DecodingProfile("balanced", 5, 3, (0.0, 0.4, 0.8), {"cpu": "int8", "cuda": "float16"}),
+        DecodingProfile(
+            "accurate", 10, 3, (0.0, 0.2, 0.4, 0.6, 0.8, 1.0), {"cpu": "float32", "cuda": "float32"}),
+    )
+}
+# Calibration tries the most accurate profile first
+CALIBRATION_ORDER = ("accurate", "balanced", "fast")
+
+
+class DecodingProfiles:
+    """
+    The decoding profile in use, process-wide and per guild.
+
+    The default comes from ``--profile`` or from calibration. A guild can be pinned to
+    another profile; since the model is loaded once, a guild override only changes the
+    decoding options, not the compute type.
+    """
+
+    def __init__(self, default="accurate"):
+        self.default = default
+        self.latencies = {}
+        self._guilds = {}
+        self._lock = threading.Lock()
+
+    def set_guild(self, guild_id, name):
+        """Pin ``guild_id`` to profile ``name``, or back to the default with ``None``."""
+        with self._lock:
+            if name is None:
+                self._guilds.pop(guild_id, None)
+            else:
+                self._guilds[guild_id] = name
+
+    def profile_for(self, guild_id=None) -> DecodingProfile:
+        with self._lock:
+            return PROFILES[self._guilds.get(guild_id, self.default)]
+
+    def options_for(self, guild_id=None) -> dict:
+        return self.profile_for(guild_id).options
+
+
+def calibration_sample(path=DEFAULT_CALIBRATION_AUDIO) -> np.ndarray:
+    """
+    The audio calibration is timed on: the 16-bit WAV recording at ``path``, else the speech
+    clip bundled at ``DEFAULT_CALIBRATION_AUDIO``, else, as a last resort, a synthetic voiced
+    signal of ``REFERENCE_DURATION`` seconds.
+
+    Whisper emits few tokens for synthetic audio, so beam search and the temperature fallback
+    barely run and the timings favour profiles too slow for real speech.
+    """
+    for candidate in dict.fromkeys((path, DEFAULT_CALIBRATION_AUDIO)):
+        if not candidate or not os.path.exists(candidate):
+            continue
+        with wave.open(candidate, "rb") as wav:
+            if wav.getsampwidth() == 2:
+                return pcm_to_whisper(
+                    wav.readframes(wav.getnframes()), wav.getframerate(), wav.getnchannels())
+        logger.warning(f"{candidate} is not 16-bit PCM.")
+    logger.warning("No calibration recording found, timing a synthetic sample; calibration will favour slow profiles.")
+
+    # Glottal-like harmonics with a drifting pitch, shaped into four syllables a second
+    rng = np.random.default_rng(0)
+    t = np.arange(int(REFERENCE_DURATION * WHISPER_SAMPLING_RATE)) / WHISPER_SAMPLING_RATE
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / WHISPER_SAMPLING_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    syllables = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) ** 2
+    audio = 0.1 * voice * syllables + 0.003 * rng.standard_normal(len(t))
+    return audio.astype(np.float32)
+
+
+class Calibrator:
+    """
+    Picks the most accurate decoding profile that meets a latency target on this machine.
+
+    Profiles are timed from most to least accurate on ``sample``, loading the model with
+    each profile's compute type, until one transcribes ``REFERENCE_DURATION`` seconds of
+    audio within ``target_latency`` seconds. If none does, ``fast`` is used. The chosen
+    profile becomes the default in ``profiles``.
+
+    Used as a ``ModelManager`` ``on_loaded`` hook, so it runs on the loading thread before
+    the model is handed out, and can be run again on demand through ``ModelManager.recalibrate``.
+
+    :param profiles: The ``DecodingProfiles`` to update.
+    :param target_latency: Seconds allowed for a ``REFERENCE_DURATION`` second utterance.
+    :param transcribe_options: Base options, e.g. language and prompt, merged with each profile.
+    :param sample_path: Recording to calibrate on, see ``calibration_sample``.
+    """
+
+    def __init__(self, profiles, target_latency, transcribe_options=None, sample_path=DEFAULT_CALIBRATION_AUDIO):
+        self.profiles = profiles
+        self.target_latency = target_latency
+        self.transcribe_options = dict(transcribe_options or {}, vad_filter=False)
+        self.transcribe_options.pop("vad_parameters", None)
+        self.sample_path = sample_path
+
+    def measure(self, model, profile) -> float:
+        """Seconds ``model`` needs for a ``REFERENCE_DURATION`` second utterance with ``profile``."""
+        sample = calibration_sample(self.sample_path)
+        options = dict(self.transcribe_options, **profile.options)
+        # The first pass pays for kernel selection and allocations at this beam size
+        segments, info = model.transcribe(sample[: WHISPER_SAMPLING_RATE], **options)
+        list(segments)
+        started = time.perf_counter()
+        segments, info = model.transcribe(sample, **options)
+        list(segments)
+        elapsed = time.perf_counter() - started
+        return elapsed * REFERENCE_DURATION / max(audio_duration(sample), 1e-3)
+
+    def __call__(self, models, model):
+        """Calibrate, returning the model loaded with the chosen profile's compute type."""
+        loaded_type = models.compute_type
+        chosen = PROFILES["fast"]
+        for name in CALIBRATION_ORDER:
+            profile = PROFILES[name]
+            compute_type = profile.compute_type(models.device)
+            if compute_type != loaded_type:
+                # Release the previous model before loading the next one
+                model = None
+                model = models.load_model(compute_type)
+                loaded_type = compute_type
+            latency = self.measure(model, profile)
+            self.profiles.latencies[name] = latency
+            logger.info(
+                f"Profile {name} ({compute_type}): {latency:.2f}s per {REFERENCE_DURATION:.0f}s of audio.")
+            if latency <= self.target_latency:
+                chosen = profile
+                break
+
+        if chosen.compute_type(models.device) != loaded_type:
+            model = None
+            model = models.load_model(chosen.compute_type(models.device))
+        models.compute_type = chosen.compute_type(models.device)
+        self.profiles.default = chosen.name
+        logger.info(f"Using decoding profile {chosen.name} for a {self.target_latency:.1f}s target.")
+        return model
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import random
+import threading
+from concurrent.futures import Future
+
+import aiohttp
+import numpy as np
+
+from src.transcription.audio import audio_duration, encode_opus
+from src.transcription.batcher import MIN_DURATION
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteTranscriptionError(RuntimeError):
+    pass
+
+
+class RemoteWhisperClient:
+    """
+    An async, pooled client for an OpenAI-compatible ``/audio/transcriptions`` endpoint.
+
+    Audio is uploaded as Ogg/Opus, about a tenth of the size of WAV. One ``aiohttp`` session
+    with a keep-alive connection pool serves every request, at most ``max_in_flight`` run at
+    once, and rate-limit or server errors are retried with exponential backoff, honouring
+    ``Retry-After``. ``base_url`` can point at any compatible server, e.g. a local mock.
+
+    The session lives on the bot's event loop; ``submit`` may be called from any thread.
+
+    :param base_url: API root, e.g. ``https://api.openai.com/v1``.
+    :param api_key: Bearer token.
+    :param loop: The event loop requests run on.
+    :param model: Remote model name.
+    :param language: Language hint sent with each request.
+    :param max_in_flight: Most requests running at once, also the connection pool size.
+    :param retries: Retries after the first attempt.
+    :param timeout: Seconds allowed for one attempt.
+    """
+
+    def __init__(self, base_url, api_key, loop, model="whisper-1", language=None,
+                 max_in_flight=4, retries=3, timeout=30.0):
+        self.url = base_url.rstrip("/") + "/audio/transcriptions"
+        self.api_key = api_key
+        self.loop = loop
+        self.model = model
+        self.language = language
+        self.max_in_flight = max(1, max_in_flight)
+        self.retries = retries
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._session = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> str:
+        return "ready"
+
+    def start_loading(self):
+        pass
+
+    @property
+    def saturated(self) -> bool:
+        return self.pending() >= self.max_in_flight
+
+    def pending(self) -> int:
+        """Requests submitted and not yet answered."""
+        with self._lock:
+            return self._pending
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """Transcribe 16 kHz mono float32 audio. The returned future resolves to the transcript."""
+        if audio_duration(audio) <= MIN_DURATION:
+            future = Future()
+            future.set_result("")
+            return future
+        with self._lock:
+            self._pending += 1
+        future = asyncio.run_coroutine_threadsafe(self._transcribe_audio(audio), self.loop)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _transcribe_audio(self, audio: np.ndarray) -> str:
+        # Encoding up to a minute of audio would stall the caller, often the voice intake
+        # thread, or the event loop; it runs on a worker thread instead
+        return await self.transcribe(await asyncio.to_thread(encode_opus, audio))
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def transcribe(self, body: bytes) -> str:
+        async with self._slots:
+            for attempt in range(self.retries + 1):
+                delay = 0.5 * 2 ** attempt * (1 + random.random())
+                try:
+                    form = aiohttp.FormData()
+                    form.add_field("file", body, filename="audio.ogg", content_type="audio/ogg")
+                    form.add_field("model", self.model)
+                    if self.language:
+                        form.add_field("language", self.language)
+                    async with self._get_session().post(self.url, data=form) as response:
+                        if response.status == 200:
+                            return (await response.json()).get("text", "")
+                        message = await response.text()
+                        if response.status not in RETRY_STATUSES or attempt == self.retries:
+                            raise RemoteTranscriptionError(
+                                f"Transcription request failed with {response.status}: {message[:200]}")
+                        retry_after = response.headers.get("Retry-After")
+                        if retry_after:
+                            try:
+                                delay = float(retry_after)
+                            except ValueError:
+                                pass
+                        logger.warning(f"Transcription request got {response.status}, retrying in {delay:.1f}s.")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt == self.retries:
+                        raise RemoteTranscriptionError(f"Transcription request failed: {e}") from e
+                    logger.warning(f"Transcription request failed ({e}), retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
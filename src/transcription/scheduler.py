@@ -0,0 +1,176 @@
+import heapq
+import itertools
+import threading
+import time
+
+# Seconds of audio a job is credited for every second it has waited, so long jobs still run
+AGING = 0.5
+
+
+class _GuildQueue:
+    __slots__ = ("jobs", "background", "weight", "virtual_time", "in_flight")
+
+    def __init__(self, weight):
+        self.jobs = []
+        self.background = []
+        self.weight = weight
+        self.virtual_time = 0.0
+        self.in_flight = 0
+
+
+class _Slot:
+    """One guild's share of a batch; it holds a single in-flight slot until all its jobs finish."""
+
+    __slots__ = ("guild_id", "jobs")
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.jobs = 0
+
+
+class FairShareScheduler:
+    """
+    A process-wide queue of transcription jobs with weighted fair sharing between guilds.
+
+    Guilds are served in order of virtual time: every job a guild runs advances its
+    virtual time by the job's audio length divided by the guild's weight, so a guild that
+    talks non-stop cannot starve a quiet one. Inside a guild the shortest job runs first,
+    so short command phrases jump ahead of long narration; waiting time is credited back
+    so long jobs are never starved. A guild never has more than ``max_per_guild`` batches
+    running at once; the jobs it adds to one batch share a single slot, so a lone busy
+    guild can still fill whole batches.
+
+    Background jobs, like re-running a transcript on a better model, only run when no live
+    job can; they count against their guild's cap but not its virtual time or ``pending``.
+
+    Jobs need ``guild_id``, ``cost`` (seconds of audio) and ``submitted`` (monotonic time)
+    attributes. Call ``release`` when a job taken from the scheduler has finished.
+
+    :param max_per_guild: Per-guild cap on batches running at the same time.
+    :param default_weight: Share given to guilds without an explicit weight.
+    """
+
+    def __init__(self, max_per_guild=2, default_weight=1.0):
+        self.max_per_guild = max(1, max_per_guild)
+        self.default_weight = default_weight
+        self._guilds = {}
+        self._weights = {}
+        self._virtual_time = 0.0
+        self._pending = 0
+        self._slots = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def set_weight(self, guild_id, weight: float):
+        with self._condition:
+            self._weights[guild_id] = weight
+            if guild_id in self._guilds:
+                self._guilds[guild_id].weight = weight
+
+    def _guild(self, guild_id):
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = _GuildQueue(self._weights.get(guild_id, self.default_weight))
+            self._guilds[guild_id] = guild
+        return guild
+
+    def put(self, job, background=False):
+        with self._condition:
+            guild = self._guild(job.guild_id)
+            if background:
+                heapq.heappush(guild.background, (job.submitted, next(self._sequence), job))
+                self._condition.notify()
+                return
+            if not guild.jobs:
+                # A guild that was idle does not get credit for the time it was away
+                guild.virtual_time = max(guild.virtual_time, self._virtual_time)
+            key = job.cost + AGING * job.submitted
+            heapq.heappush(guild.jobs, (key, next(self._sequence), job))
+            self._pending += 1
+            self._condition.notify()
+
+    def _select(self, slots, accept=None):
+        job = self._select_from(slots, accept, background=False)
+        if job is None:
+            job = self._select_from(slots, accept, background=True)
+        return job
+
+    def _select_from(self, slots, accept, background):
+        best = None
+        for guild_id, guild in self._guilds.items():
+            jobs = guild.background if background else guild.jobs
+            if not jobs:
+                continue
+            if guild.in_flight >= self.max_per_guild and guild_id not in slots:
+                continue
+            if accept and not accept(jobs[0][2]):
+                continue
+            if best is None or guild.virtual_time < best.virtual_time:
+                best = guild
+        if best is None:
+            return None
+        if background:
+            _, _, job = heapq.heappop(best.background)
+        else:
+            _, _, job = heapq.heappop(best.jobs)
+            self._virtual_time = best.virtual_time
+            best.virtual_time += job.cost / best.weight
+            self._pending -= 1
+        slot = slots.get(job.guild_id)
+        if slot is None:
+            slot = slots[job.guild_id] = _Slot(job.guild_id)
+            best.in_flight += 1
+        slot.jobs += 1
+        self._slots[id(job)] = slot
+        return job
+
+    def take(self, max_jobs=1, max_wait=0.0, accept=None) -> list:
+        """
+        Block until a job can run, then keep collecting jobs that ``accept`` allows for up
+        to ``max_wait`` seconds or until ``max_jobs`` have been taken.
+        """
+        slots = {}
+        with self._condition:
+            job = self._select(slots)
+            while job is None:
+                self._condition.wait()
+                job = self._select(slots)
+            batch = [job]
+            if accept and not accept(job):
+                return batch
+
+            deadline = time.monotonic() + max_wait
+            while len(batch) < max_jobs:
+                job = self._select(slots, accept)
+                if job is not None:
+                    batch.append(job)
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return batch
+
+    def release(self, job):
+        with self._condition:
+            slot = self._slots.pop(id(job), None)
+            if slot is None:
+                return
+            slot.jobs -= 1
+            if slot.jobs > 0:
+                # Other jobs of the same batch are still running
+                return
+            guild = self._guilds.get(job.guild_id)
+            if guild:
+                guild.in_flight = max(0, guild.in_flight - 1)
+                if not guild.jobs and not guild.background and guild.in_flight == 0:
+                    # Keep the weight table small; virtual time restarts from the global clock
+                    del self._guilds[job.guild_id]
+            self._condition.notify_all()
+
+    def pending(self, guild_id=None) -> int:
+        with self._condition:
+            if guild_id is None:
+                return self._pending
+            guild = self._guilds.get(guild_id)
+            return len(guild.jobs) if guild else 0
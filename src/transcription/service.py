@@ -0,0 +1,105 @@
+from src.transcription.batcher import TranscriptionBatcher
+from src.transcription.engine import FAST_OPTIONS, LocalWhisperEngine
+from src.transcription.governor import FALLBACK_THREADS, KEYWORD_THREADS
+from src.transcription.model import ModelManager
+from src.transcription.profiles import PROFILES, Calibrator, DecodingProfiles
+from src.transcription.scheduler import FairShareScheduler
+from src.transcription.tiering import TierPolicy
+from src.transcription.workers import ProcessPoolEngine
+
+WHISPER_MODEL = "large-v3"
+WHISPER_LANGUAGE = "en"
+WHISPER__PRECISION = "float32"
+
+TRANSCRIBE_OPTIONS = dict(
+    language=WHISPER_LANGUAGE,
+    beam_size=10,
+    best_of=3,
+    vad_filter=True,
+    vad_parameters=dict(
+        min_silence_duration_ms=150,
+        threshold=0.8
+    ),
+    no_speech_threshold=0.6,
+    initial_prompt="You are writing the transcriptions for a D&D game.",
+)
+
+
+def create_profiles(args):
+    """Decoding profiles starting at ``--profile``; ``auto`` starts accurate until calibrated."""
+    return DecodingProfiles("accurate" if args.profile == "auto" else args.profile)
+
+
+def create_engine(governor, args, profiles):
+    """The engine selected on the command line, in worker processes or in this process."""
+    # Loaded with the profile's compute type; calibration may still pick another one
+    compute_type = PROFILES[profiles.default].compute_type
+    calibrate = args.profile == "auto"
+    if args.worker_processes:
+        return ProcessPoolEngine(
+            args.worker_processes,
+            WHISPER_MODEL,
+            compute_type,
+            dict(num_workers=1,
+                 cpu_threads=args.cpu_threads or max(1, governor.available_cores // args.worker_processes)),
+            TRANSCRIBE_OPTIONS,
+            calibration=(args.latency_target, args.calibration_audio) if calibrate else None,
+            profiles=profiles,
+        )
+    calibrator = None
+    if calibrate:
+        calibrator = Calibrator(profiles, args.latency_target, TRANSCRIBE_OPTIONS, args.calibration_audio)
+    return LocalWhisperEngine(
+        ModelManager(WHISPER_MODEL, compute_type, on_loaded=calibrator, **governor.model_options),
+        TRANSCRIBE_OPTIONS,
+        concurrency=governor.num_workers,
+    )
+
+
+def create_fallback_engine(args):
+    """The small model used under load when ``--fallback_model`` is set, decoding greedily."""
+    if not args.fallback_model:
+        return None
+    # Its own few threads, reserved by the governor, so it and the main model re-running
+    # upgrades never compete for the same cores
+    return LocalWhisperEngine(
+        ModelManager(args.fallback_model, WHISPER__PRECISION, num_workers=1, cpu_threads=FALLBACK_THREADS),
+        dict(TRANSCRIBE_OPTIONS, **FAST_OPTIONS),
+    )
+
+
+def create_keyword_engine(args, phrases):
+    """
+    The small model the keyword spotter decodes with, when ``--keyword_model`` is set.
+
+    It decodes greedily, without timestamps, and is prompted with the trigger phrases so
+    their spellings win over similar sounding words.
+    """
+    if not args.keyword_model:
+        return None
+    options = dict(
+        language=WHISPER_LANGUAGE,
+        vad_filter=False,
+        without_timestamps=True,
+        condition_on_previous_text=False,
+        initial_prompt="Voice commands: " + ", ".join(phrases) + ".",
+        **FAST_OPTIONS,
+    )
+    # A few threads are plenty for a tiny model; the governor leaves them out of the main one's budget
+    return LocalWhisperEngine(
+        ModelManager(args.keyword_model, "int8", num_workers=1, cpu_threads=KEYWORD_THREADS), options)
+
+
+def create_batcher(engine, governor, args, profiles=None):
+    fallback = create_fallback_engine(args)
+    return TranscriptionBatcher(
+        engine,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_batch_wait,
+        governor=governor,
+        scheduler=FairShareScheduler(max_per_guild=args.guild_concurrency),
+        fallback=fallback,
+        tiering=TierPolicy.from_cli(args) if fallback else None,
+        upgrade=args.upgrade_transcripts,
+        profiles=profiles,
+    )
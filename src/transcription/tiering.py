@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TierPolicy:
+    """
+    Decides when the batcher should use the fast fallback model instead of the primary one.
+
+    The switch happens when ``high_depth`` jobs are waiting or the smoothed time from
+    submission to result exceeds ``max_latency``. The primary model comes back once no more
+    than ``low_depth`` jobs are waiting and latency is under half the limit. Either switch
+    is held for at least ``min_dwell`` seconds so the tiers do not flap.
+
+    :param high_depth: Waiting jobs that trigger the fallback model.
+    :param low_depth: Waiting jobs at or below which the primary model returns.
+    :param max_latency: Seconds of submit-to-result latency that trigger the fallback model.
+    :param min_dwell: Shortest time, in seconds, spent on a tier before switching again.
+    :param alpha: Weight of the newest sample in the latency moving average.
+    """
+
+    def __init__(self, high_depth=6, low_depth=1, max_latency=4.0, min_dwell=10.0, alpha=0.2):
+        self.high_depth = high_depth
+        self.low_depth = low_depth
+        self.max_latency = max_latency
+        self.min_dwell = min_dwell
+        self.alpha = alpha
+        self.latency = 0.0
+        self.switches = 0
+        self._fallback = False
+        self._since = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_cli(cls, args):
+        return cls(
+            high_depth=args.tier_high_depth,
+            low_depth=args.tier_low_depth,
+            max_latency=args.tier_max_latency,
+        )
+
+    def observe(self, latency: float):
+        with self._lock:
+            self.latency += self.alpha * (latency - self.latency)
+
+    @property
+    def using_fallback(self) -> bool:
+        return self._fallback
+
+    def use_fallback(self, depth: int) -> bool:
+        """Whether the next batch should run on the fallback model, given ``depth`` waiting jobs."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._since < self.min_dwell:
+                return self._fallback
+            if not self._fallback and (depth >= self.high_depth or self.latency > self.max_latency):
+                self._switch(True, now)
+                logger.warning(
+                    f"Switching to the fallback model: {depth} waiting, {self.latency:.1f}s latency.")
+            elif self._fallback and depth <= self.low_depth and self.latency <= self.max_latency / 2:
+                self._switch(False, now)
+                logger.info(f"Back to the primary model: {depth} waiting, {self.latency:.1f}s latency.")
+            return self._fallback
+
+    def _switch(self, fallback, now):
+        self._fallback = fallback
+        self._since = now
+        self.switches += 1
+
+
+class BackgroundUpgrader:
+    """
+    Re-transcribes utterances the fallback model handled once the primary model is idle.
+
+    Holds at most ``max_pending`` utterances; when more arrive during a long spike the oldest
+    are forgotten and keep their fallback transcript.
+
+    :param transcribe: Callable running the primary model on one queued item, e.g. by
+        submitting it as a background job and waiting for the result.
+    :param is_idle: Callable returning ``True`` when no live work is waiting.
+    :param max_pending: Most utterances kept for upgrading.
+    """
+
+    def __init__(self, transcribe, is_idle, max_pending=100, poll_interval=0.5):
+        self.transcribe = transcribe
+        self.is_idle = is_idle
+        self.poll_interval = poll_interval
+        self.upgraded = 0
+        self._pending = deque(maxlen=max_pending)
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def add(self, item, callback):
+        """Queue ``item`` for ``transcribe``; ``callback`` receives the primary model's transcript."""
+        with self._condition:
+            self._pending.append((item, callback))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+            if not self.is_idle():
+                time.sleep(self.poll_interval)
+                continue
+            with self._condition:
+                item, callback = self._pending.popleft()
+            try:
+                text = self.transcribe(item)
+            except Exception as e:
+                logger.warning(f"Error upgrading a transcript: {e}")
+                continue
+            self.upgraded += 1
+            try:
+                callback(text)
+            except Exception as e:
+                logger.warning(f"Error storing an upgraded transcript: {e}")
@@ -0,0 +1,299 @@
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+from queue import Empty, Queue
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before restarting a worker that died, so a crash loop does not spin
+RESTART_DELAY = 5.0
+# Seconds a call waits for a free worker, long enough for a model to load after a restart
+WORKER_WAIT = 300.0
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _attach(name):
+    """Attach to a shared memory block the parent created and will unlink."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks, but spawned workers share the parent's resource
+        # tracker, so the parent's unlink still clears the registration
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(conn, model_name, compute_type, model_options, transcribe_options, calibration=None):
+    """Entry point of a worker process: load a model, then serve requests from ``conn``."""
+    from src.transcription.engine import LocalWhisperEngine
+    from src.transcription.model import ModelManager
+    from src.transcription.profiles import Calibrator, DecodingProfiles
+
+    profiles = DecodingProfiles()
+    calibrator = None
+    if calibration:
+        target_latency, sample_path = calibration
+        calibrator = Calibrator(profiles, target_latency, transcribe_options, sample_path)
+    models = ModelManager(model_name, compute_type, on_loaded=calibrator, **model_options)
+    engine = LocalWhisperEngine(models, transcribe_options)
+    models.get()
+    # Report the calibrated profile so the parent can decode with it
+    conn.send(("ready", profiles.default if calibrator else None))
+
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        kind, shm_name, offsets, prompt, options = request
+        shm = _attach(shm_name)
+        samples = audios = None
+        try:
+            samples = np.ndarray((offsets[-1],), dtype=np.float32, buffer=shm.buf)
+            audios = [samples[start:end] for start, end in zip(offsets, offsets[1:])]
+            if kind == "batch":
+                result = engine.transcribe_batch(audios, options)
+            elif kind == "words":
+                result = engine.transcribe_words(audios[0], prompt, options)
+            elif kind == "fast":
+                result = engine.transcribe_one(audios[0], fast=True, options=options)
+            else:
+                result = engine.transcribe_one(audios[0], options=options)
+            conn.send(("ok", result))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            # The views must be gone before the mapping can be closed
+            del samples, audios
+            shm.close()
+
+
+class _Worker:
+    __slots__ = ("index", "process", "conn")
+
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+
+
+class ProcessPoolEngine:
+    """
+    Runs transcription in separate worker processes, each holding its own loaded model.
+
+    Inference then never competes with the Discord event loop for the GIL, and a crash in
+    native code only takes down one worker, which is restarted automatically. Audio is
+    written once into a ``multiprocessing.shared_memory`` block and the worker reads it in
+    place, so only the block's name and sample offsets are pickled.
+
+    Has the same methods as ``LocalWhisperEngine`` so the batcher can use either.
+
+    :param processes: Number of worker processes.
+    :param model_name: faster-whisper model loaded by each worker.
+    :param compute_type: CTranslate2 compute type, or a callable returning one for the device.
+    :param model_options: Extra ``WhisperModel`` keyword arguments, e.g. ``cpu_threads``.
+    :param transcribe_options: Keyword arguments for ``WhisperModel.transcribe``.
+    :param calibration: Optional ``(target_latency, sample_path)``; each worker then runs a
+        ``Calibrator`` after loading and the profile it picks becomes the default in ``profiles``.
+    :param profiles: The ``DecodingProfiles`` calibration results are written to.
+    """
+
+    def __init__(self, processes, model_name, compute_type, model_options, transcribe_options,
+                 calibration=None, profiles=None):
+        self.concurrency = max(1, processes)
+        self.model_name = model_name
+        self.compute_type = compute_type
+        self.model_options = model_options
+        self.transcribe_options = transcribe_options
+        self.calibration = calibration
+        self.profiles = profiles
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = Queue()
+        self._workers = {}
+        self._segments = set()
+        self._ready_count = 0
+        self._started = False
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def status(self) -> str:
+        if self._ready_count > 0:
+            return "ready"
+        return "warming up" if self._started else "not loaded"
+
+    def start_loading(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for index in range(self.concurrency):
+            self._spawn(index)
+
+    def recalibrate(self) -> bool:
+        # Workers calibrate when they start; restart the bot to calibrate again
+        return False
+
+    def _spawn(self, index, delay=0.0):
+        def start():
+            if delay:
+                time.sleep(delay)
+            if self._closed:
+                return
+            parent_conn, child_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(child_conn, self.model_name, self.compute_type,
+                      self.model_options, self.transcribe_options, self.calibration),
+                name=f"whisper-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            child_conn.close()
+            worker = _Worker(index, process, parent_conn)
+            with self._lock:
+                self._workers[index] = worker
+            try:
+                status, profile = self._receive(worker)
+            except WorkerCrashed:
+                logger.error(f"Whisper worker {index} died while loading, restarting.")
+                self._restart(worker)
+                return
+            logger.info(f"Whisper worker {index} ready (pid {process.pid}).")
+            if profile and self.profiles is not None:
+                self.profiles.default = profile
+            with self._lock:
+                self._ready_count += 1
+            self._idle.put(worker)
+
+        threading.Thread(target=start, daemon=True).start()
+
+    def _restart(self, worker):
+        with self._lock:
+            self.restarts += 1
+        worker.conn.close()
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join(timeout=1)
+        self._spawn(worker.index, delay=RESTART_DELAY)
+
+    def _lost(self, worker, reason):
+        logger.error(f"{reason} Restarting it.")
+        with self._lock:
+            self._ready_count -= 1
+        self._restart(worker)
+
+    def _take_worker(self):
+        """An idle, live worker. Raises ``WorkerCrashed`` if none frees up in ``WORKER_WAIT`` or the pool closes."""
+        deadline = time.monotonic() + WORKER_WAIT
+        while not self._closed:
+            try:
+                worker = self._idle.get(timeout=min(0.5, max(0.0, deadline - time.monotonic())))
+            except Empty:
+                if time.monotonic() >= deadline:
+                    raise WorkerCrashed(f"No whisper worker became free within {WORKER_WAIT:.0f}s.")
+                continue
+            if worker.process.is_alive():
+                return worker
+            self._lost(worker, f"Whisper worker {worker.index} exited with code {worker.process.exitcode} while idle.")
+        raise WorkerCrashed("The whisper worker pool is closed.")
+
+    def _receive(self, worker):
+        while not worker.conn.poll(0.5):
+            if not worker.process.is_alive():
+                raise WorkerCrashed(
+                    f"Whisper worker {worker.index} exited with code {worker.process.exitcode}.")
+        try:
+            return worker.conn.recv()
+        except EOFError:
+            raise WorkerCrashed(f"Whisper worker {worker.index} closed its connection.")
+
+    def _call(self, kind, audios, prompt=None, options=None):
+        self.start_loading()
+        offsets = [0]
+        for audio in audios:
+            offsets.append(offsets[-1] + len(audio))
+        shm = shared_memory.SharedMemory(create=True, size=max(1, offsets[-1] * 4))
+        with self._lock:
+            self._segments.add(shm)
+        try:
+            samples = np.ndarray((offsets[-1],), dtype=np.float32, buffer=shm.buf)
+            for audio, start, end in zip(audios, offsets, offsets[1:]):
+                samples[start:end] = audio
+            del samples
+
+            # A worker can still die between being taken and being written to; the call
+            # then goes to another one
+            for attempt in range(2):
+                worker = self._take_worker()
+                try:
+                    worker.conn.send((kind, shm.name, offsets, prompt, options))
+                except OSError as e:
+                    self._lost(worker, f"Whisper worker {worker.index} is gone: {e}.")
+                    if attempt:
+                        raise WorkerCrashed(str(e)) from e
+                    continue
+                try:
+                    status, result = self._receive(worker)
+                except (WorkerCrashed, OSError) as e:
+                    self._lost(worker, str(e))
+                    raise WorkerCrashed(str(e)) from e
+                break
+            self._idle.put(worker)
+            if status == "error":
+                raise RuntimeError(f"Whisper worker {worker.index}: {result}")
+            return result
+        finally:
+            with self._lock:
+                # close() frees the segments of calls it interrupted
+                owned = shm in self._segments
+                self._segments.discard(shm)
+            if owned:
+                shm.close()
+                shm.unlink()
+
+    def transcribe_one(self, audio: np.ndarray, fast=False, options=None) -> str:
+        return self._call("fast" if fast else "one", [audio], options=options)
+
+    def transcribe_words(self, audio: np.ndarray, initial_prompt=None, options=None) -> list:
+        return self._call("words", [audio], initial_prompt, options)
+
+    def transcribe_batch(self, audios, options=None) -> list:
+        return self._call("batch", audios, options=options)
+
+    def close(self, timeout=5.0):
+        """Stop every worker process and free the shared memory of calls still running. Blocks."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers.values())
+            self._workers.clear()
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        deadline = time.monotonic() + timeout
+        for worker in workers:
+            worker.process.join(timeout=max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                # Busy with a request nobody will wait for any more
+                worker.process.terminate()
+                worker.process.join(timeout=1)
+            worker.conn.close()
+        with self._lock:
+            segments = list(self._segments)
+            self._segments.clear()
+        for shm in segments:
+            try:
+                shm.close()
+                shm.unlink()
+            except (BufferError, FileNotFoundError):
+                pass
+        logger.info(f"Stopped {len(workers)} whisper workers.")
@@ -0,0 +1,233 @@
+"""
+The bot's built-in voice commands.
+
+Each command is a coroutine taking ``(context, match)``, see ``src.triggers.registry``. They
+run as tasks on the bot's event loop, see ``src.triggers.dispatcher``.
+More commands can be added from a plugin module exposing ``register(registry)``, like
+``superSecretHiddenCode``.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+import src.chatgpt as chatgpt
+from src.bot.assets import OpusClip, encode_clip
+from src.bot.playback import CLIP, SPEECH
+from src.triggers.registry import TriggerRegistry, VoiceCommand
+
+#tts
+try:
+    from gtts import gTTS
+except ImportError:
+    os.system("pip install gTTs")
+    from gtts import gTTS
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+SHUTUP_ROLE_ID=int(os.getenv("SHUTUP_ROLE_ID"))
+ADMIN_ROLE_ID=int(os.getenv("ADMIN_ROLE_ID"))
+TIMEOUT_VC_ID=int(os.getenv("TIMEOUT_VC_ID"))
+ANT_COLONY_ROLE_ID=int(os.getenv("ANT_COLONY_ROLE_ID"))
+
+with open("nameDictionary.json","r") as f:
+    nameDictionary=json.loads(f.read())
+
+# Plugins imported when the registry is created
+PLUGINS = ("superSecretHiddenCode",)
+
+# Sound clips fetched and encoded when the bot starts, see ``src.bot.assets``
+CLIPS = {
+    "toilet": "https://www.youtube.com/watch?v=jnPKQV_ifYM",
+    "diggin": "https://www.youtube.com/watch?v=QwtSnk84yZU",
+    # "taco": "https://www.youtube.com/watch?v=UaMKUVxidpM",
+}
+ATTACHMENTS = {
+    "dancing rat": "assets/dancing-rat.gif",
+}
+
+
+def register_assets(assets):
+    """Configure the clips and attachments the built-in commands use on an ``AssetManager``."""
+    for name, url in CLIPS.items():
+        assets.add_clip(name, url)
+    for name, path in ATTACHMENTS.items():
+        assets.add_attachment(name, path)
+
+
+def speak(text) -> OpusClip:
+    """Synthesize ``text`` and encode it for playback, in memory. Blocks."""
+    buffer = io.BytesIO()
+    gTTS(text=text, lang="en").write_to_fp(buffer)
+    buffer.seek(0)
+    return OpusClip("tts", encode_clip(buffer))
+
+
+# Role removals still pending; the loop only keeps weak references to tasks
+_role_timers = set()
+
+
+async def remove_role_later(member, role, delay):
+    await asyncio.sleep(delay)
+    await member.remove_roles(role)
+    logger.info(f"Removed {role.name} from {member.display_name}")
+
+
+async def play_clip(context, name):
+    sink = context.sink
+    clip = await sink.bot.assets.get(name)
+    await sink.bot.playback(sink.vc).play(clip, CLIP)
+
+
+async def add_timed_role(context, match, role_id, delay):
+    """Give the member named by the argument a role for ``delay`` seconds."""
+    user_id = context.sink.convertName(match.argument)
+    if not user_id:
+        return
+    cache = context.sink.bot.cache
+    member = await cache.member(context.sink.guild, user_id)
+    role = await cache.role(member.guild, role_id)
+    if role is None:
+        logger.warning("Role not found.")
+        return
+    await member.add_roles(role)
+    timer = asyncio.create_task(remove_role_later(member, role, delay))
+    _role_timers.add(timer)
+    timer.add_done_callback(_role_timers.discard)
+    logger.info(f"Added {role.name} to {member.display_name}")
+
+
+async def echo(context, match):
+    await context.sink.listenerChannel.send("<@"+str(context.speaker.user)+">: "+context.transcription)
+
+
+async def omni(context, match):
+    user_id = str(context.speaker.user)
+    logger.info(f"{user_id} is omni-ing it")
+    await context.sink.listenerChannel.send("<@"+user_id+"> is Omni-ing it.")
+
+
+async def skibidi_toilet(context, match):
+    logger.info("activating skibidi toilet")
+    await play_clip(context, "toilet")
+
+
+async def shut_up(context, match):
+    await add_timed_role(context, match, SHUTUP_ROLE_ID, 100)
+
+
+async def ant_colony(context, match):
+    logger.info("Triggering Ant Colony")
+    await add_timed_role(context, match, ANT_COLONY_ROLE_ID, 20)
+
+
+async def soccer_ball(context, match):
+    sink = context.sink
+    user_id = sink.convertName(match.argument)
+    if not user_id:
+        return
+    if user_id == sink.bot.user.id:
+        logger.info("Bot cannot kick itself")
+        return
+    member = await sink.bot.cache.member(sink.guild, user_id)
+    if any(r.id == ADMIN_ROLE_ID for r in member.roles):
+        logger.info("Cannot kick an admin")
+        return
+    await member.move_to(None)
+
+
+async def sit_in_the_corner(context, match):
+    sink = context.sink
+    user_id = sink.convertName(match.argument)
+    if not user_id:
+        return
+    if user_id == sink.bot.user.id:
+        logger.info("Bot cannot timeout itself")
+        return
+    cache = sink.bot.cache
+    member = await cache.member(sink.guild, context.speaker.user)
+    target = await cache.member(sink.guild, user_id)
+    if any(r.id == ADMIN_ROLE_ID for r in member.roles) or not any(r.id == ADMIN_ROLE_ID for r in target.roles):
+        channel = await cache.channel(sink.guild, TIMEOUT_VC_ID)
+        await target.move_to(channel)
+    else:
+        logger.info("Cannot timeout an admin")
+
+
+async def cheese(context, match):
+    gif = context.sink.bot.assets.attachment("dancing rat")
+    await context.sink.listenerChannel.send("<@"+str(context.speaker.user)+">:", file=gif)
+
+
+async def hey_bot(context, match):
+    sink = context.sink
+    prompt = "history: "+";".join(context.memory)+"New message: "+ context.speaker.player+": "+ context.text
+    logger.info("Prompt: "+prompt)
+    msg = await chatgpt.get_chatgpt_response(prompt)
+    logger.info(msg)
+    clip = await asyncio.to_thread(speak, msg)
+    await sink.bot.playback(sink.vc).play(clip, SPEECH)
+
+
+async def diggin(context, match):
+    logger.info("activating diggin in yo butt")
+    await play_clip(context, "diggin")
+
+
+# async def taco(context, match):
+#     logger.info("activating nom nom nom")
+#     await play_clip(context, "taco")
+
+
+BUILTIN_COMMANDS = (
+    VoiceCommand("test", ("test",), echo),
+    VoiceCommand("omni", ("i'm omni-ing it",), omni),
+    VoiceCommand(
+        "skibidi toilet",
+        ("skippity toilet time", "skibbity toilet time", "skibbity-toilet time"),
+        skibidi_toilet,
+        early=True,
+        cooldown=5.0,
+    ),
+    VoiceCommand("shut up", ("shut up",), shut_up, argument=True, early=True),
+    VoiceCommand(
+        "ant colony",
+        ("why don't you go study an ant colony", "why don't you go study in ant colony"),
+        ant_colony,
+        argument=True,
+        early=True,
+    ),
+    VoiceCommand("soccer ball", ("what do you do with a soccer ball",), soccer_ball, argument=True, early=True),
+    VoiceCommand("corner", ("go sit in the corner",), sit_in_the_corner, argument=True, early=True),
+    VoiceCommand("cheese", ("cheese",), cheese, repeat=True, early=True),
+    # Each reply is a chat completion and a TTS request
+    VoiceCommand("hey bot", ("hey bot",), hey_bot, cooldown=5.0),
+    VoiceCommand("butt", ("butt",), diggin, early=True, cooldown=5.0),
+    # VoiceCommand("taco", ("taco",), taco, early=True, cooldown=5.0),
+)
+
+
+def register_legacy_plugin(registry, module):
+    """Run a plugin that only defines ``super_secret_code(sink, text, speaker, channel)`` on every utterance."""
+    hook = getattr(module, "super_secret_code", None)
+    if hook is None or getattr(module, "register", None):
+        return
+    registry.register(VoiceCommand(
+        module.__name__,
+        (),
+        lambda context, match: hook(context.sink, context.text, context.speaker, context.sink.generalChat),
+    ))
+
+
+def create_registry(plugins=PLUGINS) -> TriggerRegistry:
+    """The built-in commands plus those of every installed plugin."""
+    registry = TriggerRegistry(BUILTIN_COMMANDS)
+    for name in plugins:
+        module = registry.load_plugin(name)
+        if module is not None:
+            register_legacy_plugin(registry, module)
+    return registry
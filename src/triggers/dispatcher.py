@@ -0,0 +1,105 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class TriggerDispatcher:
+    """
+    Runs one guild's voice command handlers as fire-and-forget tasks on the bot's event loop.
+
+    ``run`` can be called from any thread and returns at once, so the threads feeding the
+    model never wait on Discord. At most ``concurrency`` handlers run at a time and at most
+    ``max_waiting`` wait for a turn; further triggers are dropped. Each handler gets
+    ``timeout`` seconds, and a command does not fire again within its cooldown. Coroutine
+    handlers run on the loop; plain functions, like legacy plugins, run on a worker thread.
+
+    Every outcome is counted per command, see ``snapshot``.
+
+    :param loop: The bot's event loop.
+    :param prepare: Optional coroutine function awaited before each handler, e.g. to fetch
+        the guild the handlers act on.
+    :param concurrency: Handlers running at once.
+    :param timeout: Seconds a handler may take before it is cancelled.
+    :param cooldown: Shortest time between two runs of a command, for commands without a
+        longer cooldown of their own.
+    :param max_waiting: Handlers waiting for a free slot before further triggers are dropped.
+    """
+
+    def __init__(self, loop, prepare=None, concurrency=4, timeout=30.0, cooldown=0.0, max_waiting=16):
+        self.loop = loop
+        self.prepare = prepare
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.max_waiting = max_waiting
+        self._slots = None
+        self._waiting = 0
+        self._last_run = {}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def run(self, context, matches, catch_all=()):
+        """Start the handlers of ``matches``, then of the ``catch_all`` commands without phrases."""
+        for match in matches:
+            self.dispatch(match.command, context, match)
+        for command in catch_all:
+            self.dispatch(command, context, None)
+
+    def dispatch(self, command, context, match) -> bool:
+        """Start one handler. Returns ``False`` if it was cooling down or dropped."""
+        now = time.monotonic()
+        cooldown = max(command.cooldown, self.cooldown)
+        with self._lock:
+            last = self._last_run.get(command.name)
+            if cooldown and last is not None and now - last < cooldown:
+                self._counts[(command.name, "cooled_down")] += 1
+                return False
+            if self._waiting >= self.max_waiting:
+                self._counts[(command.name, "dropped")] += 1
+                logger.warning(f"Dropped voice command {command.name}, {self._waiting} commands waiting.")
+                return False
+            self._last_run[command.name] = now
+            self._waiting += 1
+            self._counts[(command.name, "dispatched")] += 1
+        asyncio.run_coroutine_threadsafe(self._run(command, context, match), self.loop)
+        return True
+
+    async def _run(self, command, context, match):
+        if self._slots is None:
+            # Created on the loop it is used from
+            self._slots = asyncio.Semaphore(self.concurrency)
+        async with self._slots:
+            with self._lock:
+                self._waiting -= 1
+            outcome = "completed"
+            try:
+                await asyncio.wait_for(self._call(command, context, match), self.timeout)
+            except asyncio.TimeoutError:
+                outcome = "timed_out"
+                logger.warning(f"Voice command {command.name} timed out after {self.timeout:.0f}s.")
+            except Exception as e:
+                outcome = "failed"
+                logger.error(f"Error in voice command {command.name}: {e}", exc_info=True)
+            with self._lock:
+                self._counts[(command.name, outcome)] += 1
+
+    async def _call(self, command, context, match):
+        if self.prepare:
+            await self.prepare()
+        if inspect.iscoroutinefunction(command.handler):
+            await command.handler(context, match)
+        else:
+            await asyncio.to_thread(command.handler, context, match)
+
+    def snapshot(self) -> dict:
+        """``{command: {outcome: count}}`` for every command dispatched so far."""
+        with self._lock:
+            counts = {}
+            for (name, outcome), count in self._counts.items():
+                counts.setdefault(name, {})[outcome] = count
+            return counts
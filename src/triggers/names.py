@@ -0,0 +1,281 @@
+import logging
+import re
+import threading
+import unicodedata
+from difflib import SequenceMatcher
+
+logger = logging.getLogger(__name__)
+
+VOWELS = "AEIOU"
+# Confidence of each way a query can match a name
+EXACT = 1.0
+TOKEN = 0.95
+PREFIX = 0.85
+PHONETIC = 0.75
+FUZZY = 0.6
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase ``name``, strip accents and keep letters, digits and single spaces."""
+    name = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", name.lower()).split())
+
+
+def metaphone(word: str) -> str:
+    """
+    The Metaphone key of ``word``: names that sound alike, like "Jon" and "John" or
+    "Kathy" and "Cathy", get the same key. Digits are dropped.
+    """
+    word = re.sub(r"[^A-Z]", "", word.upper())
+    if not word:
+        return ""
+    if word[:2] in ("AE", "GN", "KN", "PN", "WR"):
+        word = word[1:]
+    if word[0] == "X":
+        word = "S" + word[1:]
+    elif word[:2] == "WH":
+        word = "W" + word[2:]
+
+    key = []
+    length = len(word)
+    for i, letter in enumerate(word):
+        before = word[i - 1] if i > 0 else ""
+        after = word[i + 1] if i + 1 < length else ""
+        after2 = word[i + 2] if i + 2 < length else ""
+        if letter == before and letter != "C":
+            continue
+        if letter in VOWELS:
+            if i == 0:
+                key.append(letter)
+        elif letter == "B":
+            if not (before == "M" and i == length - 1):
+                key.append("B")
+        elif letter == "C":
+            if after == "I" and after2 == "A" or after == "H":
+                key.append("K" if before == "S" else "X")
+            elif after in "IEY" and after:
+                if before != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif letter == "D":
+            key.append("J" if after == "G" and after2 in "EIY" and after2 else "T")
+        elif letter == "G":
+            if after == "H" and after2 and after2 not in VOWELS:
+                continue
+            if after == "N" and (i + 2 == length or word[i + 2:] == "ED"):
+                continue
+            if before == "D" and after in "EIY" and after:
+                continue
+            key.append("J" if after in "EIY" and after and before != "G" else "K")
+        elif letter == "H":
+            if before in "CSPTG" and before:
+                continue
+            if before in VOWELS and before and after not in VOWELS:
+                continue
+            key.append("H")
+        elif letter == "K":
+            if before != "C":
+                key.append("K")
+        elif letter == "P":
+            key.append("F" if after == "H" else "P")
+        elif letter == "Q":
+            key.append("K")
+        elif letter == "S":
+            if after == "H" or after == "I" and after2 in ("O", "A"):
+                key.append("X")
+            else:
+                key.append("S")
+        elif letter == "T":
+            if after == "I" and after2 in ("O", "A"):
+                key.append("X")
+            elif after == "H":
+                key.append("0")
+            elif not (after == "C" and after2 == "H"):
+                key.append("T")
+        elif letter == "V":
+            key.append("F")
+        elif letter == "W" or letter == "Y":
+            if after in VOWELS and after:
+                key.append(letter)
+        elif letter == "X":
+            key.append("KS")
+        elif letter == "Z":
+            key.append("S")
+        else:
+            key.append(letter)
+    return "".join(key)
+
+
+def sound_key(token: str) -> str:
+    """The Metaphone key used for lookups, with "sh" folded into "s" so "Sean" finds "Shawn"."""
+    return metaphone(token).replace("X", "S")
+
+
+def trigrams(token: str) -> set:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameCandidate:
+    """A member a spoken name may refer to, with how sure the match is, from 0 to 1."""
+
+    __slots__ = ("user_id", "name", "confidence")
+
+    def __init__(self, user_id, name, confidence):
+        self.user_id = user_id
+        self.name = name
+        self.confidence = confidence
+
+    def __repr__(self):
+        return f"NameCandidate({self.user_id}, {self.name!r}, {self.confidence:.2f})"
+
+
+class NameIndex:
+    """
+    Resolves a name heard in a voice command to the guild members it may refer to.
+
+    Every display name, username and global name, ``player_map`` player and character,
+    and ``nameDictionary`` alias is indexed under its normalized form, each of its words,
+    their Metaphone keys and their trigrams. A lookup is a handful of dictionary reads:
+    exact and word matches first, then words the query starts, then words that sound the
+    same, then words sharing enough trigrams, so a name Whisper misheard still finds its
+    member. Only the few names found that way are scored.
+
+    The index is built once and kept current from member events, see ``member_changed``.
+
+    :param guild_id: The guild indexed; events about members of other guilds are ignored.
+    """
+
+    def __init__(self, guild_id=None):
+        self.guild_id = guild_id
+        self._names = {}
+        self._aliases = {}
+        self._exact = {}
+        self._tokens = {}
+        self._phonetic = {}
+        self._trigrams = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, members=(), player_map=None, aliases=None, guild_id=None):
+        """
+        :param members: ``discord.Member`` objects.
+        :param player_map: ``{user_id: {"player": ..., "character": ...}}``.
+        :param aliases: ``{alias: user_id}``, e.g. ``nameDictionary.json``.
+        """
+        index = cls(guild_id)
+        for member in members:
+            index.add_member(member)
+        for user_id, names in (player_map or {}).items():
+            for key in ("player", "character"):
+                if names.get(key):
+                    index.add(int(user_id), names[key], alias=True)
+        for alias, user_id in (aliases or {}).items():
+            index.add(int(user_id), alias, alias=True)
+        logger.debug(f"Indexed {len(index._names)} names.")
+        return index
+
+    def add(self, user_id: int, name: str, alias=False):
+        """Index ``name`` for ``user_id``. Aliases are configured names, kept when the member's own names change."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return
+        with self._lock:
+            if alias:
+                self._aliases.setdefault(user_id, set()).add(name)
+            self._names.setdefault(user_id, set()).add(normalized)
+            self._exact.setdefault(normalized, set()).add(user_id)
+            for token in normalized.split():
+                self._tokens.setdefault(token, set()).add(user_id)
+                self._phonetic.setdefault(sound_key(token), set()).add(token)
+                for gram in trigrams(token):
+                    self._trigrams.setdefault(gram, set()).add(token)
+
+    def add_member(self, member):
+        for name in (member.display_name, member.name, getattr(member, "global_name", None)):
+            if name:
+                self.add(member.id, name)
+
+    def remove(self, user_id: int):
+        """Forget the names of ``user_id``. Their words stay in the phonetic and trigram keys and resolve to nobody."""
+        with self._lock:
+            for name in self._names.pop(user_id, ()):
+                self._discard(self._exact, name, user_id)
+                for token in name.split():
+                    self._discard(self._tokens, token, user_id)
+
+    @staticmethod
+    def _discard(index, key, user_id):
+        users = index.get(key)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del index[key]
+
+    def member_changed(self, event: str, member):
+        """A ``GuildCache`` listener: reindex a member whose names changed, or drop one who left."""
+        if self.guild_id is not None and member.guild.id != self.guild_id:
+            return
+        self.remove(member.id)
+        if event == "remove":
+            return
+        # Drops a changed nickname but keeps the configured aliases
+        for alias in self._aliases.get(member.id, ()):
+            self.add(member.id, alias)
+        self.add_member(member)
+
+    def resolve(self, spoken: str, limit=5) -> list:
+        """The members ``spoken`` may refer to, most likely first, as ``NameCandidate`` objects."""
+        query = normalize_name(spoken)
+        if not query:
+            return []
+        scores = {}
+
+        def score(users, name, confidence):
+            for user_id in users:
+                if confidence > scores.get(user_id, (0.0, ""))[0]:
+                    scores[user_id] = (confidence, name)
+
+        with self._lock:
+            score(self._exact.get(query, ()), query, EXACT)
+            for word in query.split():
+                score(self._tokens.get(word, ()), word, TOKEN)
+                # Words that sound alike, then words that look alike
+                similar = set(self._phonetic.get(sound_key(word), ()))
+                grams = trigrams(word)
+                shared = {}
+                for gram in grams:
+                    for token in self._trigrams.get(gram, ()):
+                        shared[token] = shared.get(token, 0) + 1
+                for token, count in shared.items():
+                    if token.startswith(word) or count / len(grams | trigrams(token)) >= 0.4:
+                        similar.add(token)
+                for token in similar:
+                    users = self._tokens.get(token)
+                    if not users or token == word:
+                        continue
+                    likeness = SequenceMatcher(None, word, token).ratio()
+                    if token.startswith(word):
+                        confidence = PREFIX
+                    elif sound_key(token) == sound_key(word):
+                        confidence = PHONETIC * (0.8 + 0.2 * likeness)
+                    else:
+                        confidence = FUZZY * likeness
+                    score(users, token, confidence)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1][0], reverse=True)
+        return [NameCandidate(user_id, name, confidence) for user_id, (confidence, name) in ranked[:limit]]
+
+    def best(self, spoken: str, min_confidence=0.5, margin=0.05):
+        """
+        The member ``spoken`` refers to, or ``None`` when no name matches well enough or two
+        members match about equally well.
+        """
+        candidates = self.resolve(spoken, limit=2)
+        if not candidates or candidates[0].confidence < min_confidence:
+            return None
+        if len(candidates) > 1 and candidates[0].confidence - candidates[1].confidence < margin:
+            logger.info(f"{spoken!r} is ambiguous: {candidates}")
+            return None
+        return candidates[0]
@@ -0,0 +1,187 @@
+import importlib
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text: str) -> str:
+    """Lowercase ``text``, turn punctuation other than apostrophes and hyphens into spaces and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s'-]", " ", text.lower()).split())
+
+
+class VoiceCommand:
+    """
+    A voice trigger: the phrases that fire it and the handler it runs.
+
+    :param name: Unique name, used in logs and to tell fired triggers apart.
+    :param phrases: Spellings that fire the command, including the ways Whisper mishears
+        it. Matched anywhere in the normalized transcription. A command without phrases
+        runs on every utterance.
+    :param handler: Coroutine function called as ``handler(context, match)`` with a
+        ``TriggerContext`` and the ``TriggerMatch``, which is ``None`` for commands without
+        phrases. A plain function is run on a worker thread.
+    :param argument: Whether the command acts on the word after the phrase, e.g. a name.
+        It does not fire without one.
+    :param repeat: Run once per occurrence instead of once per utterance.
+    :param early: Whether the keyword spotter may fire it before the utterance is over.
+        Leave unset for commands that need the whole utterance.
+    :param cooldown: Shortest time in seconds between two runs in the same guild.
+    """
+
+    __slots__ = ("name", "phrases", "handler", "argument", "repeat", "early", "cooldown")
+
+    def __init__(self, name, phrases, handler, argument=False, repeat=False, early=False, cooldown=0.0):
+        self.name = name
+        self.phrases = tuple(normalize(phrase) for phrase in phrases)
+        self.handler = handler
+        self.argument = argument
+        self.repeat = repeat
+        self.early = early
+        self.cooldown = cooldown
+
+    def __repr__(self):
+        return f"VoiceCommand({self.name!r})"
+
+
+class TriggerMatch:
+    """One occurrence of a command's phrase in a transcription."""
+
+    __slots__ = ("command", "phrase", "argument", "start", "end")
+
+    def __init__(self, command, phrase, argument, start, end):
+        self.command = command
+        self.phrase = phrase
+        self.argument = argument
+        self.start = start
+        self.end = end
+
+    @property
+    def text(self) -> str:
+        return f"{self.phrase} {self.argument}" if self.argument else self.phrase
+
+
+class TriggerContext:
+    """
+    What a handler gets to act on.
+
+    :param sink: The ``WhisperSink`` of the guild the utterance was heard in.
+    :param speaker: The ``Speaker`` who said it.
+    :param transcription: The transcription as Whisper wrote it.
+    :param text: The transcription lowercased and stripped.
+    :param memory: The conversation so far, as it was before this utterance.
+    """
+
+    __slots__ = ("sink", "speaker", "transcription", "text", "memory")
+
+    def __init__(self, sink, speaker, transcription, text, memory=()):
+        self.sink = sink
+        self.speaker = speaker
+        self.transcription = transcription
+        self.text = text
+        self.memory = memory
+
+
+class TriggerRegistry:
+    """
+    The voice commands, matched against a transcription in a single pass.
+
+    Every phrase of every command is compiled into one alternation, longest phrases
+    first so a spelling is never shadowed by a shorter one it contains, followed by an
+    optional argument slot. ``match`` scans the transcription once however many commands
+    are registered.
+    """
+
+    def __init__(self, commands=()):
+        self._commands = {}
+        self._by_phrase = {}
+        self._pattern = None
+        for command in commands:
+            self.register(command)
+
+    @property
+    def commands(self) -> list:
+        return list(self._commands.values())
+
+    def register(self, command: VoiceCommand) -> VoiceCommand:
+        if command.name in self._commands:
+            raise ValueError(f"A voice command named {command.name!r} is already registered.")
+        for phrase in command.phrases:
+            if phrase in self._by_phrase:
+                raise ValueError(
+                    f"{phrase!r} already fires {self._by_phrase[phrase].name!r}, not {command.name!r}.")
+        self._commands[command.name] = command
+        for phrase in command.phrases:
+            self._by_phrase[phrase] = command
+        self._pattern = None
+        return command
+
+    def command(self, name, *phrases, argument=False, repeat=False, early=False, cooldown=0.0):
+        """Decorator registering a handler as a ``VoiceCommand``."""
+        def decorator(handler):
+            self.register(VoiceCommand(name, phrases, handler, argument, repeat, early, cooldown))
+            return handler
+        return decorator
+
+    def load_plugin(self, module_name: str):
+        """
+        Import ``module_name`` and let it register its commands through ``register(registry)``.
+
+        Returns the module, or ``None`` when it is not installed.
+        """
+        try:
+            module = importlib.import_module(module_name)
+        except ImportError:
+            logger.debug(f"Voice command plugin {module_name} is not installed.")
+            return None
+        register = getattr(module, "register", None)
+        if register:
+            register(self)
+            logger.info(f"Loaded voice command plugin {module_name}.")
+        return module
+
+    @property
+    def catch_all(self) -> list:
+        """Commands without phrases, run on every utterance."""
+        return [command for command in self._commands.values() if not command.phrases]
+
+    def phrases(self, early=False) -> list:
+        """Every registered phrase, or only those the keyword spotter may fire."""
+        return [
+            phrase for phrase, command in self._by_phrase.items() if command.early or not early
+        ]
+
+    def _compile(self):
+        phrases = sorted(self._by_phrase, key=len, reverse=True)
+        if not phrases:
+            # Matches nothing
+            return re.compile(r"(?!)")
+        return re.compile(
+            "(?P<phrase>" + "|".join(re.escape(phrase) for phrase in phrases) + ")"
+            # The argument is looked ahead at, not consumed, so it can start another command
+            r"(?:(?= (?P<argument>[\w'-]+)))?"
+        )
+
+    def match(self, text: str) -> list:
+        """
+        The commands ``text`` fires, in the order they were said.
+
+        Commands taking an argument are skipped when the phrase ends the text. A command
+        matches once unless it is registered with ``repeat``.
+        """
+        if self._pattern is None:
+            self._pattern = self._compile()
+        matches = []
+        seen = set()
+        for found in self._pattern.finditer(normalize(text)):
+            command = self._by_phrase[found.group("phrase")]
+            argument = found.group("argument")
+            if command.argument and not argument:
+                continue
+            if command.name in seen and not command.repeat:
+                continue
+            seen.add(command.name)
+            matches.append(TriggerMatch(
+                command, found.group("phrase"), argument if command.argument else None,
+                found.start(), found.end()))
+        return matches
@@ -38,4 +38,264 @@ class CommandLine:
             help="Enable verbose logging"
         )
 
+        parser.add_argument(
+            "--max_batch_size",
+            type=int,
+            default=8,
+            help="Most utterances transcribed together in one batched inference call"
+        )
+
+        parser.add_argument(
+            "--max_batch_wait",
+            type=float,
+            default=0.05,
+            help="Seconds to wait for more utterances before running a batch"
+        )
+
+        parser.add_argument(
+            "--vad",
+            type=CommandLine()._str2bool,
+            default=True,
+            help="Drop silent packets and trim silence from utterances before transcription"
+        )
+
+        parser.add_argument(
+            "--stream_window",
+            type=float,
+            default=10.0,
+            help="Seconds of continuous speech before partial transcription starts, 0 disables streaming"
+        )
+
+        parser.add_argument(
+            "--stream_step",
+            type=float,
+            default=2.0,
+            help="Seconds of new speech between partial transcriptions"
+        )
+
+        parser.add_argument(
+            "--keyword_model",
+            type=str,
+            default="",
+            help="Small whisper model spotting voice triggers while people talk, e.g. tiny.en; off when empty"
+        )
+
+        parser.add_argument(
+            "--keyword_window",
+            type=float,
+            default=2.0,
+            help="Seconds of the latest speech searched for voice triggers"
+        )
+
+        parser.add_argument(
+            "--keyword_step",
+            type=float,
+            default=0.5,
+            help="Seconds of new speech between two searches for voice triggers"
+        )
+
+        parser.add_argument(
+            "--trigger_concurrency",
+            type=int,
+            default=4,
+            help="Voice command actions running at once per server"
+        )
+
+        parser.add_argument(
+            "--trigger_timeout",
+            type=float,
+            default=30.0,
+            help="Seconds a voice command action may take before it is cancelled"
+        )
+
+        parser.add_argument(
+            "--trigger_cooldown",
+            type=float,
+            default=0.0,
+            help="Shortest time in seconds between two runs of the same voice command"
+        )
+
+        parser.add_argument(
+            "--asset_cache_mb",
+            type=int,
+            default=64,
+            help="Memory in MB kept for sound clips encoded for playback"
+        )
+
+        parser.add_argument(
+            "--playback_voices",
+            type=int,
+            default=4,
+            help="Sound clips and spoken replies mixed at once per server"
+        )
+
+        parser.add_argument(
+            "--duck_volume",
+            type=float,
+            default=0.3,
+            help="Volume of sound clips while a spoken reply plays over them, from 0 to 1"
+        )
+
+        parser.add_argument(
+            "--min_hangover",
+            type=float,
+            default=0.4,
+            help="Shortest silence in seconds that ends an utterance"
+        )
+
+        parser.add_argument(
+            "--max_hangover",
+            type=float,
+            default=2.0,
+            help="Longest silence in seconds to wait before an utterance is ended"
+        )
+
+        parser.add_argument(
+            "--num_workers",
+            type=CommandLine()._optional_int,
+            default=None,
+            help="Parallel inference calls for the whisper model, detected from the CPU when unset"
+        )
+
+        parser.add_argument(
+            "--cpu_threads",
+            type=CommandLine()._optional_int,
+            default=None,
+            help="Threads per inference call, physical cores divided by workers when unset"
+        )
+
+        parser.add_argument(
+            "--guild_concurrency",
+            type=int,
+            default=2,
+            help="Most transcription batches one guild may have running at once"
+        )
+
+        parser.add_argument(
+            "--worker_processes",
+            type=int,
+            default=0,
+            help="Run transcription in this many worker processes, each with its own model. 0 runs it in the bot process"
+        )
+
+        parser.add_argument(
+            "--voice_queue_size",
+            type=int,
+            default=3000,
+            help="Most voice packets buffered per guild before the oldest silence is dropped (about 60 seconds)"
+        )
+
+        parser.add_argument(
+            "--overload_policy",
+            choices=["degrade", "spill", "shed"],
+            default="degrade",
+            help="What to do with utterances when transcription falls behind: decode them greedily, "
+                 "spill them to disk for later, or drop them"
+        )
+
+        parser.add_argument(
+            "--max_pending",
+            type=int,
+            default=8,
+            help="Utterances a guild may have waiting for transcription before the overload policy applies"
+        )
+
+        parser.add_argument(
+            "--max_speaker_backlog",
+            type=int,
+            default=3,
+            help="Utterances one speaker may have in transcription before the overload policy applies"
+        )
+
+        parser.add_argument(
+            "--compressed_audio",
+            type=CommandLine()._str2bool,
+            default=False,
+            help="Buffer speakers as undecoded Opus packets and decode them only for transcription"
+        )
+
+        parser.add_argument(
+            "--amqp_in_flight",
+            type=int,
+            default=32,
+            help="Most utterances awaiting a reply from the AMQP transcription workers"
+        )
+
+        parser.add_argument(
+            "--amqp_timeout",
+            type=float,
+            default=120.0,
+            help="Seconds before an utterance sent to the AMQP transcription workers is given up on"
+        )
+
+        parser.add_argument(
+            "--amqp_prefetch",
+            type=CommandLine()._optional_int,
+            default=None,
+            help="Requests an AMQP transcription worker takes at once, a full batch per inference slot when unset"
+        )
+
+        parser.add_argument(
+            "--fallback_model",
+            type=str,
+            default=None,
+            help="Small whisper model, e.g. small.en, kept loaded and used while the large model is backlogged"
+        )
+
+        parser.add_argument(
+            "--tier_high_depth",
+            type=int,
+            default=6,
+            help="Waiting utterances that switch transcription to the fallback model"
+        )
+
+        parser.add_argument(
+            "--tier_low_depth",
+            type=int,
+            default=1,
+            help="Waiting utterances at or below which transcription switches back to the large model"
+        )
+
+        parser.add_argument(
+            "--tier_max_latency",
+            type=float,
+            default=4.0,
+            help="Seconds of transcription latency that switch to the fallback model"
+        )
+
+        parser.add_argument(
+            "--upgrade_transcripts",
+            type=CommandLine()._str2bool,
+            default=False,
+            help="Re-transcribe fallback utterances with the large model when idle and replace their transcript"
+        )
+
+        parser.add_argument(
+            "--remote_in_flight",
+            type=int,
+            default=4,
+            help="Most transcription requests running against the OpenAI API at once"
+        )
+
+        parser.add_argument(
+            "--profile",
+            choices=["auto", "fast", "balanced", "accurate"],
+            default="accurate",
+            help="Decoding profile; auto calibrates for --latency_target when the model loads"
+        )
+
+        parser.add_argument(
+            "--latency_target",
+            type=float,
+            default=2.0,
+            help="Seconds allowed to transcribe a 5 second utterance when calibrating"
+        )
+
+        parser.add_argument(
+            "--calibration_audio",
+            type=str,
+            default="assets/calibration.wav",
+            help="16-bit WAV recording of speech to calibrate on; the bundled clip is used if missing"
+        )
+
         return parser.parse_args()
\ No newline at end of file
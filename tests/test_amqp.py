@@ -0,0 +1,158 @@
+"""
+``AMQPTranscriptionClient`` and ``amqp_worker.handle`` talking through an in-process
+stand-in for the broker: the default exchange routes each message to an ``asyncio.Queue``
+named by its routing key, and the tests move messages between the two sides.
+"""
+import asyncio
+from collections import defaultdict
+from concurrent.futures import Future
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aio_pika")
+pytest.importorskip("faster_whisper")
+
+from src.transcription import amqp_worker
+from src.transcription.amqp import AMQPTranscriptionClient
+
+SPEECH = np.zeros(16000, dtype=np.float32)
+
+
+class Delivery:
+    """A published message as a consumer receives it."""
+
+    def __init__(self, message):
+        self.body = message.body
+        self.headers = message.headers
+        self.correlation_id = message.correlation_id
+        self.reply_to = message.reply_to
+        self.acked = False
+
+    async def ack(self):
+        self.acked = True
+
+
+class Exchange:
+    def __init__(self):
+        self.queues = defaultdict(asyncio.Queue)
+
+    async def publish(self, message, routing_key):
+        await self.queues[routing_key].put(Delivery(message))
+
+
+class Channel:
+    def __init__(self):
+        self.default_exchange = Exchange()
+
+    def queue(self, name) -> asyncio.Queue:
+        return self.default_exchange.queues[name]
+
+
+class Batcher:
+    """Answers each request with its guild id, or fails it with ``error``."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.requests = []
+
+    def submit(self, audio, guild_id, fast=False):
+        self.requests.append((guild_id, fast))
+        future = Future()
+        if self.error:
+            future.set_exception(self.error)
+        else:
+            future.set_result(f"guild {guild_id}")
+        return future
+
+
+def connected_client(channel, timeout=5.0):
+    client = AMQPTranscriptionClient("amqp://unused", asyncio.get_running_loop(), timeout=timeout)
+    client._channel = channel
+    client._started = True
+    client._connected.set()
+    return client
+
+
+async def work(channel, client, batcher, count=1):
+    """Take ``count`` requests off the queue, newest first, and deliver the replies to the client."""
+    deliveries = [await channel.queue(client.queue_name).get() for _ in range(count)]
+    for delivery in reversed(deliveries):
+        await amqp_worker.handle(channel, batcher, delivery)
+        assert delivery.acked
+    replies = channel.queue(client.reply_queue_name)
+    while not replies.empty():
+        await client._on_reply(replies.get_nowait())
+    return deliveries
+
+
+def test_replies_are_matched_by_correlation_id():
+    async def scenario():
+        channel = Channel()
+        client = connected_client(channel)
+        first = client.submit(SPEECH, {"guild_id": 1})
+        second = client.submit(SPEECH, {"guild_id": 2}, kind="fast")
+        batcher = Batcher()
+        await work(channel, client, batcher, count=2)
+        assert await asyncio.wrap_future(first) == "guild 1"
+        assert await asyncio.wrap_future(second) == "guild 2"
+        assert sorted(batcher.requests) == [("1", False), ("2", True)]
+
+    asyncio.run(scenario())
+
+
+def test_pending_counts_return_to_zero():
+    async def scenario():
+        channel = Channel()
+        client = connected_client(channel)
+        futures = [client.submit(SPEECH, {"guild_id": guild_id}) for guild_id in (1, 1, 2)]
+        assert client.pending(1) == 2
+        assert client.pending(2) == 1
+        assert client.pending() == 3
+        await work(channel, client, Batcher(), count=3)
+        await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        assert client.pending(1) == 0
+        assert client.pending(2) == 0
+        assert client.pending() == 0
+
+    asyncio.run(scenario())
+
+
+def test_error_replies_fail_the_future():
+    async def scenario():
+        channel = Channel()
+        client = connected_client(channel)
+        future = client.submit(SPEECH, {"guild_id": 1})
+        await work(channel, client, Batcher(error=RuntimeError("model crashed")))
+        with pytest.raises(RuntimeError, match="model crashed"):
+            await asyncio.wrap_future(future)
+        assert client.pending() == 0
+
+    asyncio.run(scenario())
+
+
+def test_unanswered_requests_time_out():
+    async def scenario():
+        channel = Channel()
+        client = connected_client(channel, timeout=0.05)
+        future = client.submit(SPEECH, {"guild_id": 1})
+        with pytest.raises(TimeoutError):
+            await asyncio.wait_for(asyncio.wrap_future(future), 1.0)
+        assert client.pending(1) == 0
+        # A reply arriving after the timeout is dropped
+        await work(channel, client, Batcher())
+        assert client.pending() == 0
+
+    asyncio.run(scenario())
+
+
+def test_short_audio_is_not_sent():
+    async def scenario():
+        channel = Channel()
+        client = connected_client(channel)
+        future = client.submit(np.zeros(160, dtype=np.float32), {"guild_id": 1})
+        assert future.result() == ""
+        assert client.pending() == 0
+        assert channel.queue(client.queue_name).empty()
+
+    asyncio.run(scenario())
@@ -0,0 +1,65 @@
+import numpy as np
+
+from src.transcription.batcher import TranscriptionBatcher
+from src.transcription.scheduler import FairShareScheduler
+from src.transcription.tiering import TierPolicy
+
+SPEECH = np.zeros(16000, dtype=np.float32)
+
+
+class Engine:
+    """Records every call, and answers with the engine's name."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+        self.status = "ready"
+
+    def start_loading(self):
+        pass
+
+    def transcribe_one(self, audio, fast=False, options=None):
+        self.calls.append(("one", options))
+        return self.name
+
+    def transcribe_batch(self, audios, options=None):
+        self.calls.append(("batch", options))
+        return [self.name] * len(audios)
+
+
+class Upgrades:
+    """Stands in for the ``BackgroundUpgrader``, keeping what the batcher hands it."""
+
+    def __init__(self):
+        self.items = []
+
+    def add(self, item, callback):
+        self.items.append(item)
+
+
+class Profiles:
+    def options_for(self, guild_id):
+        return {"beam_size": guild_id}
+
+
+def test_upgrades_run_as_scheduled_background_jobs():
+    primary, fallback = Engine("primary"), Engine("fallback")
+    scheduler = FairShareScheduler(max_per_guild=1)
+    batcher = TranscriptionBatcher(
+        primary,
+        scheduler=scheduler,
+        fallback=fallback,
+        # Always on the fallback model
+        tiering=TierPolicy(high_depth=0, min_dwell=0.0),
+        upgrade=True,
+        profiles=Profiles(),
+    )
+    batcher.upgrader = Upgrades()
+    assert batcher.submit(SPEECH, guild_id=5, upgrade=print).result(5) == "fallback"
+    assert fallback.calls == [("one", None)]
+
+    [job] = batcher.upgrader.items
+    assert batcher._upgrade(job) == "primary"
+    # The primary model with the guild's profile, not the defaults
+    assert primary.calls == [("one", {"beam_size": 5})]
+    assert scheduler.pending() == 0
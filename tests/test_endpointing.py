@@ -0,0 +1,21 @@
+from src.sinks.endpointing import AdaptiveEndpointer
+
+
+def speak(endpointer, user, pause, packets=20):
+    for i in range(packets):
+        hangover = endpointer.observe(user, i * pause)
+    endpointer.finish(user)
+    return hangover
+
+
+def test_slow_speakers_get_longer_hangovers_until_they_leave():
+    endpointer = AdaptiveEndpointer()
+    fresh = speak(AdaptiveEndpointer(), 1, 0.02)
+    slow = speak(endpointer, 1, 0.6, packets=60)
+    assert slow > fresh
+
+    endpointer.forget(1)
+    assert speak(endpointer, 1, 0.02) == fresh
+    assert endpointer._stats.keys() == {1}
+    endpointer.forget(1)
+    assert endpointer._stats == {}
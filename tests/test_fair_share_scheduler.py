@@ -0,0 +1,60 @@
+from src.transcription.scheduler import FairShareScheduler
+
+
+class Job:
+    def __init__(self, guild_id, cost=1.0, submitted=0.0):
+        self.guild_id = guild_id
+        self.cost = cost
+        self.submitted = submitted
+
+
+def test_one_guild_fills_a_batch():
+    scheduler = FairShareScheduler(max_per_guild=2)
+    for _ in range(6):
+        scheduler.put(Job(1))
+    assert len(scheduler.take(8)) == 6
+
+
+def test_cap_counts_batches_not_jobs():
+    scheduler = FairShareScheduler(max_per_guild=1)
+    for _ in range(4):
+        scheduler.put(Job(1))
+    first = scheduler.take(2)
+    assert len(first) == 2
+    # The guild's only slot is held until every job of its batch is released
+    scheduler.release(first[0])
+    assert scheduler._select({}) is None
+    scheduler.release(first[1])
+    assert len(scheduler.take(2)) == 2
+
+
+def test_guilds_share_by_virtual_time():
+    scheduler = FairShareScheduler(max_per_guild=4)
+    for _ in range(3):
+        scheduler.put(Job(1))
+    scheduler.put(Job(2))
+    taken = [job.guild_id for job in scheduler.take(2)]
+    assert sorted(taken) == [1, 2]
+
+
+def test_background_jobs_wait_for_live_jobs():
+    scheduler = FairShareScheduler(max_per_guild=2)
+    upgrade = Job(1)
+    scheduler.put(upgrade, background=True)
+    live = Job(1)
+    scheduler.put(live)
+    assert scheduler.pending() == 1
+    assert scheduler.take(1) == [live]
+    assert scheduler.take(1) == [upgrade]
+    assert scheduler.pending() == 0
+
+
+def test_background_jobs_count_against_the_guild_cap():
+    scheduler = FairShareScheduler(max_per_guild=1)
+    upgrade = Job(1)
+    scheduler.put(upgrade, background=True)
+    assert scheduler.take(1) == [upgrade]
+    scheduler.put(Job(1))
+    assert scheduler._select({}) is None
+    scheduler.release(upgrade)
+    assert len(scheduler.take(1)) == 1
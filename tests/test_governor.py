@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+from src.transcription import governor
+from src.transcription.governor import FALLBACK_THREADS, KEYWORD_THREADS, ResourceGovernor
+
+
+def args(keyword_model="", fallback_model=None):
+    return SimpleNamespace(num_workers=None, cpu_threads=None, keyword_model=keyword_model, fallback_model=fallback_model)
+
+
+def test_other_models_threads_are_reserved(monkeypatch):
+    monkeypatch.setattr(governor, "physical_cores", lambda: 16)
+    assert ResourceGovernor.from_cli(args()).available_cores == 16
+    assert ResourceGovernor.from_cli(args(fallback_model="small.en")).available_cores == 16 - FALLBACK_THREADS
+    both = ResourceGovernor.from_cli(args("tiny.en", "small.en"))
+    assert both.available_cores == 16 - FALLBACK_THREADS - KEYWORD_THREADS
+    assert both.num_workers * both.cpu_threads <= both.available_cores
+
+
+def test_small_machines_keep_a_core_for_the_main_model(monkeypatch):
+    monkeypatch.setattr(governor, "physical_cores", lambda: 2)
+    small = ResourceGovernor.from_cli(args("tiny.en", "small.en"))
+    assert small.available_cores == 1
+    assert small.model_options == dict(num_workers=1, cpu_threads=1)
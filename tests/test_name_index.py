@@ -0,0 +1,111 @@
+from types import SimpleNamespace
+
+import pytest
+
+from src.triggers.names import EXACT, PHONETIC, PREFIX, TOKEN, NameIndex, metaphone, sound_key
+
+GUILD = SimpleNamespace(id=7)
+
+
+def member(user_id, display_name, name=None, global_name=None):
+    return SimpleNamespace(
+        id=user_id, display_name=display_name, name=name or display_name.lower(),
+        global_name=global_name, guild=GUILD)
+
+
+def index():
+    return NameIndex.build(
+        [
+            member(1, "Jon Snow", "ironwolf"),
+            member(2, "Kathy", "kathy_b"),
+            member(3, "Bartholomew", "bart"),
+            member(4, "Alexandra", "alex_1"),
+            member(5, "Alexander", "alex_2"),
+        ],
+        player_map={"3": {"player": "Bart", "character": "Grimble"}},
+        aliases={"jonny": 1},
+        guild_id=7,
+    )
+
+
+def resolved(spoken):
+    candidate = index().resolve(spoken)[0]
+    return candidate.user_id, candidate.confidence
+
+
+@pytest.mark.parametrize("left, right", [("John", "Jon"), ("Cathy", "Kathy"), ("Sean", "Shawn")])
+def test_names_that_sound_alike_share_a_key(left, right):
+    assert sound_key(left) == sound_key(right)
+
+
+def test_metaphone_keys():
+    assert metaphone("Thomas") == "0MS"
+    assert metaphone("Knight") == "NT"
+    assert metaphone("Philip") == "FLP"
+
+
+def test_exact_and_word_matches():
+    assert resolved("jon snow") == (1, EXACT)
+    assert resolved("Snow") == (1, TOKEN)
+    assert resolved("Grimble") == (3, EXACT)
+    assert resolved("jonny") == (1, EXACT)
+
+
+def test_prefix_matches():
+    assert resolved("bartho") == (3, PREFIX)
+
+
+def test_phonetic_matches():
+    user_id, confidence = resolved("john")
+    assert user_id == 1 and PHONETIC * 0.8 <= confidence <= PHONETIC
+    user_id, confidence = resolved("cathy")
+    assert user_id == 2 and PHONETIC * 0.8 <= confidence <= PHONETIC
+
+
+def test_trigram_matches_find_misheard_names():
+    user_id, confidence = resolved("bartolomew")
+    assert user_id == 3
+    assert 0.5 < confidence < PHONETIC
+
+
+def test_unknown_names_resolve_to_nobody():
+    assert index().resolve("zzz") == []
+    assert index().best("zzz") is None
+
+
+def test_best_refuses_names_matching_two_members_equally():
+    names = index()
+    assert names.best("alex") is None
+    assert names.best("alexandra").user_id == 4
+
+
+def test_best_refuses_weak_matches():
+    names = index()
+    weak = names.resolve("jan")[0]
+    assert names.best("jan", min_confidence=weak.confidence + 0.01) is None
+    assert names.best("jan", min_confidence=weak.confidence).user_id == weak.user_id
+
+
+def test_a_changed_display_name_replaces_the_old_one_and_keeps_aliases():
+    names = index()
+    names.member_changed("update", member(1, "Lord Commander", "ironwolf"))
+    assert names.best("lord commander").user_id == 1
+    assert names.best("snow") is None
+    # Only the alias "jonny" still starts like the old name
+    assert names.resolve("jon snow")[0].confidence == PREFIX
+    assert names.best("jonny").user_id == 1
+    assert names.best("ironwolf").user_id == 1
+
+
+def test_members_who_leave_are_forgotten():
+    names = index()
+    names.member_changed("remove", member(2, "Kathy", "kathy_b"))
+    assert names.best("kathy") is None
+
+
+def test_events_from_other_guilds_are_ignored():
+    names = index()
+    stranger = member(2, "Someone Else", "kathy_b")
+    stranger.guild = SimpleNamespace(id=8)
+    names.member_changed("update", stranger)
+    assert names.best("kathy").user_id == 2
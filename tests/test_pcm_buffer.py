@@ -0,0 +1,48 @@
+from src.sinks.pcm_buffer import BYTES_PER_SECOND, FRAME_BYTES, PCMBuffer
+
+PACKET = 960 * FRAME_BYTES
+
+
+def packet(value):
+    return bytes([value]) * PACKET
+
+
+def test_append_and_consume():
+    buffer = PCMBuffer(initial_bytes=PACKET)
+    for value in range(3):
+        buffer.append(packet(value))
+    assert len(buffer) == 3 * PACKET
+    buffer.consume(PACKET)
+    assert bytes(buffer.view()) == packet(1) + packet(2)
+    assert bytes(buffer.tail(PACKET)) == packet(2)
+
+
+def test_cap_drops_oldest_audio_in_chunks():
+    buffer = PCMBuffer(max_bytes=10 * PACKET, drop_bytes=4 * PACKET)
+    for value in range(10):
+        buffer.append(packet(value))
+    assert len(buffer) == 10 * PACKET
+    buffer.append(packet(10))
+    # One shift makes room for the next few packets
+    assert len(buffer) == 7 * PACKET
+    assert buffer.dropped_bytes == 4 * PACKET
+    assert bytes(buffer.view()[:PACKET]) == packet(4)
+    for value in range(11, 14):
+        buffer.append(packet(value))
+    assert buffer.dropped_bytes == 4 * PACKET
+    assert bytes(buffer.tail(PACKET)) == packet(13)
+
+
+def test_default_cap_keeps_the_latest_minute():
+    buffer = PCMBuffer()
+    for _ in range(61 * 50):
+        buffer.append(bytes(PACKET))
+    assert 50 * BYTES_PER_SECOND <= len(buffer) <= 60 * BYTES_PER_SECOND
+    assert buffer.dropped_bytes + len(buffer) == 61 * 50 * PACKET
+
+
+def test_oversized_chunk_keeps_its_end():
+    buffer = PCMBuffer(max_bytes=2 * PACKET)
+    buffer.append(packet(1) + packet(2) + packet(3))
+    assert bytes(buffer.view()) == packet(2) + packet(3)
+    assert buffer.dropped_bytes == PACKET
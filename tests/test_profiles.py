@@ -0,0 +1,10 @@
+from src.transcription.audio import WHISPER_SAMPLING_RATE
+from src.transcription.profiles import REFERENCE_DURATION, calibration_sample
+
+
+def test_the_bundled_speech_clip_is_used_when_the_recording_is_missing():
+    sample = calibration_sample("missing.wav")
+    bundled = calibration_sample()
+    assert len(sample) == len(bundled)
+    assert len(sample) >= REFERENCE_DURATION * WHISPER_SAMPLING_RATE
+    assert 0.1 < abs(sample).max() <= 1.0
@@ -0,0 +1,136 @@
+"""
+``RemoteWhisperClient`` against a local stand-in for the OpenAI transcription endpoint,
+served by ``aiohttp.test_utils`` and reached through ``OPENAI_BASE_URL`` like the bot does.
+"""
+import asyncio
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("av")
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.transcription import remote
+from src.transcription.remote import DEFAULT_BASE_URL, RemoteTranscriptionError, RemoteWhisperClient
+
+SPEECH = np.zeros(16000, dtype=np.float32)
+
+
+class Endpoint:
+    """Answers with the queued ``(status, headers)`` responses, then with a transcript."""
+
+    def __init__(self, responses=(), delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.requests = 0
+        self.running = 0
+        self.peak = 0
+
+    async def handle(self, request):
+        form = await request.post()
+        assert form["model"] == "whisper-1"
+        assert form["file"].content_type == "audio/ogg"
+        assert request.headers["Authorization"] == "Bearer key"
+        self.requests += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        if self.responses:
+            status, headers = self.responses.pop(0)
+            return web.Response(status=status, headers=headers, text="try again")
+        return web.json_response({"text": "hello there"})
+
+
+def run(endpoint, scenario, monkeypatch, **options):
+    async def main():
+        app = web.Application()
+        app.router.add_post("/v1/audio/transcriptions", endpoint.handle)
+        async with TestServer(app) as server:
+            monkeypatch.setenv("OPENAI_BASE_URL", str(server.make_url("/v1")))
+            client = RemoteWhisperClient(
+                os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL), "key", asyncio.get_running_loop(), **options)
+            try:
+                await scenario(client)
+            finally:
+                await client.close()
+
+    asyncio.run(main())
+
+
+def test_transcripts_are_returned(monkeypatch):
+    endpoint = Endpoint()
+
+    async def scenario(client):
+        assert await asyncio.wrap_future(client.submit(SPEECH)) == "hello there"
+        assert client.pending() == 0
+
+    run(endpoint, scenario, monkeypatch)
+    assert endpoint.requests == 1
+
+
+def test_audio_is_encoded_off_the_calling_thread(monkeypatch):
+    threads = []
+    encode_opus = remote.encode_opus
+
+    def encode(audio):
+        threads.append(threading.current_thread())
+        return encode_opus(audio)
+
+    monkeypatch.setattr(remote, "encode_opus", encode)
+
+    async def scenario(client):
+        await asyncio.wrap_future(client.submit(SPEECH))
+
+    run(Endpoint(), scenario, monkeypatch)
+    assert threads and threading.current_thread() not in threads
+
+
+def test_retry_after_is_honoured(monkeypatch):
+    endpoint = Endpoint([(429, {"Retry-After": "0.2"})])
+
+    async def scenario(client):
+        started = time.monotonic()
+        assert await asyncio.wrap_future(client.submit(SPEECH)) == "hello there"
+        # The backoff without Retry-After is at least half a second
+        assert 0.2 <= time.monotonic() - started < 0.5
+
+    run(endpoint, scenario, monkeypatch)
+    assert endpoint.requests == 2
+
+
+def test_server_errors_fail_once_retries_run_out(monkeypatch):
+    endpoint = Endpoint([(503, {})] * 3)
+    monkeypatch.setattr(remote.random, "random", lambda: 0.0)
+
+    async def scenario(client):
+        with pytest.raises(RemoteTranscriptionError, match="503"):
+            await asyncio.wrap_future(client.submit(SPEECH))
+        assert client.pending() == 0
+
+    run(endpoint, scenario, monkeypatch, retries=2)
+    assert endpoint.requests == 3
+
+
+def test_requests_in_flight_are_capped(monkeypatch):
+    endpoint = Endpoint(delay=0.1)
+
+    async def scenario(client):
+        futures = [client.submit(SPEECH) for _ in range(5)]
+        assert client.pending() == 5
+        assert client.saturated
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        assert results == ["hello there"] * 5
+        assert not client.saturated
+
+    run(endpoint, scenario, monkeypatch, max_in_flight=2)
+    assert endpoint.requests == 5
+    assert endpoint.peak == 2
@@ -0,0 +1,75 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.sinks.pcm_buffer import BYTES_PER_SECOND, PCMBuffer
+from src.sinks.streaming import StreamingTranscriber
+from src.transcription.audio import WHISPER_SAMPLING_RATE
+
+
+def speaker_with(seconds):
+    data = PCMBuffer()
+    data.append(bytes(int(seconds * BYTES_PER_SECOND)))
+    return SimpleNamespace(
+        user=1, data=data, committed=[], hypothesis=[],
+        partial_pending=False, partial_mark=0, partial_offset=0,
+    )
+
+
+def tail(speaker):
+    """16 kHz audio for the speaker's most recent ``size`` bytes, like ``WhisperSink.tail_audio``."""
+    return lambda size: np.zeros(min(size, len(speaker.data)) * WHISPER_SAMPLING_RATE // BYTES_PER_SECOND, dtype=np.float32)
+
+
+def streamer(submitted):
+    def submit_words(audio, prompt):
+        submitted.append(len(audio) / WHISPER_SAMPLING_RATE)
+        return Future()
+
+    return StreamingTranscriber(submit_words, window=10.0, step=2.0, margin=5.0)
+
+
+def test_submits_at_most_window_plus_margin():
+    submitted = []
+    streaming = streamer(submitted)
+    speaker = speaker_with(40.0)
+    assert streaming.maybe_submit(speaker, tail(speaker)) is not None
+    assert submitted == [15.0]
+    assert speaker.partial_offset == 25 * BYTES_PER_SECOND
+
+
+def test_short_buffer_is_submitted_whole():
+    submitted = []
+    streaming = streamer(submitted)
+    speaker = speaker_with(12.0)
+    streaming.maybe_submit(speaker, tail(speaker))
+    assert submitted == [12.0]
+    assert speaker.partial_offset == 0
+
+
+def test_agreed_words_are_committed_and_consumed():
+    streaming = streamer([])
+    speaker = speaker_with(12.0)
+    speaker.hypothesis = [(0.0, 0.5, " hello"), (0.5, 1.0, " there")]
+    streaming.maybe_submit(speaker, tail(speaker))
+    text = streaming.commit(speaker, [(0.0, 0.5, " hello"), (0.5, 1.0, " there"), (1.0, 1.5, " friend")])
+    assert speaker.committed == [" hello", " there"]
+    assert text == " hello there friend"
+    assert len(speaker.data) == 11 * BYTES_PER_SECOND
+    assert speaker.hypothesis == [(0.0, 0.5, " friend")]
+
+
+def test_words_the_window_slid_past_are_committed():
+    streaming = streamer([])
+    speaker = speaker_with(20.0)
+    # Heard by an earlier window that started at the beginning of the buffer
+    speaker.hypothesis = [(1.0, 2.0, " one"), (4.0, 5.0, " two"), (6.0, 7.0, " three")]
+    streaming.maybe_submit(speaker, tail(speaker))
+    assert speaker.partial_offset == 5 * BYTES_PER_SECOND
+    # Times relative to the submitted window, which starts 5 seconds into the buffer
+    text = streaming.commit(speaker, [(1.0, 2.0, " three"), (3.0, 4.0, " four")])
+    assert speaker.committed == [" one", " two", " three"]
+    assert text == " one two three four"
+    assert len(speaker.data) == 13 * BYTES_PER_SECOND
+    assert speaker.hypothesis == [(1.0, 2.0, " four")]
@@ -0,0 +1,83 @@
+import sys
+import types
+
+import pytest
+
+from src.triggers.registry import TriggerRegistry, VoiceCommand, normalize
+
+
+async def handler(context, match):
+    pass
+
+
+def registry():
+    return TriggerRegistry((
+        VoiceCommand("toilet", ("toilet time",), handler),
+        VoiceCommand(
+            "skibidi toilet",
+            ("skippity toilet time", "skibbity toilet time", "skibbity-toilet time"),
+            handler,
+        ),
+        VoiceCommand("shut up", ("shut up",), handler, argument=True),
+        VoiceCommand("corner", ("go sit in the corner",), handler, argument=True),
+        VoiceCommand("cheese", ("cheese",), handler, repeat=True),
+        VoiceCommand("test", ("test",), handler),
+        VoiceCommand("hey bot", ("hey bot",), handler),
+    ))
+
+
+def fired(text, triggers=None):
+    return [(match.command.name, match.argument) for match in (triggers or registry()).match(text)]
+
+
+def test_longer_phrases_win_over_phrases_they_contain():
+    assert fired("skibbity toilet time") == [("skibidi toilet", None)]
+    assert fired("it is toilet time") == [("toilet", None)]
+
+
+@pytest.mark.parametrize("text", ["Skippity toilet time!", "skibbity toilet time", "Skibbity-toilet time."])
+def test_misheard_spellings_fire_the_command(text):
+    assert fired(text) == [("skibidi toilet", None)]
+
+
+def test_an_argument_can_start_another_command():
+    assert fired("Shut up, go sit in the corner Bob") == [("shut up", "go"), ("corner", "bob")]
+
+
+def test_commands_taking_an_argument_need_one():
+    assert fired("oh shut up") == []
+
+
+def test_repeat_commands_fire_per_occurrence():
+    assert fired("cheese, cheese and more cheese") == [("cheese", None)] * 3
+    assert fired("test test") == [("test", None)]
+
+
+def test_punctuation_and_case_are_normalized():
+    assert normalize("Hey, bot! What's up?") == "hey bot what's up"
+    assert fired("Hey, Bot! What's up?") == [("hey bot", None)]
+
+
+def test_matches_are_in_spoken_order():
+    matches = registry().match("test then cheese")
+    assert [match.command.name for match in matches] == ["test", "cheese"]
+    assert matches[0].start < matches[1].start
+
+
+def test_phrases_can_only_fire_one_command():
+    triggers = registry()
+    with pytest.raises(ValueError):
+        triggers.register(VoiceCommand("other test", ("Test",), handler))
+
+
+def test_plugins_can_register_catch_all_commands(monkeypatch):
+    plugin = types.ModuleType("listener_plugin")
+    plugin.register = lambda triggers: triggers.register(VoiceCommand("listener", (), handler))
+    monkeypatch.setitem(sys.modules, "listener_plugin", plugin)
+    triggers = registry()
+
+    assert triggers.load_plugin("listener_plugin") is plugin
+    assert [command.name for command in triggers.catch_all] == ["listener"]
+    # Catch-all commands run on every utterance rather than through ``match``
+    assert fired("test", triggers) == [("test", None)]
+    assert triggers.load_plugin("no_such_plugin") is None
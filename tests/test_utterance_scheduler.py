@@ -0,0 +1,43 @@
+import pytest
+
+from src.sinks.scheduler import UtteranceScheduler
+
+
+def test_expires_in_deadline_order():
+    scheduler = UtteranceScheduler(silence_timeout=1.0)
+    scheduler.touch(1, 0.0)
+    scheduler.touch(2, 0.5)
+    assert scheduler.next_timeout(0.0) == 1.0
+    assert scheduler.pop_expired(1.2) == [1]
+    assert scheduler.pop_expired(1.5) == [2]
+    assert len(scheduler) == 0
+
+
+def test_later_touch_moves_deadline_forward():
+    scheduler = UtteranceScheduler(silence_timeout=1.0)
+    scheduler.touch(1, 0.0)
+    scheduler.touch(1, 0.8)
+    assert scheduler.pop_expired(1.0) == []
+    assert scheduler.next_timeout(1.0) == 0.8
+    assert scheduler.pop_expired(1.8) == [1]
+
+
+def test_shorter_timeout_moves_deadline_earlier():
+    scheduler = UtteranceScheduler()
+    scheduler.touch(1, 0.0, 2.0)
+    scheduler.touch(2, 0.0, 1.0)
+    scheduler.touch(1, 0.02, 0.4)
+    assert scheduler.next_timeout(0.0) == pytest.approx(0.42)
+    assert scheduler.pop_expired(0.5) == [1]
+    assert scheduler.pop_expired(1.0) == [2]
+    # The superseded entry for user 1 is dropped, not expired again
+    assert scheduler.pop_expired(3.0) == []
+    assert scheduler.next_timeout(3.0) is None
+
+
+def test_discarded_speaker_never_expires():
+    scheduler = UtteranceScheduler(silence_timeout=1.0)
+    scheduler.touch(1, 0.0)
+    scheduler.discard(1)
+    assert scheduler.pop_expired(5.0) == []
+    assert scheduler.next_timeout(5.0) is None
@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from src.transcription import workers
+from src.transcription.workers import ProcessPoolEngine, WorkerCrashed, _Worker
+
+
+def test_close_stops_busy_workers_and_frees_shared_memory():
+    engine = ProcessPoolEngine(1, "tiny", "int8", {}, {})
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    # Stands in for a worker stuck in a long transcription
+    process = context.Process(target=time.sleep, args=(60,), daemon=True)
+    process.start()
+    engine._workers[0] = _Worker(0, process, parent_conn)
+    segment = shared_memory.SharedMemory(create=True, size=16)
+    engine._segments.add(segment)
+
+    engine.close(timeout=0.5)
+
+    assert not process.is_alive()
+    assert engine._workers == {}
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=segment.name)
+    # Workers are not restarted after closing
+    engine._spawn(0)
+    time.sleep(0.1)
+    assert engine._workers == {}
+
+
+def echo(conn):
+    """Stands in for a worker: answers each request with its kind."""
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        conn.send(("ok", request[0]))
+
+
+class Process:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.exitcode = None if alive else -9
+
+    def is_alive(self):
+        return self.alive
+
+    def kill(self):
+        self.alive = False
+
+    def join(self, timeout=None):
+        pass
+
+
+class BrokenConnection:
+    def send(self, request):
+        raise BrokenPipeError("pipe closed")
+
+    def close(self):
+        pass
+
+
+def pool(monkeypatch):
+    engine = ProcessPoolEngine(2, "tiny", "int8", {}, {})
+    engine._started = True
+    engine._ready_count = 2
+    spawned = []
+    monkeypatch.setattr(engine, "_spawn", lambda index, delay=0.0: spawned.append(index))
+    return engine, spawned
+
+
+def start_echo(index):
+    context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = context.Pipe()
+    process = context.Process(target=echo, args=(child_conn,), daemon=True)
+    process.start()
+    child_conn.close()
+    return _Worker(index, process, parent_conn)
+
+
+def test_dead_idle_workers_are_restarted_and_skipped(monkeypatch):
+    engine, spawned = pool(monkeypatch)
+    context = multiprocessing.get_context("spawn")
+    dead = context.Process(target=time.sleep, args=(0,), daemon=True)
+    dead.start()
+    dead.join()
+    engine._idle.put(_Worker(0, dead, context.Pipe()[0]))
+    live = start_echo(1)
+    engine._idle.put(live)
+    try:
+        assert engine.transcribe_one(np.zeros(16, dtype=np.float32)) == "one"
+        assert spawned == [0]
+        assert engine.restarts == 1
+    finally:
+        live.conn.send(None)
+        live.process.join(timeout=5)
+
+
+def test_failed_sends_are_retried_on_another_worker(monkeypatch):
+    engine, spawned = pool(monkeypatch)
+    engine._idle.put(_Worker(0, Process(), BrokenConnection()))
+    live = start_echo(1)
+    engine._idle.put(live)
+    try:
+        assert engine.transcribe_one(np.zeros(16, dtype=np.float32), fast=True) == "fast"
+        assert spawned == [0]
+    finally:
+        live.conn.send(None)
+        live.process.join(timeout=5)
+
+
+def test_calls_fail_instead_of_waiting_on_a_closed_pool(monkeypatch):
+    engine, spawned = pool(monkeypatch)
+    engine.close(timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(WorkerCrashed):
+        engine.transcribe_one(np.zeros(16, dtype=np.float32))
+    assert time.monotonic() - started < 2
+    assert engine._segments == set()
+
+
+def test_calls_give_up_when_no_worker_frees_up(monkeypatch):
+    engine, spawned = pool(monkeypatch)
+    monkeypatch.setattr(workers, "WORKER_WAIT", 0.2)
+    with pytest.raises(WorkerCrashed, match="No whisper worker"):
+        engine.transcribe_one(np.zeros(16, dtype=np.float32))